@@ -1,13 +1,22 @@
 import os
-import sqlite3
-import re
-import unicodedata
-from difflib import SequenceMatcher
 
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
+from data.database import versao_arquivo
+from data.queries import (
+    SQL_ANOS, SQL_KPIS_TIPO, SQL_KPIS_TIPO_SEM_IMPOSTO, SQL_TREND_GASTO, SQL_TREND_IMPOSTO,
+    SQL_ITENS_AGG, SQL_FORNECEDORES, SQL_LINHAS_BUSCA, SQL_HIST_ITEM_MES,
+    SQL_LINHAS_BUSCA_TOTAL, SQL_BUSCA_FTS, SQL_BUSCA_FTS_TOTAL, SQL_BUSCA_LIKE, expressao_fts,
+    SQL_DOCS_DETETIVE, SQL_DOCS_DETETIVE_TUDO,
+)
+from utils.classifiers import classificar_categorias
+from utils.detetive import CacheDetetive, carregar_mapa, limpar_nf_excel
+from utils.formatters import format_brl, format_perc
+from utils.regras import CacheClassificacao, motor_regras
+from ui.dados import pool_leitura
+
 # =========================
 # Config
 # =========================
@@ -20,113 +29,26 @@ st.set_page_config(
 # =========================
 # Helpers
 # =========================
-def brl(v):
-    try:
-        return f"R$ {float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "R$ 0,00"
+def connect(db_path: str):
+    return pool_leitura(db_path).conexao()
 
 
-def pct(v):
-    try:
-        return f"{float(v)*100:.1f}%".replace(".", ",")
-    except Exception:
-        return "0,0%"
+@st.cache_resource(show_spinner=False)
+def cache_classificacao() -> CacheClassificacao:
+    # Classificações por (versão das regras, descrição, NCM), persistidas entre deploys
+    return CacheClassificacao()
 
 
-def connect(db_path: str):
-    return sqlite3.connect(db_path, check_same_thread=False)
+@st.cache_resource(show_spinner=False)
+def cache_detetive() -> CacheDetetive:
+    # Mapas lidos (pelo hash do arquivo) e pares casados por ano/versão do RAW
+    return CacheDetetive()
 
 
 def safe_numeric(s: pd.Series) -> pd.Series:
     return pd.to_numeric(s, errors="coerce").fillna(0)
 
 
-def remover_acentos(texto):
-    if not isinstance(texto, str):
-        return str(texto)
-    nfkd = unicodedata.normalize("NFKD", texto)
-    return "".join([c for c in nfkd if not unicodedata.combining(c)])
-
-
-def limpar_texto_match(texto):
-    if not isinstance(texto, str):
-        return str(texto)
-    texto = remover_acentos(texto).upper().strip()
-    sufixos = [" LTDA", " S.A", " SA", " EIRELI", " ME", " EPP", " COMERCIO", " SERVICOS"]
-    for s in sufixos:
-        texto = texto.replace(s, "")
-    return re.sub(r"[^A-Z0-9]", "", texto)
-
-
-def limpar_nf_excel(valor):
-    if pd.isna(valor) or valor == "":
-        return ""
-    s = str(valor).strip()
-    if s.endswith(".0"):
-        s = s[:-2]
-    return re.sub(r"\D", "", s).lstrip("0")
-
-
-def calcular_similaridade(nome_xml, nome_excel):
-    t_xml = limpar_texto_match(nome_xml)
-    t_excel = limpar_texto_match(nome_excel)
-    if t_xml == t_excel:
-        return 100
-    if t_excel in t_xml or t_xml in t_excel:
-        return 95
-    return SequenceMatcher(None, t_xml, t_excel).ratio() * 100
-
-
-def carregar_arquivo_flexivel(uploaded_file):
-    try:
-        name = uploaded_file.name.lower()
-        if name.endswith(".csv"):
-            try:
-                return pd.read_csv(uploaded_file, encoding="utf-8-sig", sep=None, engine="python")
-            except Exception:
-                uploaded_file.seek(0)
-                return pd.read_csv(uploaded_file, sep=";", encoding="latin1")
-        return pd.read_excel(uploaded_file)
-    except Exception:
-        return None
-
-
-def classificar_categoria_simples(desc: str, ncm: str) -> str:
-    d = (desc or "").upper()
-    n = (ncm or "").strip()
-
-    # heurística por palavras
-    if any(k in d for k in ["FRETE", "TRANSPORTE", "LOGIST", "CTE"]):
-        return "Logística"
-    if any(k in d for k in ["EPI", "CAPACETE", "LUVA", "OCULOS", "BOTA", "PROTETOR", "MASCARA"]):
-        return "EPI / Segurança"
-    if any(k in d for k in ["PARAFUS", "PORCA", "ARRUELA", "ABRACADEIRA", "FIXADOR"]):
-        return "Fixadores"
-    if any(k in d for k in ["ROLAMENTO", "CORREIA", "MANCAL", "ENGRENAGEM"]):
-        return "Mecânica"
-    if any(k in d for k in ["CABO", "DISJUNTOR", "SENSOR", "INVERSOR", "MOTOR", "CONTATOR"]):
-        return "Elétrica / Automação"
-    if any(k in d for k in ["OLEO", "GRAXA", "LUBRIFIC"]):
-        return "Lubrificantes"
-    if any(k in d for k in ["LIMPEZA", "DETERGENTE", "SABAO", "DESENGRAXANTE"]):
-        return "Limpeza"
-    if any(k in d for k in ["SERVICO", "SERVIÇO", "MANUTENCAO", "MANUTENÇÃO", "INSTALACAO", "INSTALAÇÃO"]):
-        return "Serviços"
-
-    # fallback por NCM (bem leve)
-    if n.startswith("84") or n.startswith("85"):
-        return "Máquinas / Elétrica"
-    if n.startswith("73"):
-        return "Metais / Ferragens"
-    if n.startswith("40"):
-        return "Borracha"
-    if n.startswith("39"):
-        return "Plásticos"
-
-    return "Outros"
-
-
 # =========================
 # SQL loaders (CURATED)
 # =========================
@@ -143,10 +65,7 @@ def curated_has_column(db_path: str, table: str, col: str) -> bool:
 @st.cache_data(show_spinner=False)
 def list_years_curated(db_path: str):
     with connect(db_path) as con:
-        df = pd.read_sql(
-            "SELECT DISTINCT ano FROM fato_gastos WHERE ano IS NOT NULL ORDER BY ano DESC",
-            con
-        )
+        df = pd.read_sql(SQL_ANOS, con)
     return [int(x) for x in df["ano"].dropna().tolist()]
 
 
@@ -156,58 +75,27 @@ def load_kpis_gastos(db_path: str, ano: int):
     with connect(db_path) as con:
         if has_imp:
             df = pd.read_sql(
-                """
-                SELECT
-                  doc_tipo,
-                  SUM(COALESCE(valor_total,0)) AS valor_total,
-                  SUM(COALESCE(imposto_total,0)) AS imposto_total
-                FROM fato_gastos
-                WHERE ano = ?
-                GROUP BY doc_tipo
-                """,
+                SQL_KPIS_TIPO,
                 con,
                 params=[ano]
             )
         else:
             df = pd.read_sql(
-                """
-                SELECT
-                  doc_tipo,
-                  SUM(COALESCE(valor_total,0)) AS valor_total
-                FROM fato_gastos
-                WHERE ano = ?
-                GROUP BY doc_tipo
-                """,
+                SQL_KPIS_TIPO_SEM_IMPOSTO,
                 con,
                 params=[ano]
             )
             df["imposto_total"] = 0.0
 
         trend = pd.read_sql(
-            """
-            SELECT
-              mes_ano,
-              SUM(COALESCE(valor_total,0)) AS gasto
-            FROM fato_gastos
-            WHERE ano = ? AND mes_ano IS NOT NULL
-            GROUP BY mes_ano
-            ORDER BY mes_ano
-            """,
+            SQL_TREND_GASTO,
             con,
             params=[ano]
         )
 
         if has_imp:
             trend_imp = pd.read_sql(
-                """
-                SELECT
-                  mes_ano,
-                  SUM(COALESCE(imposto_total,0)) AS imposto
-                FROM fato_gastos
-                WHERE ano = ? AND mes_ano IS NOT NULL
-                GROUP BY mes_ano
-                ORDER BY mes_ano
-                """,
+                SQL_TREND_IMPOSTO,
                 con,
                 params=[ano]
             )
@@ -219,32 +107,11 @@ def load_kpis_gastos(db_path: str, ano: int):
 
 
 @st.cache_data(show_spinner=False)
-def load_itens_agg(db_path: str, ano: int):
+def load_itens_agg(db_path: str, ano: int, versao_regras: str):
+    # versao_regras entra na chave do cache: editar data/regras_categorias.json reclassifica
     with connect(db_path) as con:
         df = pd.read_sql(
-            """
-            SELECT
-              i.item_key,
-              i.descricao,
-              i.ncm,
-              SUM(COALESCE(i.v_total,0)) AS gasto_ano,
-              SUM(COALESCE(i.qtd,0))     AS qtd_ano,
-              AVG(NULLIF(i.v_unit,0))    AS preco_medio_ano,
-
-              b.preco_medio_hist,
-              b.menor_preco_hist,
-              b.maior_preco_hist,
-              b.ultimo_preco,
-              b.ultima_data,
-              b.ultimo_fornecedor
-            FROM fato_itens i
-            LEFT JOIN bench_item b ON b.item_key = i.item_key
-            WHERE i.ano = ?
-            GROUP BY
-              i.item_key, i.descricao, i.ncm,
-              b.preco_medio_hist, b.menor_preco_hist, b.maior_preco_hist,
-              b.ultimo_preco, b.ultima_data, b.ultimo_fornecedor
-            """,
+            SQL_ITENS_AGG,
             con,
             params=[ano]
         )
@@ -261,7 +128,7 @@ def load_itens_agg(db_path: str, ano: int):
     df["saving_potencial"] = ((df["ultimo_preco"] - df["menor_preco_hist"]) * df["qtd_ano"]).clip(lower=0)
 
     # Categoria (recriando o que você tinha antes, mesmo que heurístico)
-    df["Categoria"] = df.apply(lambda r: classificar_categoria_simples(r.get("descricao"), r.get("ncm")), axis=1)
+    df["Categoria"] = classificar_categorias(df["descricao"], df["ncm"], cache=cache_classificacao())
 
     return df
 
@@ -270,16 +137,7 @@ def load_itens_agg(db_path: str, ano: int):
 def load_fornecedores(db_path: str, ano: int):
     with connect(db_path) as con:
         df = pd.read_sql(
-            """
-            SELECT
-              nome_emit,
-              COUNT(DISTINCT item_key) AS itens_distintos,
-              SUM(COALESCE(v_total,0)) AS gasto
-            FROM fato_itens
-            WHERE ano = ?
-            GROUP BY nome_emit
-            ORDER BY gasto DESC
-            """,
+            SQL_FORNECEDORES,
             con,
             params=[ano]
         )
@@ -290,44 +148,43 @@ def load_fornecedores(db_path: str, ano: int):
 
 
 @st.cache_data(show_spinner=False)
-def load_linhas_para_busca(db_path: str, ano: int, limit: int = 30000):
-    # Busca é a única que “puxa linhas”
+def curated_has_fts(db_path: str) -> bool:
+    try:
+        with connect(db_path) as con:
+            return con.execute("SELECT 1 FROM sqlite_master WHERE name = 'fato_itens_fts'").fetchone() is not None
+    except Exception:
+        return False
+
+
+@st.cache_data(show_spinner=False)
+def buscar_linhas(db_path: str, ano: int, termo: str, pagina: int = 1, por_pagina: int = 200):
+    """
+    Uma página da Busca: (linhas, total). Com termo e FTS: todos os anos, por relevância;
+    sem FTS (curated antigo): substring no ano (total None). Sem termo: maiores linhas do ano.
+    """
+    offset = (max(int(pagina), 1) - 1) * por_pagina
+    match = expressao_fts(termo) if curated_has_fts(db_path) else ""
     with connect(db_path) as con:
-        df = pd.read_sql(
-            f"""
-            SELECT
-              mes_ano, nome_emit, descricao, ncm, unidade, qtd, v_unit, v_total, item_key
-            FROM fato_itens
-            WHERE ano = ?
-            LIMIT {int(limit)}
-            """,
-            con,
-            params=[ano]
-        )
-    if df.empty:
-        return df
+        if match:
+            df = pd.read_sql(SQL_BUSCA_FTS, con, params=[match, por_pagina, offset])
+            total = con.execute(SQL_BUSCA_FTS_TOTAL, [match]).fetchone()[0]
+        elif termo.strip():
+            df = pd.read_sql(SQL_BUSCA_LIKE, con, params=[ano, f"%{termo.strip().upper()}%", por_pagina, offset])
+            total = None
+        else:
+            df = pd.read_sql(SQL_LINHAS_BUSCA, con, params=[ano, por_pagina, offset])
+            total = con.execute(SQL_LINHAS_BUSCA_TOTAL, [ano]).fetchone()[0]
     for c in ["qtd", "v_unit", "v_total"]:
         if c in df.columns:
             df[c] = safe_numeric(df[c])
-    return df
+    return df, total
 
 
 @st.cache_data(show_spinner=False)
 def load_hist_item_mes(db_path: str, ano: int, item_key: str):
     with connect(db_path) as con:
         df = pd.read_sql(
-            """
-            SELECT
-              mes_ano,
-              nome_emit,
-              AVG(NULLIF(v_unit,0)) AS preco_medio,
-              SUM(COALESCE(qtd,0)) AS qtd,
-              SUM(COALESCE(v_total,0)) AS gasto
-            FROM fato_itens
-            WHERE ano = ? AND item_key = ? AND mes_ano IS NOT NULL
-            GROUP BY mes_ano, nome_emit
-            ORDER BY mes_ano
-            """,
+            SQL_HIST_ITEM_MES,
             con,
             params=[ano, item_key]
         )
@@ -361,150 +218,55 @@ def raw_has_table(raw_db_path: str, table: str) -> bool:
 
 
 @st.cache_data(show_spinner=False)
-def raw_get_docs_nf_for_detetive(raw_db_path: str, ano: int):
+def raw_has_column(raw_db_path: str, table: str, col: str, versao_raw: str) -> bool:
+    try:
+        with connect(raw_db_path) as con:
+            info = pd.read_sql(f"PRAGMA table_info({table})", con)
+        return col in info["name"].tolist()
+    except Exception:
+        return False
+
+
+@st.cache_data(show_spinner=False)
+def raw_get_docs_nf_for_detetive(raw_db_path: str, ano: int, versao_raw: str):
     """
     Puxa um índice mínimo para detetive:
     doc_id, n_nf, chave, nome_emit, data_emissao, valor_total
+    (versao_raw = versao_arquivo(raw_db_path): o cache renova quando o RAW muda)
+
+    Com o RAW materializado (python -m processing.raw_documentos) lê só o ano pedido pelo
+    índice de ano e já com o n_nf_clean; sem isso, lê tudo e calcula aqui, como antes.
     """
     if not raw_has_table(raw_db_path, "raw_documentos"):
         return pd.DataFrame()
 
+    materializado = raw_has_column(raw_db_path, "raw_documentos", "n_nf_clean", versao_raw)
     with connect(raw_db_path) as con:
-        df = pd.read_sql(
-            """
-            SELECT
-              doc_id,
-              doc_tipo,
-              n_nf,
-              chave,
-              nome_emit,
-              data_emissao,
-              valor_total
-            FROM raw_documentos
-            """,
-            con
-        )
+        if materializado:
+            df = pd.read_sql(SQL_DOCS_DETETIVE, con, params=[ano])
+        else:
+            df = pd.read_sql(SQL_DOCS_DETETIVE_TUDO, con)
 
     if df.empty:
         return df
 
     df["data_emissao"] = pd.to_datetime(df["data_emissao"], errors="coerce")
-    df["ano"] = df["data_emissao"].dt.year
+    if materializado:
+        # linhas ingeridas depois da última materialização vêm com ano/n_nf_clean NULL
+        df["ano"] = df["ano"].fillna(df["data_emissao"].dt.year)
+    else:
+        df["ano"] = df["data_emissao"].dt.year
+        df["n_nf_clean"] = None
     df = df[df["ano"] == ano].copy()
 
-    # normaliza n_nf para match
-    if "n_nf" in df.columns:
-        df["n_nf_clean"] = df["n_nf"].astype(str).apply(limpar_nf_excel)
-    else:
-        df["n_nf_clean"] = ""
+    # normaliza n_nf para match (o que ainda não veio materializado)
+    pendentes = df["n_nf_clean"].isna()
+    if pendentes.any():
+        df.loc[pendentes, "n_nf_clean"] = df.loc[pendentes, "n_nf"].astype(str).apply(limpar_nf_excel)
 
     return df
 
 
-def enriquecer_detetive(df_docs_raw: pd.DataFrame, df_mapa: pd.DataFrame):
-    """
-    Gera uma tabela de match por NF (e, se houver, fornecedor).
-    Não altera o banco. É um “painel de inteligência”, como antes.
-    """
-    if df_docs_raw.empty or df_mapa.empty:
-        return pd.DataFrame(), 0
-
-    df_mapa = df_mapa.copy()
-    df_mapa.columns = [str(c).upper().strip() for c in df_mapa.columns]
-
-    # tenta achar colunas
-    mapa_cols = {"NF": None, "FORNECEDOR": None, "AF": None, "CC": None, "PLANO": None}
-    sinonimos = {
-        "NF": ["NF", "NOTA", "N_NF", "NUMERO"],
-        "FORNECEDOR": ["FORNECEDOR", "NOME", "EMPRESA"],
-        "AF": ["AF/AS", "AF", "AS", "PEDIDO", "OC"],
-        "PLANO": ["PLANO DE CONTAS", "PLANO", "CONTA"],
-        "CC": ["CC", "CENTRO", "CUSTO", "DEPARTAMENTO"],
-    }
-    for chave, lista in sinonimos.items():
-        for col_real in df_mapa.columns:
-            if any(nome == col_real or nome in col_real for nome in lista):
-                if chave == "CC" and "PLANO" in col_real:
-                    continue
-                mapa_cols[chave] = col_real
-                break
-
-    if not mapa_cols["NF"]:
-        return pd.DataFrame(), 0
-
-    df_mapa["nf_key"] = df_mapa[mapa_cols["NF"]].apply(limpar_nf_excel)
-
-    # índice por NF
-    dict_mapa = {}
-    for _, row in df_mapa.iterrows():
-        nf = row.get("nf_key", "")
-        if nf:
-            dict_mapa.setdefault(nf, []).append(row)
-
-    out_rows = []
-    total_matches = 0
-
-    for _, r in df_docs_raw.iterrows():
-        nf_xml = str(r.get("n_nf_clean") or "")
-        forn_xml = str(r.get("nome_emit") or "")
-
-        candidatos = dict_mapa.get(nf_xml, [])
-        melhor = None
-        melhor_score = 0
-
-        if candidatos:
-            for cand in candidatos:
-                score = 50
-                if mapa_cols["FORNECEDOR"]:
-                    nome_mapa = str(cand.get(mapa_cols["FORNECEDOR"], ""))
-                    score = calcular_similaridade(forn_xml, nome_mapa)
-
-                if score > melhor_score:
-                    melhor_score = score
-                    melhor = cand
-
-        status = "Não Encontrado"
-        aceitar = False
-
-        if melhor is not None:
-            if melhor_score > 60:
-                aceitar = True
-                status = "✅ Confirmado"
-            elif len(candidatos) == 1 and melhor_score > 30:
-                aceitar = True
-                status = "⚠️ Aproximado"
-            elif len(candidatos) == 1 and not mapa_cols["FORNECEDOR"]:
-                aceitar = True
-                status = "⚠️ Só NF"
-
-        val_af = "Não Mapeado"
-        val_cc = "Não Mapeado"
-        val_plano = "Não Mapeado"
-
-        if aceitar:
-            total_matches += 1
-            if mapa_cols["AF"]:
-                val_af = str(melhor.get(mapa_cols["AF"], "Não Mapeado"))
-            if mapa_cols["CC"]:
-                val_cc = str(melhor.get(mapa_cols["CC"], "Não Mapeado"))
-            if mapa_cols["PLANO"]:
-                val_plano = str(melhor.get(mapa_cols["PLANO"], "Não Mapeado"))
-
-        out_rows.append({
-            "NF": nf_xml,
-            "Fornecedor_XML": forn_xml,
-            "Valor_Doc": r.get("valor_total", 0.0),
-            "Status": status,
-            "AF_MAPA": val_af,
-            "CC_MAPA": val_cc,
-            "PLANO_MAPA": val_plano,
-            "Score": float(melhor_score),
-        })
-
-    df_out = pd.DataFrame(out_rows)
-    return df_out, total_matches
-
-
 # =========================
 # Sidebar
 # =========================
@@ -553,7 +315,7 @@ with st.sidebar:
 # Load core datasets
 # =========================
 gastos_tipo, trend_gasto, trend_imp, has_imp = load_kpis_gastos(curated_db, int(ano_sel))
-itens = load_itens_agg(curated_db, int(ano_sel))
+itens = load_itens_agg(curated_db, int(ano_sel), motor_regras("simples").versao)
 fornecedores = load_fornecedores(curated_db, int(ano_sel))
 
 gasto_total = float(gastos_tipo["valor_total"].sum()) if not gastos_tipo.empty else 0.0
@@ -586,19 +348,21 @@ det_matches = 0
 
 if run_detetive and uploaded_files:
     if raw_available(raw_db) and raw_has_table(raw_db, "raw_documentos"):
-        df_mapa = pd.DataFrame()
+        cache = cache_detetive()
+        mapas = []
         for f in uploaded_files:
-            df_t = carregar_arquivo_flexivel(f)
-            if df_t is not None and not df_t.empty:
-                df_t.columns = [str(c).upper().strip() for c in df_t.columns]
-                df_mapa = pd.concat([df_mapa, df_t], ignore_index=True)
+            # só relê o arquivo se esse conteúdo nunca passou pelo Detetive
+            h, m = cache.mapa(f.getvalue(), lambda f=f: carregar_mapa(f), f.name)
+            if m is not None:
+                mapas.append((h, m))
 
-        if df_mapa.empty:
+        if not mapas:
             st.warning("Nenhum mapa válido carregado.")
         else:
             with st.spinner("Rodando Detetive (RAW → Mapa)..."):
-                df_docs_raw = raw_get_docs_nf_for_detetive(raw_db, int(ano_sel))
-                df_det, det_matches = enriquecer_detetive(df_docs_raw, df_mapa)
+                versao_raw = versao_arquivo(raw_db)
+                df_docs_raw = raw_get_docs_nf_for_detetive(raw_db, int(ano_sel), versao_raw)
+                df_det, det_matches = cache.enriquecer(df_docs_raw, mapas, int(ano_sel), versao_raw)
     else:
         st.warning(
             "DB RAW não encontrado (ou sem tabela raw_documentos). "
@@ -618,14 +382,14 @@ with tabs[0]:
     st.subheader("📌 Visão Executiva")
 
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("💰 Gasto Total", brl(gasto_total), help="NFe + CTe + demais documentos no curated.")
-    c2.metric("🎯 Saving Potencial (Equalizado)", brl(saving_eq_total), help="(Último preço - Média histórica) × volume do ano (>=0).")
-    c3.metric("⚠️ Gasto com Itens Críticos", brl(gasto_critico), help="Regra por regex na descrição (temporário).")
+    c1.metric("💰 Gasto Total", format_brl(gasto_total), help="NFe + CTe + demais documentos no curated.")
+    c2.metric("🎯 Saving Potencial (Equalizado)", format_brl(saving_eq_total), help="(Último preço - Média histórica) × volume do ano (>=0).")
+    c3.metric("⚠️ Gasto com Itens Críticos", format_brl(gasto_critico), help="Regra por regex na descrição (temporário).")
     if has_imp:
-        c4.metric("🏛️ Imposto Total", brl(imposto_total), help="Imposto por documento no curated.")
-        st.caption(f"Carga tributária estimada: **{pct(carga_trib)}**  |  Frete (CTe): **{brl(gasto_cte)}**  |  UNKNOWN: **{brl(gasto_unknown)}**")
+        c4.metric("🏛️ Imposto Total", format_brl(imposto_total), help="Imposto por documento no curated.")
+        st.caption(f"Carga tributária estimada: **{format_perc(carga_trib)}**  |  Frete (CTe): **{format_brl(gasto_cte)}**  |  UNKNOWN: **{format_brl(gasto_unknown)}**")
     else:
-        c4.metric("🚚 Frete (CTe)", brl(gasto_cte), help="Total de CTe no ano (valor_total).")
+        c4.metric("🚚 Frete (CTe)", format_brl(gasto_cte), help="Total de CTe no ano (valor_total).")
         st.caption("Imposto ainda não materializado no seu curated atual (se quiser, eu ajusto o ETL para garantir).")
 
     st.divider()
@@ -664,7 +428,7 @@ with tabs[0]:
             fig = px.bar(df_f, x="gasto", y="nome_emit", orientation="h")
             fig.update_layout(template="plotly_white", height=360, xaxis_title="R$", yaxis_title="")
             st.plotly_chart(fig, width="stretch")
-            st.caption(f"Concentração Top 10: **{pct(top10_share)}**")
+            st.caption(f"Concentração Top 10: **{format_perc(top10_share)}**")
 
     with col2:
         st.markdown("#### 🧩 Gasto por categoria (heurística)")
@@ -830,8 +594,8 @@ with tabs[3]:
             st.markdown("#### Concentração")
             total = float(fornecedores["gasto"].sum())
             top20 = float(fornecedores.head(20)["gasto"].sum())
-            st.metric("Top 10 Share", pct(top10_share))
-            st.metric("Top 20 Share", pct(top20 / total if total > 0 else 0))
+            st.metric("Top 10 Share", format_perc(top10_share))
+            st.metric("Top 20 Share", format_perc(top20 / total if total > 0 else 0))
             st.metric("Qtd. fornecedores", f"{len(fornecedores)}")
 
 # ---------------------------------------------------------
@@ -909,30 +673,35 @@ with tabs[4]:
 with tabs[5]:
     st.subheader("🔍 Busca")
 
-    df_busca = load_linhas_para_busca(curated_db, int(ano_sel))
+    POR_PAGINA = 200
+    c1, c2 = st.columns([4, 1])
+    q = c1.text_input("Pesquisar por item / fornecedor / NCM", value="").strip()
+    pagina = c2.number_input("Página", min_value=1, value=1, step=1)
+
+    df_busca, total = buscar_linhas(curated_db, int(ano_sel), q, int(pagina), POR_PAGINA)
     if df_busca.empty:
-        st.info("Sem linhas para busca no ano selecionado.")
+        st.info("Nenhuma linha encontrada." if q else "Sem linhas para busca no ano selecionado.")
     else:
-        q = st.text_input("Pesquisar por item / fornecedor / NCM", value="").strip()
-        base = df_busca.copy()
-
-        if q:
-            q_up = q.upper()
-            base = base[
-                base["descricao"].astype(str).str.upper().str.contains(q_up, na=False)
-                | base["nome_emit"].astype(str).str.upper().str.contains(q_up, na=False)
-                | base["ncm"].astype(str).str.upper().str.contains(q_up, na=False)
-            ]
+        inicio = (int(pagina) - 1) * POR_PAGINA
+        if total is not None:
+            paginas = max(1, -(-total // POR_PAGINA))
+            escopo = "em todos os anos, por relevância" if q else f"em {ano_sel}, por valor"
+            st.caption(f"{total:,}".replace(",", ".") + f" linhas {escopo} · página {int(pagina)} de {paginas}")
+        else:
+            st.caption(f"Linhas {inicio + 1}–{inicio + len(df_busca)} em {ano_sel} (DB curated sem índice de busca: "
+                       "rode processing.curated para buscar em todos os anos).")
 
         st.dataframe(
-            base.sort_values("v_total", ascending=False).head(2000),
+            df_busca,
             width="stretch",
             hide_index=True,
             column_config={
+                "ano": st.column_config.NumberColumn("Ano", format="%d"),
                 "qtd": st.column_config.NumberColumn("Qtd", format="%.2f"),
                 "v_unit": st.column_config.NumberColumn("Preço Unit", format="R$ %.2f"),
                 "v_total": st.column_config.NumberColumn("Total", format="R$ %.2f"),
             }
         )
 
-        st.caption("Dica: use busca por NCM (ex: 4015) ou parte do nome do fornecedor.")
+        st.caption("Dica: busque por começo de palavra (ex: PARAF), NCM (ex: 4015) ou nome do fornecedor; "
+                   "todas as palavras precisam aparecer.")
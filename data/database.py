@@ -1 +1,218 @@
+"""
+Esquema de índices do DB CURATED e conferência dos planos de execução dos loaders.
 
+Cada loader do app_compras.py (SQL em data.queries) tem um índice que o atende: todos
+começam por `ano` e, quando dá, cobrem as colunas lidas (o SQLite responde só pelo índice,
+sem visitar a tabela). verificar_planos() roda EXPLAIN QUERY PLAN em cada loader e
+aponta qualquer varredura completa das tabelas com uma linha por item (TABELAS_VIGIADAS).
+
+CURATED_DB é o caminho padrão do DB curated (gerado pelo processing.curated, lido pelo app).
+abrir_leitura()/PoolLeitura são o acesso do app aos DBs (curated e raw): arquivo aberto
+só para leitura (URI mode=ro), PRAGMAs de leitura e conexões reaproveitadas entre reruns.
+versao_arquivo() identifica o estado do arquivo p/ chavear caches do que foi lido dele.
+"""
+import os
+import queue
+import re
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+from data.queries import (
+    SQL_ANOS, SQL_KPIS_TIPO, SQL_KPIS_TIPO_SEM_IMPOSTO, SQL_TREND_GASTO, SQL_TREND_IMPOSTO,
+    SQL_ITENS_AGG, SQL_FORNECEDORES, SQL_LINHAS_BUSCA, SQL_HIST_ITEM_MES,
+    SQL_LINHAS_BUSCA_TOTAL, SQL_BUSCA_FTS, SQL_BUSCA_FTS_TOTAL, SQL_BUSCA_LIKE, expressao_fts,
+    SQL_COMPLIANCE_RESUMO, SQL_COMPLIANCE_CATEGORIAS, SQL_COMPLIANCE_FORNECEDORES, SQL_COMPLIANCE_OFENSORES,
+    sql_relatorio_acao,
+)
+
+CURATED_DB = os.path.join("data", "curated", "suprimentos_curated.sqlite")
+
+# (nome, tabela, colunas). Colunas que não existirem na tabela (ex.: imposto_total num
+# base_compras sem impostos) ficam de fora do índice.
+INDICES_CURATED = [
+    # load_itens_agg + load_hist_item_mes + buscar_linhas sem termo (filtro por ano)
+    ("idx_fato_itens_ano_item", "fato_itens",
+     ["ano", "item_key", "mes_ano", "nome_emit", "descricao", "ncm", "qtd", "v_unit", "v_total"]),
+    # load_fornecedores (GROUP BY nome_emit, COUNT DISTINCT item_key)
+    ("idx_fato_itens_ano_fornecedor", "fato_itens", ["ano", "nome_emit", "item_key", "v_total"]),
+    # load_kpis_gastos: totais por doc_tipo
+    ("idx_fato_gastos_ano_tipo", "fato_gastos", ["ano", "doc_tipo", "valor_total", "imposto_total"]),
+    # load_kpis_gastos: tendência mensal
+    ("idx_fato_gastos_ano_mes", "fato_gastos", ["ano", "mes_ano", "valor_total", "imposto_total"]),
+]
+
+# RAW do Detetive: ano materializado pelo processing.raw_documentos
+INDICES_RAW = [
+    ("idx_raw_documentos_ano", "raw_documentos", ["ano"]),
+]
+
+# fato_gastos tem uma linha por documento (e list_years_curated lê todas de propósito);
+# as varreduras que pesam são as das tabelas com uma linha por item de NF.
+TABELAS_VIGIADAS = ("fato_itens", "compliance_flags")
+
+# Conexões do app: nunca escrevem; mmap + cache maior p/ as agregações dos loaders
+PRAGMAS_LEITURA = {
+    "query_only": "ON",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16384,  # KiB por conexão
+    "temp_store": "MEMORY",
+}
+
+
+def versao_arquivo(db_path):
+    """
+    Versão de um DB pelo arquivo: mtime + tamanho do .db e do -wal (com WAL, as escritas ficam
+    no -wal até o checkpoint). Muda a cada escrita; serve de chave de cache do que se lê dele.
+    """
+    partes = []
+    for caminho in (str(db_path), f"{db_path}-wal"):
+        try:
+            st = os.stat(caminho)
+        except FileNotFoundError:
+            continue
+        partes.append(f"{st.st_mtime_ns}-{st.st_size}")
+    return "|".join(partes)
+
+
+def abrir_leitura(db_path):
+    """Conexão read-only (falha se o arquivo não existir, em vez de criar um DB vazio)."""
+    con = sqlite3.connect(Path(db_path).absolute().as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+    for pragma, valor in PRAGMAS_LEITURA.items():
+        con.execute(f"PRAGMA {pragma} = {valor}")
+    return con
+
+
+class PoolLeitura:
+    """
+    Pool de conexões read-only de um DB. Cada `with pool.conexao() as con` pega uma conexão
+    livre (ou abre uma nova) e a devolve no fim; threads diferentes nunca dividem conexão.
+    """
+
+    def __init__(self, db_path, max_ociosas=8):
+        self.db_path = db_path
+        self._livres = queue.LifoQueue(maxsize=max_ociosas)
+
+    @contextmanager
+    def conexao(self):
+        try:
+            con = self._livres.get_nowait()
+        except queue.Empty:
+            con = abrir_leitura(self.db_path)
+        try:
+            yield con
+        except Exception:
+            con.close()  # conexão em estado desconhecido não volta para o pool
+            raise
+        if con.in_transaction:
+            con.rollback()
+        try:
+            self._livres.put_nowait(con)
+        except queue.Full:
+            con.close()
+
+    def fechar(self):
+        while True:
+            try:
+                self._livres.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _ddl_indice(con, nome, tabela, colunas):
+    existentes = {r[1] for r in con.execute(f"PRAGMA table_info({tabela})")}
+    cols = [c for c in colunas if c in existentes]
+    return f"CREATE INDEX {nome} ON {tabela} ({', '.join(cols)})"
+
+
+def garantir_indices(con, indices=INDICES_CURATED):
+    """
+    Cria os índices da lista (padrão: INDICES_CURATED); os que existirem com outra
+    definição (layout antigo) são recriados. Devolve os nomes criados/recriados.
+    """
+    atuais = dict(con.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"))
+    criados = []
+    for nome, tabela, colunas in indices:
+        ddl = _ddl_indice(con, nome, tabela, colunas)
+        if atuais.get(nome) == ddl:
+            continue
+        con.execute(f"DROP INDEX IF EXISTS {nome}")
+        con.execute(ddl)
+        criados.append(nome)
+    return criados
+
+
+def consultas_loaders(con, ano=None, item_key=None):
+    """(loader, sql, params) de cada consulta do app, com parâmetros tirados do próprio DB."""
+    if ano is None:
+        r = con.execute("SELECT ano FROM fato_itens WHERE ano IS NOT NULL ORDER BY ano DESC LIMIT 1").fetchone()
+        ano = r[0] if r else 0
+    if item_key is None:
+        r = con.execute("SELECT item_key FROM fato_itens WHERE ano = ? LIMIT 1", [ano]).fetchone()
+        item_key = r[0] if r else ""
+    termo = (item_key or "").split("|")[0][:4]
+
+    tem_imposto = "imposto_total" in {r[1] for r in con.execute("PRAGMA table_info(fato_gastos)")}
+    consultas = [
+        ("list_years_curated", SQL_ANOS, []),
+        ("load_kpis_gastos", SQL_KPIS_TIPO if tem_imposto else SQL_KPIS_TIPO_SEM_IMPOSTO, [ano]),
+        ("load_kpis_gastos/trend", SQL_TREND_GASTO, [ano]),
+        ("load_itens_agg", SQL_ITENS_AGG, [ano]),
+        ("load_fornecedores", SQL_FORNECEDORES, [ano]),
+        ("buscar_linhas/ano", SQL_LINHAS_BUSCA, [ano, 200, 0]),
+        ("buscar_linhas/ano_total", SQL_LINHAS_BUSCA_TOTAL, [ano]),
+        ("buscar_linhas/like", SQL_BUSCA_LIKE, [ano, f"%{termo}%", 200, 0]),
+        ("load_hist_item_mes", SQL_HIST_ITEM_MES, [ano, item_key]),
+    ]
+    if con.execute("SELECT 1 FROM sqlite_master WHERE name = 'fato_itens_fts'").fetchone():
+        consultas += [
+            ("buscar_linhas", SQL_BUSCA_FTS, [expressao_fts(termo), 200, 0]),
+            ("buscar_linhas/total", SQL_BUSCA_FTS_TOTAL, [expressao_fts(termo)]),
+        ]
+    if con.execute("SELECT 1 FROM sqlite_master WHERE name = 'compliance_flags'").fetchone():
+        r = con.execute("SELECT categoria, nome_emit FROM compliance_flags WHERE risco = 1 LIMIT 1").fetchone()
+        categoria, fornecedor = r if r else ("", "")
+        consultas += [
+            ("compliance/resumo", SQL_COMPLIANCE_RESUMO, []),
+            ("compliance/categorias", SQL_COMPLIANCE_CATEGORIAS, []),
+            ("compliance/fornecedores", SQL_COMPLIANCE_FORNECEDORES, []),
+            ("compliance/ofensores", SQL_COMPLIANCE_OFENSORES, [10]),
+            ("compliance/relatorio", *sql_relatorio_acao()),
+            ("compliance/relatorio_categoria", *sql_relatorio_acao([categoria])),
+            ("compliance/relatorio_fornecedor", *sql_relatorio_acao((), [fornecedor])),
+        ]
+    if tem_imposto:
+        consultas.insert(3, ("load_kpis_gastos/trend_imp", SQL_TREND_IMPOSTO, [ano]))
+    return consultas
+
+
+def _apelidos(sql):
+    """Nome/apelido -> tabela vigiada, p/ reconhecer 'SCAN i' quando a consulta usa 'fato_itens i'."""
+    nomes = {}
+    for tabela in TABELAS_VIGIADAS:
+        nomes[tabela] = tabela
+        for m in re.finditer(rf"\b{tabela}\s+(?:AS\s+)?(\w+)", sql, flags=re.IGNORECASE):
+            if m.group(1).upper() not in ("WHERE", "GROUP", "ORDER", "LIMIT", "LEFT", "JOIN", "INNER", "ON"):
+                nomes[m.group(1)] = tabela
+    return nomes
+
+
+def plano(con, sql, params):
+    return [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def verificar_planos(con, ano=None, item_key=None):
+    """
+    Roda EXPLAIN QUERY PLAN nos loaders. Devolve (planos, problemas):
+    planos = {loader: [linhas do plano]}, problemas = [(loader, linha)] com SCAN de uma TABELAS_VIGIADAS.
+    """
+    planos, problemas = {}, []
+    for loader, sql, params in consultas_loaders(con, ano, item_key):
+        linhas = plano(con, sql, params)
+        planos[loader] = linhas
+        nomes = _apelidos(sql)
+        for det in linhas:
+            m = re.match(r"SCAN (\w+)", det)
+            if m and m.group(1) in nomes:
+                problemas.append((loader, det))
+    return planos, problemas
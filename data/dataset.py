@@ -0,0 +1,98 @@
+"""
+Histórico de compras (base_compras) no formato que as abas de ui/ recebem.
+
+carregar_historico() lê o DB raw uma vez (só leitura), deriva Categoria (classificador
+"turbo"), Imposto_Total e as colunas de compliance, e guarda tudo com dtypes enxutos:
+- textos repetidos (fornecedor, descrição, NCM, unidade, categoria...) como category:
+  um código inteiro por linha em vez de um objeto str;
+- preço unitário e quantidade em float32 quando a coluna inteira cabe sem perder casas
+  (totais em R$ seguem float64: são somados em milhões de linhas nos KPIs).
+
+As linhas ficam agrupadas por fornecedor, da compra mais recente para a mais antiga: as de
+um fornecedor são um recorte contíguo (utils.agregacoes.PerfisFornecedores).
+
+Cada aba declara as colunas que usa e recebe visao(df, colunas): um recorte de colunas
+do mesmo frame, sem cópia dos dados. Com copy-on-write (padrão do pandas 3) nenhuma aba
+altera o frame compartilhado: o que ela escrever vira cópia só dela.
+"""
+import numpy as np
+import pandas as pd
+
+from data.database import abrir_leitura
+from utils.classifiers import classificar_materiais_turbo
+from utils.compliance import flags_compliance
+
+RAW_DB = "compras_suprimentos.db"
+
+COLUNAS_BASE = [
+    "data_emissao", "nome_emit", "cnpj_emit", "n_nf", "cod_prod", "desc_prod", "ncm",
+    "cod_tributario", "u_medida", "qtd_real", "v_unit_real", "v_total_item",
+]
+COLUNAS_IMPOSTO = ["v_icms", "v_ipi", "v_pis", "v_cofins"]
+
+CATEGORICAS = [
+    "nome_emit", "cnpj_emit", "n_nf", "cod_prod", "desc_prod", "ncm", "cod_tributario",
+    "u_medida", "Categoria", "Doc_Obrigatoria",
+]
+# coluna -> casas decimais que o float32 precisa preservar
+CASAS_FLOAT32 = {"v_unit_real": 4, "qtd_real": 4}
+
+
+def cabe_em_float32(s, casas):
+    """True se todos os valores voltam iguais (até `casas` decimais) depois de float32."""
+    v = s.to_numpy(dtype=np.float64, na_value=np.nan)
+    ida_volta = v.astype(np.float32).astype(np.float64)
+    ok = np.isnan(v) | (np.abs(ida_volta - v) < 0.5 * 10.0 ** -casas)
+    return bool(ok.all())
+
+
+def otimizar_dtypes(df, categoricas=CATEGORICAS, casas=CASAS_FLOAT32):
+    """Converte (no próprio df) as colunas repetidas em category e as que cabem em float32."""
+    for col in categoricas:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col, n in casas.items():
+        if col in df.columns and cabe_em_float32(df[col], n):
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def ler_base_compras(db_path=RAW_DB):
+    """Colunas do base_compras que as abas usam (impostos somados em Imposto_Total)."""
+    con = abrir_leitura(db_path)
+    try:
+        existentes = {r[1] for r in con.execute("PRAGMA table_info(base_compras)")}
+        impostos = [c for c in COLUNAS_IMPOSTO if c in existentes]
+        cols = [c for c in COLUNAS_BASE if c in existentes] + impostos
+        df = pd.read_sql_query(f"SELECT {', '.join(cols)} FROM base_compras", con)
+    finally:
+        con.close()
+    if impostos:
+        df["Imposto_Total"] = df[impostos].apply(pd.to_numeric, errors="coerce").fillna(0).sum(axis=1)
+        df = df.drop(columns=impostos)
+    return df
+
+
+def carregar_historico(db_path=RAW_DB):
+    """Frame único do histórico: derivadas calculadas uma vez, dtypes enxutos."""
+    df = ler_base_compras(db_path)
+    df["data_emissao"] = pd.to_datetime(df["data_emissao"], errors="coerce")
+    for col in ("qtd_real", "v_unit_real", "v_total_item"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["Categoria"] = classificar_materiais_turbo(df)
+    df = otimizar_dtypes(df)
+    flags = flags_compliance(df["Categoria"], df["desc_prod"], df["ncm"] if "ncm" in df.columns else None)
+    df["Risco_Compliance"] = flags["Risco_Compliance"].to_numpy()
+    df["Doc_Obrigatoria"] = flags["Doc_Obrigatoria"].astype("category").to_numpy()
+    return df.sort_values(["nome_emit", "data_emissao"], ascending=[True, False], kind="stable",
+                          na_position="last", ignore_index=True)
+
+
+def visao(df, colunas):
+    """Recorte de colunas (as que existirem, na ordem pedida) do frame compartilhado."""
+    return df[[c for c in colunas if c in df.columns]]
+
+
+def memoria(df):
+    """Bytes ocupados pelo frame (strings contadas por inteiro)."""
+    return int(df.memory_usage(deep=True, index=True).sum())
@@ -0,0 +1,222 @@
+"""
+SQL dos loaders do app_compras.py sobre o DB CURATED (e do Detetive sobre o RAW).
+
+Ficam aqui (e não inline no app) para que o data.database possa conferir o plano
+de execução de cada um contra os índices provisionados.
+"""
+import re
+
+SQL_ANOS = """
+SELECT DISTINCT ano FROM fato_gastos WHERE ano IS NOT NULL ORDER BY ano DESC
+"""
+
+SQL_KPIS_TIPO = """
+SELECT
+  doc_tipo,
+  SUM(COALESCE(valor_total,0)) AS valor_total,
+  SUM(COALESCE(imposto_total,0)) AS imposto_total
+FROM fato_gastos
+WHERE ano = ?
+GROUP BY doc_tipo
+"""
+
+SQL_KPIS_TIPO_SEM_IMPOSTO = """
+SELECT
+  doc_tipo,
+  SUM(COALESCE(valor_total,0)) AS valor_total
+FROM fato_gastos
+WHERE ano = ?
+GROUP BY doc_tipo
+"""
+
+SQL_TREND_GASTO = """
+SELECT
+  mes_ano,
+  SUM(COALESCE(valor_total,0)) AS gasto
+FROM fato_gastos
+WHERE ano = ? AND mes_ano IS NOT NULL
+GROUP BY mes_ano
+ORDER BY mes_ano
+"""
+
+SQL_TREND_IMPOSTO = """
+SELECT
+  mes_ano,
+  SUM(COALESCE(imposto_total,0)) AS imposto
+FROM fato_gastos
+WHERE ano = ? AND mes_ano IS NOT NULL
+GROUP BY mes_ano
+ORDER BY mes_ano
+"""
+
+SQL_ITENS_AGG = """
+SELECT
+  i.item_key,
+  i.descricao,
+  i.ncm,
+  SUM(COALESCE(i.v_total,0)) AS gasto_ano,
+  SUM(COALESCE(i.qtd,0))     AS qtd_ano,
+  AVG(NULLIF(i.v_unit,0))    AS preco_medio_ano,
+
+  b.preco_medio_hist,
+  b.menor_preco_hist,
+  b.maior_preco_hist,
+  b.ultimo_preco,
+  b.ultima_data,
+  b.ultimo_fornecedor
+FROM fato_itens i
+LEFT JOIN bench_item b ON b.item_key = i.item_key
+WHERE i.ano = ?
+GROUP BY
+  i.item_key, i.descricao, i.ncm,
+  b.preco_medio_hist, b.menor_preco_hist, b.maior_preco_hist,
+  b.ultimo_preco, b.ultima_data, b.ultimo_fornecedor
+"""
+
+SQL_FORNECEDORES = """
+SELECT
+  nome_emit,
+  COUNT(DISTINCT item_key) AS itens_distintos,
+  SUM(COALESCE(v_total,0)) AS gasto
+FROM fato_itens
+WHERE ano = ?
+GROUP BY nome_emit
+ORDER BY gasto DESC
+"""
+
+# Busca sem termo: as maiores linhas do ano, paginadas
+SQL_LINHAS_BUSCA = """
+SELECT
+  ano, mes_ano, nome_emit, descricao, ncm, unidade, qtd, v_unit, v_total, item_key
+FROM fato_itens
+WHERE ano = ?
+ORDER BY v_total DESC, id
+LIMIT ? OFFSET ?
+"""
+
+SQL_LINHAS_BUSCA_TOTAL = """
+SELECT COUNT(*) FROM fato_itens WHERE ano = ?
+"""
+
+# Busca com termo (todos os anos): fato_itens_fts do processing.curated, por relevância (bm25)
+SQL_BUSCA_FTS = """
+SELECT
+  f.ano, f.mes_ano, f.nome_emit, f.descricao, f.ncm, f.unidade, f.qtd, f.v_unit, f.v_total, f.item_key
+FROM (
+  -- ordena e pagina só no índice; a fato_itens é lida só para as linhas da página
+  SELECT rowid, rank FROM fato_itens_fts
+  WHERE fato_itens_fts MATCH ?
+  ORDER BY rank, rowid
+  LIMIT ? OFFSET ?
+) r
+JOIN fato_itens f ON f.id = r.rowid
+ORDER BY r.rank, r.rowid
+"""
+
+SQL_BUSCA_FTS_TOTAL = """
+SELECT COUNT(*) FROM fato_itens_fts WHERE fato_itens_fts MATCH ?
+"""
+
+# Curated sem FTS (build antigo): substring no ano selecionado, como a Busca fazia
+SQL_BUSCA_LIKE = """
+SELECT
+  ano, mes_ano, nome_emit, descricao, ncm, unidade, qtd, v_unit, v_total, item_key
+FROM fato_itens
+WHERE ano = ?1 AND (descricao LIKE ?2 OR nome_emit LIKE ?2 OR ncm LIKE ?2)
+ORDER BY v_total DESC, id
+LIMIT ?3 OFFSET ?4
+"""
+
+
+def expressao_fts(texto):
+    """
+    Termo digitado -> MATCH do FTS5: cada palavra vira prefixo ("PARAF" acha "PARAFUSO",
+    "4015" acha o NCM 40151900) e todas precisam aparecer (em qualquer das colunas).
+    Aspas em volta de cada palavra: operadores/pontuação do usuário não viram sintaxe FTS.
+    """
+    palavras = re.findall(r"\w+", str(texto or ""))
+    return " AND ".join(f'"{p}"*' for p in palavras)
+
+
+SQL_HIST_ITEM_MES = """
+SELECT
+  mes_ano,
+  nome_emit,
+  AVG(NULLIF(v_unit,0)) AS preco_medio,
+  SUM(COALESCE(qtd,0)) AS qtd,
+  SUM(COALESCE(v_total,0)) AS gasto
+FROM fato_itens
+WHERE ano = ? AND item_key = ? AND mes_ano IS NOT NULL
+GROUP BY mes_ano, nome_emit
+ORDER BY mes_ano
+"""
+
+
+# ---- Aba Compliance (ui.tab_compliance) sobre a compliance_flags (processing.compliance)
+SQL_COMPLIANCE_RESUMO = """
+SELECT
+  COUNT(*) AS itens_risco,
+  TOTAL(v_total) AS valor_risco,
+  COUNT(DISTINCT nome_emit) AS fornecedores,
+  (SELECT COUNT(*) FROM compliance_flags WHERE critico = 1) AS itens_criticos
+FROM compliance_flags
+WHERE risco = 1
+"""
+
+SQL_COMPLIANCE_CATEGORIAS = """
+SELECT categoria, COUNT(*) AS itens
+FROM compliance_flags
+WHERE risco = 1 AND categoria IS NOT NULL
+GROUP BY categoria
+ORDER BY itens DESC
+"""
+
+SQL_COMPLIANCE_FORNECEDORES = """
+SELECT DISTINCT nome_emit FROM compliance_flags WHERE risco = 1 AND nome_emit IS NOT NULL
+"""
+
+SQL_COMPLIANCE_OFENSORES = """
+SELECT
+  nome_emit,
+  COUNT(desc_prod) AS Itens_Irregulares,
+  TOTAL(v_total) AS Valor_Risco,
+  MAX(data_emissao) AS Ultima_Infracao
+FROM compliance_flags
+WHERE risco = 1 AND nome_emit IS NOT NULL
+GROUP BY nome_emit
+ORDER BY Itens_Irregulares DESC
+LIMIT ?
+"""
+
+# {filtro}: "" ou condições extras (categoria/nome_emit IN ...) de sql_relatorio_acao
+SQL_COMPLIANCE_RELATORIO = """
+SELECT data_emissao, nome_emit, n_nf, desc_prod, categoria, v_unit, doc_obrigatoria
+FROM compliance_flags
+WHERE risco = 1{filtro}
+ORDER BY categoria, item_id
+"""
+
+
+def sql_relatorio_acao(categorias=(), fornecedores=()):
+    """(sql, params) do relatório de ação com os filtros da aba (listas vazias = sem filtro)."""
+    filtro, params = "", []
+    for coluna, valores in (("categoria", categorias), ("nome_emit", fornecedores)):
+        if valores:
+            filtro += f" AND {coluna} IN ({', '.join('?' * len(valores))})"
+            params += list(valores)
+    return SQL_COMPLIANCE_RELATORIO.format(filtro=filtro), params
+
+
+# ---- RAW (Detetive). ano/n_nf_clean vêm do processing.raw_documentos; linhas ingeridas
+# depois da última materialização (os dois NULL) vêm junto e são calculadas no app.
+SQL_DOCS_DETETIVE = """
+SELECT doc_id, doc_tipo, n_nf, chave, nome_emit, data_emissao, valor_total, ano, n_nf_clean
+FROM raw_documentos
+WHERE ano = ? OR (ano IS NULL AND n_nf_clean IS NULL)
+"""
+
+# RAW ainda sem as colunas materializadas: lê tudo e filtra o ano no app
+SQL_DOCS_DETETIVE_TUDO = """
+SELECT doc_id, doc_tipo, n_nf, chave, nome_emit, data_emissao, valor_total
+FROM raw_documentos
+"""
@@ -1,154 +1,500 @@
-import xml.etree.ElementTree as ET
-import sqlite3
-import os
-
-# --- CONFIGURAÇÕES ---
-PASTA_RAIZ = r"C:\Users\Compras.2\Documents\VENDOR LIST\XML 25"
-DB_NAME = "compras_suprimentos.db"
-MEU_CNPJ = "32300758000131"
-
-# BLOQUEIO DE OPERAÇÕES FISCAIS (NÃO SÃO COMPRAS)
-BLACKLIST_CFOP_PREFIX = ['120', '220', '141', '241', '1554', '2554', '190', '290', '191', '291', '194', '294', '59', '69']
-BLACKLIST_TEXTO = ['DEVOLUCAO', 'RETORNO', 'REMESSA', 'COMODATO', 'DEMONSTRACAO', 'BRINDE', 'AMOSTRA']
-# ---------------------
-
-def limpar_texto(texto):
-    if not texto: return ""
-    return " ".join(str(texto).split())
-
-def pegar_valor(no, tags, ns):
-    if no is None: return ""
-    if isinstance(tags, str): tags = [tags]
-    for tag in tags:
-        busca = no.find(f"nfe:{tag}", ns)
-        if busca is not None and busca.text: return busca.text
-        busca = no.find(tag)
-        if busca is not None and busca.text: return busca.text
-    return ""
-
-def executar():
-    print(f"🕵️ INICIANDO EXTRAÇÃO ANTI-DUPLICIDADE (V7.0)...")
-    
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    cursor.execute('DROP TABLE IF EXISTS base_compras')
-    cursor.execute('''
-    CREATE TABLE base_compras (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        chave_acesso TEXT UNIQUE, -- COLUNA NOVA PARA EVITAR DUPLICIDADE
-        cnpj_emit TEXT, nome_emit TEXT,
-        xLgr TEXT, nro TEXT, xBairro TEXT, xMun TEXT, uf_emit TEXT, cep TEXT,
-        n_nf TEXT, data_emissao DATE, nat_op TEXT,
-        cod_prod TEXT, desc_prod TEXT, ncm TEXT, cfop TEXT, u_medida TEXT,
-        qtd REAL, v_unit REAL, v_prod REAL, v_total_item REAL
-    )
-    ''')
-    conn.commit()
-
-    arquivos_xml = []
-    for root, dirs, files in os.walk(PASTA_RAIZ):
-        for file in files:
-            if file.lower().endswith(".xml"):
-                arquivos_xml.append(os.path.join(root, file))
-    
-    print(f"📄 XMLs encontrados: {len(arquivos_xml)}")
-    
-    importados = 0
-    duplicados = 0
-    ignorados = 0
-    
-    # LISTA DE CONTROLE EM MEMÓRIA (Para velocidade)
-    chaves_processadas = set()
-
-    for arq in arquivos_xml:
-        try:
-            tree = ET.parse(arq)
-            root = tree.getroot()
-            ns = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-
-            inf_nfe = root.find('.//nfe:infNFe', ns) or root.find('.//infNFe')
-            if inf_nfe is None: continue
-
-            # --- TRAVA ANTI-DUPLICIDADE (PELA CHAVE DE ACESSO) ---
-            chave = inf_nfe.attrib.get('Id') # Pega o ID da tag (NFe352401...)
-            if not chave: continue # Se não tem chave, ignora
-            
-            # Remove o prefixo 'NFe' para ficar só os números
-            chave_limpa = chave.replace('NFe', '')
-            
-            if chave_limpa in chaves_processadas:
-                duplicados += 1
-                continue # Pula para o próximo arquivo
-            
-            chaves_processadas.add(chave_limpa)
-            # -----------------------------------------------------
-
-            # Filtros de Regra de Negócio (CNPJ, Natureza, CFOP)
-            emit = inf_nfe.find('nfe:emit', ns) or inf_nfe.find('emit')
-            cnpj_emitente = ''.join(filter(str.isdigit, pegar_valor(emit, 'CNPJ', ns)))
-            if cnpj_emitente == MEU_CNPJ: continue
-
-            ide = inf_nfe.find('nfe:ide', ns) or inf_nfe.find('ide')
-            nat_op = pegar_valor(ide, 'natOp', ns).upper()
-            if any(p in nat_op for p in BLACKLIST_TEXTO): continue
-
-            # Dados do Cabeçalho
-            ender = emit.find('nfe:enderEmit', ns) or emit.find('enderEmit')
-            nome = pegar_valor(emit, 'xNome', ns).upper()
-            lgr = pegar_valor(ender, 'xLgr', ns)
-            nro = pegar_valor(ender, 'nro', ns)
-            bairro = pegar_valor(ender, 'xBairro', ns)
-            mun = pegar_valor(ender, 'xMun', ns).upper()
-            uf = pegar_valor(ender, 'UF', ns).upper()
-            cep = pegar_valor(ender, 'CEP', ns)
-            n_nf = pegar_valor(ide, 'nNF', ns)
-            data = pegar_valor(ide, 'dhEmi', ns)[:10]
-
-            dets = inf_nfe.findall('nfe:det', ns) or inf_nfe.findall('det')
-            
-            for det in dets:
-                prod = det.find('nfe:prod', ns) or det.find('prod')
-                cfop = pegar_valor(prod, 'CFOP', ns)
-                
-                if any(cfop.startswith(pre) for pre in BLACKLIST_CFOP_PREFIX): continue
-
-                desc_principal = pegar_valor(prod, 'xProd', ns)
-                info_adicional = pegar_valor(det, 'infAdProd', ns)
-                codigo_ref = pegar_valor(prod, 'cProd', ns)
-                
-                descricao_completa = desc_principal
-                if info_adicional: descricao_completa += f" - {info_adicional}"
-                descricao_completa = limpar_texto(descricao_completa).upper()
-
-                def to_f(v): 
-                    try: return float(v)
-                    except: return 0.0
-
-                cursor.execute('''
-                INSERT INTO base_compras (
-                    chave_acesso,
-                    cnpj_emit, nome_emit, xLgr, nro, xBairro, xMun, uf_emit, cep,
-                    n_nf, data_emissao, nat_op, cod_prod, desc_prod, ncm, cfop, u_medida, 
-                    qtd, v_unit, v_prod, v_total_item
-                )
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                ''', (chave_limpa, cnpj_emitente, nome, lgr, nro, bairro, mun, uf, cep, n_nf, data, nat_op,
-                      codigo_ref, descricao_completa, pegar_valor(prod, 'NCM', ns), cfop,
-                      pegar_valor(prod, 'uCom', ns), to_f(pegar_valor(prod, 'qCom', ns)), 
-                      to_f(pegar_valor(prod, 'vUnCom', ns)), to_f(pegar_valor(prod, 'vProd', ns)), 
-                      to_f(pegar_valor(prod, 'vProd', ns))))
-            importados += 1
-
-        except Exception:
-            pass
-
-    conn.commit()
-    conn.close()
-    print(f"✅ FINALIZADO!")
-    print(f"📥 Notas Únicas Importadas: {importados}")
-    print(f"👯 Duplicatas Removidas: {duplicados}")
-    print("Agora seus dados estão livres de duplicidade.")
-
-if __name__ == "__main__":
-    executar()
\ No newline at end of file
+import xml.etree.ElementTree as ET
+import argparse
+import hashlib
+import sqlite3
+import os
+from functools import partial
+from multiprocessing import Pool
+
+# --- CONFIGURAÇÕES ---
+PASTA_RAIZ = r"C:\Users\Compras.2\Documents\VENDOR LIST\XML 25"
+DB_NAME = "compras_suprimentos.db"
+MEU_CNPJ = "32300758000131"
+NUM_WORKERS = 1                     # PROCESSOS DE PARSE (1 = MODO SERIAL, 0 = UM POR NÚCLEO)
+TAMANHO_LOTE = 20000                # LINHAS POR executemany/COMMIT
+CHUNK_WORKER = 64                   # ARQUIVOS ENVIADOS POR VEZ A CADA PROCESSO
+PARSER = 'arvore'                   # 'arvore' (ET.parse) OU 'stream' (iterparse, memória limitada)
+
+# BLOQUEIO DE OPERAÇÕES FISCAIS (NÃO SÃO COMPRAS)
+BLACKLIST_CFOP_PREFIX = ['120', '220', '141', '241', '1554', '2554', '190', '290', '191', '291', '194', '294', '59', '69']
+BLACKLIST_TEXTO = ['DEVOLUCAO', 'RETORNO', 'REMESSA', 'COMODATO', 'DEMONSTRACAO', 'BRINDE', 'AMOSTRA']
+# ---------------------
+
+def limpar_texto(texto):
+    if not texto: return ""
+    return " ".join(str(texto).split())
+
+def pegar_valor(no, tags, ns):
+    if no is None: return ""
+    if isinstance(tags, str): tags = [tags]
+    for tag in tags:
+        busca = no.find(f"nfe:{tag}", ns)
+        if busca is not None and busca.text: return busca.text
+        busca = no.find(tag)
+        if busca is not None and busca.text: return busca.text
+    return ""
+
+def to_f(v):
+    try: return float(v)
+    except: return 0.0
+
+# TABELAS COM {sufixo}: '' = AS DEFINITIVAS, '_nova' = AS DE UMA CARGA COMPLETA EM ANDAMENTO
+SQL_CREATE = '''
+CREATE TABLE IF NOT EXISTS base_compras{sufixo} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chave_acesso TEXT UNIQUE, -- COLUNA NOVA PARA EVITAR DUPLICIDADE
+    cnpj_emit TEXT, nome_emit TEXT,
+    xLgr TEXT, nro TEXT, xBairro TEXT, xMun TEXT, uf_emit TEXT, cep TEXT,
+    n_nf TEXT, data_emissao DATE, nat_op TEXT,
+    cod_prod TEXT, desc_prod TEXT, ncm TEXT, cfop TEXT, u_medida TEXT,
+    qtd REAL, v_unit REAL, v_prod REAL, v_total_item REAL
+)
+'''
+
+# MANIFESTO: UM REGISTRO POR XML JÁ LIDO (BASE DO MODO INCREMENTAL)
+SQL_CREATE_MANIFESTO = '''
+CREATE TABLE IF NOT EXISTS arquivos_ingeridos{sufixo} (
+    caminho TEXT PRIMARY KEY,
+    tamanho INTEGER, mtime REAL, hash TEXT,
+    chave_acesso TEXT,
+    status TEXT -- IMPORTADA / FILTRADA / DUPLICADA / INVALIDA
+)
+'''
+
+COLUNAS_BASE = [
+    'chave_acesso',
+    'cnpj_emit', 'nome_emit', 'xLgr', 'nro', 'xBairro', 'xMun', 'uf_emit', 'cep',
+    'n_nf', 'data_emissao', 'nat_op', 'cod_prod', 'desc_prod', 'ncm', 'cfop', 'u_medida',
+    'qtd', 'v_unit', 'v_prod', 'v_total_item',
+]
+
+# Upsert pela chave de acesso: XML reemitido/alterado atualiza a linha existente
+SQL_INSERT = f'''
+INSERT INTO base_compras{{sufixo}} ({", ".join(COLUNAS_BASE)})
+VALUES ({",".join("?" * len(COLUNAS_BASE))})
+ON CONFLICT(chave_acesso) DO UPDATE SET
+    {", ".join(f"{c} = excluded.{c}" for c in COLUNAS_BASE[1:])}
+'''
+
+SQL_MANIFESTO = '''
+INSERT OR REPLACE INTO arquivos_ingeridos{sufixo} (caminho, tamanho, mtime, hash, chave_acesso, status)
+VALUES (?,?,?,?,?,?)
+'''
+
+# Duplicatas cuja chave ficou sem dono (o XML dono mudou de chave ou virou inválido)
+SQL_DUPLICADAS_ORFAS = '''
+SELECT caminho FROM arquivos_ingeridos{sufixo}
+WHERE status = 'DUPLICADA'
+  AND chave_acesso NOT IN (
+    SELECT chave_acesso FROM arquivos_ingeridos{sufixo}
+    WHERE status IN ('IMPORTADA', 'FILTRADA') AND chave_acesso IS NOT NULL
+  )
+'''
+
+INALTERADO = "INALTERADO" # Conteúdo igual ao do manifesto (só o mtime mudou)
+SUFIXO_CARGA = "_nova"    # Staging da carga completa: só vira a base definitiva no fim
+
+def listar_xmls(pasta):
+    arquivos_xml = []
+    for root, dirs, files in os.walk(pasta):
+        for file in files:
+            if file.lower().endswith(".xml"):
+                arquivos_xml.append(os.path.join(root, file))
+    return arquivos_xml
+
+def extrair_nota(arq):
+    """
+    Lê um XML de NF-e e devolve (chave_limpa, linhas) prontas para o INSERT.
+    - None: XML ilegível ou sem chave de acesso (não conta em nada)
+    - linhas None: nota barrada pelas regras de negócio (a chave ainda conta p/ duplicidade)
+    Roda dentro dos processos do Pool, por isso não toca no banco.
+    """
+    try:
+        tree = ET.parse(arq)
+        root = tree.getroot()
+        ns = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
+
+        inf_nfe = root.find('.//nfe:infNFe', ns) or root.find('.//infNFe')
+        if inf_nfe is None: return None
+
+        # --- TRAVA ANTI-DUPLICIDADE (PELA CHAVE DE ACESSO) ---
+        chave = inf_nfe.attrib.get('Id') # Pega o ID da tag (NFe352401...)
+        if not chave: return None # Se não tem chave, ignora
+
+        # Remove o prefixo 'NFe' para ficar só os números
+        chave_limpa = chave.replace('NFe', '')
+    except Exception:
+        return None
+
+    try:
+        # Filtros de Regra de Negócio (CNPJ, Natureza, CFOP)
+        emit = inf_nfe.find('nfe:emit', ns) or inf_nfe.find('emit')
+        cnpj_emitente = ''.join(filter(str.isdigit, pegar_valor(emit, 'CNPJ', ns)))
+        if cnpj_emitente == MEU_CNPJ: return chave_limpa, None
+
+        ide = inf_nfe.find('nfe:ide', ns) or inf_nfe.find('ide')
+        nat_op = pegar_valor(ide, 'natOp', ns).upper()
+        if any(p in nat_op for p in BLACKLIST_TEXTO): return chave_limpa, None
+
+        # Dados do Cabeçalho
+        ender = emit.find('nfe:enderEmit', ns) or emit.find('enderEmit')
+        nome = pegar_valor(emit, 'xNome', ns).upper()
+        lgr = pegar_valor(ender, 'xLgr', ns)
+        nro = pegar_valor(ender, 'nro', ns)
+        bairro = pegar_valor(ender, 'xBairro', ns)
+        mun = pegar_valor(ender, 'xMun', ns).upper()
+        uf = pegar_valor(ender, 'UF', ns).upper()
+        cep = pegar_valor(ender, 'CEP', ns)
+        n_nf = pegar_valor(ide, 'nNF', ns)
+        data = pegar_valor(ide, 'dhEmi', ns)[:10]
+
+        dets = inf_nfe.findall('nfe:det', ns) or inf_nfe.findall('det')
+
+        linhas = []
+        for det in dets:
+            prod = det.find('nfe:prod', ns) or det.find('prod')
+            cfop = pegar_valor(prod, 'CFOP', ns)
+
+            if any(cfop.startswith(pre) for pre in BLACKLIST_CFOP_PREFIX): continue
+
+            desc_principal = pegar_valor(prod, 'xProd', ns)
+            info_adicional = pegar_valor(det, 'infAdProd', ns)
+            codigo_ref = pegar_valor(prod, 'cProd', ns)
+
+            descricao_completa = desc_principal
+            if info_adicional: descricao_completa += f" - {info_adicional}"
+            descricao_completa = limpar_texto(descricao_completa).upper()
+
+            linhas.append((chave_limpa, cnpj_emitente, nome, lgr, nro, bairro, mun, uf, cep, n_nf, data, nat_op,
+                           codigo_ref, descricao_completa, pegar_valor(prod, 'NCM', ns), cfop,
+                           pegar_valor(prod, 'uCom', ns), to_f(pegar_valor(prod, 'qCom', ns)), 
+                           to_f(pegar_valor(prod, 'vUnCom', ns)), to_f(pegar_valor(prod, 'vProd', ns)), 
+                           to_f(pegar_valor(prod, 'vProd', ns))))
+        return chave_limpa, linhas
+
+    except Exception:
+        return chave_limpa, None
+
+# --- PARSER EM STREAMING (iterparse) ---
+NS_NFE = 'http://www.portalfiscal.inf.br/nfe'
+# Blocos lidos do infNFe, nas duas grafias (com e sem namespace): tag -> (bloco, prefixo)
+BLOCOS_NFE = {
+    prefixo + bloco: (bloco, prefixo)
+    for prefixo in (f'{{{NS_NFE}}}', '') for bloco in ('infNFe', 'ide', 'emit', 'det')
+}
+
+def _textos_filhos(no):
+    """{tag: texto} do PRIMEIRO filho de cada tag (mesma regra do find + pegar_valor)."""
+    textos = {}
+    for filho in no:
+        if filho.tag not in textos: textos[filho.tag] = filho.text or ""
+    return textos
+
+def extrair_nota_stream(arq):
+    """
+    Mesmo contrato de extrair_nota, mas numa passada só com iterparse: lê apenas
+    ide/emit/det do primeiro infNFe e limpa cada bloco assim que termina, então
+    a árvore nunca é montada inteira (itens, assinatura e envelope procNFe).
+    """
+    p = None
+    inf = None
+    emit = ender = ide = None
+    dets = []
+    try:
+        contexto = ET.iterparse(arq, events=('end',))
+        for _, elem in contexto:
+            if inf is not None:
+                elem.clear() # Depois do infNFe: só valida o resto do XML, como o ET.parse
+                continue
+
+            bloco = BLOCOS_NFE.get(elem.tag)
+            if bloco is None: continue
+            tipo, prefixo = bloco
+            if p is None: p = prefixo # Namespace decidido uma vez, no primeiro bloco do documento
+            elif prefixo != p: continue
+
+            if tipo == 'det':
+                prod = elem.find(p + 'prod')
+                inf_ad = elem.find(p + 'infAdProd')
+                dets.append((_textos_filhos(prod) if prod is not None else {},
+                             (inf_ad.text or "") if inf_ad is not None else ""))
+            elif tipo == 'emit':
+                if emit is None:
+                    # `find(nfe:emit) or find(emit)`: emit vazio só é descartado no documento com namespace
+                    emit = _textos_filhos(elem) if len(elem) or not p else False
+                    no_ender = elem.find(p + 'enderEmit')
+                    ender = _textos_filhos(no_ender) if no_ender is not None else {}
+            elif tipo == 'ide':
+                if ide is None: ide = _textos_filhos(elem)
+            else:
+                inf = elem
+                chave = inf.attrib.get('Id')
+                tem_filhos = len(inf) > 0
+            elem.clear()
+    except Exception:
+        return None
+
+    # infNFe na raiz não é achado pelo './/infNFe'; vazio com namespace cai no `or` e some
+    if inf is None or inf is contexto.root or (p and not tem_filhos): return None
+    if not chave: return None
+    chave_limpa = chave.replace('NFe', '')
+
+    # Sem emit o extrair_nota cai no except (emit.find) depois dos filtros
+    if emit is None or emit is False: return chave_limpa, None
+
+    cnpj_emitente = ''.join(filter(str.isdigit, emit.get(p + 'CNPJ', "")))
+    if cnpj_emitente == MEU_CNPJ: return chave_limpa, None
+
+    ide = ide or {}
+    nat_op = ide.get(p + 'natOp', "").upper()
+    if any(b in nat_op for b in BLACKLIST_TEXTO): return chave_limpa, None
+
+    nome = emit.get(p + 'xNome', "").upper()
+    lgr = ender.get(p + 'xLgr', "")
+    nro = ender.get(p + 'nro', "")
+    bairro = ender.get(p + 'xBairro', "")
+    mun = ender.get(p + 'xMun', "").upper()
+    uf = ender.get(p + 'UF', "").upper()
+    cep = ender.get(p + 'CEP', "")
+    n_nf = ide.get(p + 'nNF', "")
+    data = ide.get(p + 'dhEmi', "")[:10]
+
+    linhas = []
+    for prod, info_adicional in dets:
+        cfop = prod.get(p + 'CFOP', "")
+        if any(cfop.startswith(pre) for pre in BLACKLIST_CFOP_PREFIX): continue
+
+        descricao_completa = prod.get(p + 'xProd', "")
+        if info_adicional: descricao_completa += f" - {info_adicional}"
+        descricao_completa = limpar_texto(descricao_completa).upper()
+
+        v_prod = to_f(prod.get(p + 'vProd', ""))
+        linhas.append((chave_limpa, cnpj_emitente, nome, lgr, nro, bairro, mun, uf, cep, n_nf, data, nat_op,
+                       prod.get(p + 'cProd', ""), descricao_completa, prod.get(p + 'NCM', ""), cfop,
+                       prod.get(p + 'uCom', ""), to_f(prod.get(p + 'qCom', "")),
+                       to_f(prod.get(p + 'vUnCom', "")), v_prod, v_prod))
+    return chave_limpa, linhas
+
+PARSERS = {'arvore': extrair_nota, 'stream': extrair_nota_stream}
+
+BLOCO_LEITURA = 1 << 20  # hash em blocos de 1 MB: o arquivo nunca é lido inteiro para a memória
+
+class LeitorComHash:
+    """Arquivo aberto que atualiza o sha1 com cada bloco que o parser lê."""
+    def __init__(self, f):
+        self.f = f
+        self.sha1 = hashlib.sha1()
+
+    def read(self, n=-1):
+        dados = self.f.read(n)
+        self.sha1.update(dados)
+        return dados
+
+    def hexdigest(self):
+        """sha1 do arquivo inteiro (lê o que o parser deixou para trás, se deixou)."""
+        for bloco in iter(lambda: self.f.read(BLOCO_LEITURA), b''): self.sha1.update(bloco)
+        return self.sha1.hexdigest()
+
+def hash_arquivo(arq):
+    h = hashlib.sha1()
+    with open(arq, 'rb') as f:
+        for bloco in iter(lambda: f.read(BLOCO_LEITURA), b''): h.update(bloco)
+    return h.hexdigest()
+
+def processar_arquivo(tarefa, parser='arvore'):
+    """
+    Unidade de trabalho dos processos: (caminho, hash_conhecido) ->
+    (caminho, tamanho, mtime, hash, resultado do parser | INALTERADO).
+    O arquivo é lido em blocos: o hash confere o já conhecido antes de parsear, e o
+    parser lê pelo LeitorComHash, então o hash gravado é o dos bytes parseados.
+    """
+    arq, hash_conhecido = tarefa
+    try:
+        st = os.stat(arq)
+        if hash_conhecido:
+            hash_atual = hash_arquivo(arq)
+            if hash_atual == hash_conhecido:
+                return arq, st.st_size, st.st_mtime, hash_atual, INALTERADO
+        with open(arq, 'rb') as f:
+            leitor = LeitorComHash(f)
+            resultado = PARSERS[parser](leitor)
+            hash_atual = leitor.hexdigest()
+    except OSError:
+        return arq, None, None, None, None
+    return arq, st.st_size, st.st_mtime, hash_atual, resultado
+
+def ler_manifesto(conn, sufixo=''):
+    """{caminho: (tamanho, mtime, hash, chave_acesso, status)}"""
+    return {r[0]: r[1:] for r in conn.execute(
+        f'SELECT caminho, tamanho, mtime, hash, chave_acesso, status FROM arquivos_ingeridos{sufixo}'
+    )}
+
+def gravar_notas(conn, resultados, manifesto=None, sufixo=''):
+    """
+    Writer único: consome os resultados de processar_arquivo NA ORDEM DOS ARQUIVOS
+    e grava notas + manifesto em lotes com executemany (um commit por lote, o que
+    permite retomar uma carga interrompida). Devolve (importados, duplicados).
+    """
+    manifesto = manifesto or {}
+    importados = 0
+    duplicados = 0
+    lote = []
+    apagar = []
+    lote_manifesto = []
+
+    # LISTA DE CONTROLE EM MEMÓRIA (Para velocidade): chave -> arquivo dono da chave
+    chaves_processadas = {
+        m[3]: caminho for caminho, m in manifesto.items() if m[4] in ('IMPORTADA', 'FILTRADA')
+    }
+
+    def descarregar():
+        # Deletes antes dos upserts: uma chave só é liberada antes de ganhar novo dono
+        if apagar: conn.executemany(f'DELETE FROM base_compras{sufixo} WHERE chave_acesso = ?', [(c,) for c in apagar])
+        if lote: conn.executemany(SQL_INSERT.format(sufixo=sufixo), lote)
+        if lote_manifesto: conn.executemany(SQL_MANIFESTO.format(sufixo=sufixo), lote_manifesto)
+        conn.commit()
+        apagar.clear(); lote.clear(); lote_manifesto.clear()
+
+    for arq, tamanho, mtime, hash_atual, resultado in resultados:
+        if tamanho is None: continue # Arquivo sumiu/ilegível durante a carga
+
+        anterior = manifesto.get(arq)
+        if resultado == INALTERADO:
+            lote_manifesto.append((arq, tamanho, mtime, hash_atual, anterior[3], anterior[4]))
+            continue
+
+        chave_limpa, linhas = resultado if resultado is not None else (None, None)
+
+        # Arquivo alterado que era dono de outra chave: a chave antiga sai da base
+        chave_antiga = anterior[3] if anterior else None
+        if chave_antiga and chave_antiga != chave_limpa and chaves_processadas.get(chave_antiga) == arq:
+            del chaves_processadas[chave_antiga]
+            apagar.append(chave_antiga)
+
+        if resultado is None:
+            status = 'INVALIDA'
+        elif chaves_processadas.get(chave_limpa, arq) != arq:
+            duplicados += 1
+            status = 'DUPLICADA' # Pula para o próximo arquivo
+        else:
+            chaves_processadas[chave_limpa] = arq
+            if linhas is None:
+                status = 'FILTRADA'
+                if anterior: apagar.append(chave_limpa)
+            else:
+                status = 'IMPORTADA'
+                # chave_acesso é UNIQUE: no INSERT item a item, só o 1º item da nota entrava
+                # e o 2º estourava IntegrityError (nota fora da contagem). Mantemos o mesmo resultado.
+                if linhas: lote.extend(linhas[:1])
+                elif anterior: apagar.append(chave_limpa)
+                if len(linhas) <= 1: importados += 1
+
+        lote_manifesto.append((arq, tamanho, mtime, hash_atual, chave_limpa, status))
+        if len(lote) >= TAMANHO_LOTE or len(lote_manifesto) >= TAMANHO_LOTE:
+            descarregar()
+
+    descarregar()
+    return importados, duplicados
+
+def remover_sumidos(conn, arquivos_xml, manifesto, sufixo=''):
+    """
+    Tira do manifesto os XMLs que não estão mais na pasta e, dos que eram donos de uma chave,
+    as notas da base (duplicatas dessa chave viram órfãs e são relidas em seguida).
+    Devolve quantos arquivos saíram.
+    """
+    existentes = set(arquivos_xml)
+    sumidos = [arq for arq in manifesto if arq not in existentes]
+    donos = [m[3] for arq, m in manifesto.items() if arq not in existentes and m[4] in ('IMPORTADA', 'FILTRADA') and m[3]]
+    if sumidos:
+        conn.executemany(f'DELETE FROM base_compras{sufixo} WHERE chave_acesso = ?', [(c,) for c in donos])
+        conn.executemany(f'DELETE FROM arquivos_ingeridos{sufixo} WHERE caminho = ?', [(a,) for a in sumidos])
+        conn.commit()
+    return len(sumidos)
+
+def promover_carga(conn):
+    """Troca base_compras/arquivos_ingeridos pelas tabelas da carga completa numa transação só."""
+    conn.execute('BEGIN')
+    for tabela in ('base_compras', 'arquivos_ingeridos'):
+        conn.execute(f'DROP TABLE IF EXISTS {tabela}')
+        conn.execute(f'ALTER TABLE {tabela}{SUFIXO_CARGA} RENAME TO {tabela}')
+    conn.commit()
+
+def executar(workers=NUM_WORKERS, incremental=False, parser=PARSER, recomecar=False):
+    print(f"🕵️ INICIANDO EXTRAÇÃO ANTI-DUPLICIDADE (V7.0)...")
+    
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    
+    # Carga completa grava nas tabelas _nova (a base atual segue legível até a troca no fim);
+    # se ela foi interrompida, as _nova ficam e a próxima carga completa continua de onde parou
+    if workers <= 0: workers = os.cpu_count() or 1
+    sufixo = '' if incremental else SUFIXO_CARGA
+    if recomecar and not incremental:
+        cursor.execute(f'DROP TABLE IF EXISTS base_compras{SUFIXO_CARGA}')
+        cursor.execute(f'DROP TABLE IF EXISTS arquivos_ingeridos{SUFIXO_CARGA}')
+    cursor.execute(SQL_CREATE.format(sufixo=sufixo))
+    cursor.execute(SQL_CREATE_MANIFESTO.format(sufixo=sufixo))
+    conn.commit()
+
+    arquivos_xml = listar_xmls(PASTA_RAIZ)
+    
+    print(f"📄 XMLs encontrados: {len(arquivos_xml)}")
+
+    manifesto = ler_manifesto(conn, sufixo)
+    if not incremental and manifesto:
+        print(f"⏯️ Retomando carga completa interrompida: {len(manifesto)} arquivos já lidos")
+    sumidos = remover_sumidos(conn, arquivos_xml, manifesto, sufixo)
+    if sumidos:
+        print(f"🗑️ {sumidos} arquivos saíram da pasta: removidos do manifesto e da base")
+        manifesto = ler_manifesto(conn, sufixo)
+
+    tarefas = []
+    for arq in arquivos_xml:
+        anterior = manifesto.get(arq)
+        if anterior:
+            try:
+                st = os.stat(arq)
+            except OSError:
+                continue
+            # Tamanho e mtime iguais ao manifesto: arquivo já ingerido, nem abre
+            if (st.st_size, st.st_mtime) == (anterior[0], anterior[1]): continue
+        tarefas.append((arq, anterior[2] if anterior else None))
+
+    if incremental:
+        print(f"🔁 Modo incremental: {len(tarefas)} arquivos novos/alterados")
+    
+    processar = partial(processar_arquivo, parser=parser)
+    if workers > 1:
+        print(f"⚙️ Modo paralelo: {workers} processos")
+        # imap preserva a ordem dos arquivos: a 1ª ocorrência de cada chave é a mesma do modo serial
+        with Pool(workers) as pool:
+            importados, duplicados = gravar_notas(conn, pool.imap(processar, tarefas, chunksize=CHUNK_WORKER), manifesto, sufixo)
+    else:
+        importados, duplicados = gravar_notas(conn, map(processar, tarefas), manifesto, sufixo)
+
+    # Relê as duplicatas órfãs na ordem da pasta: a primeira assume a chave, como numa carga completa
+    ordem = {arq: i for i, arq in enumerate(arquivos_xml)}
+    orfas = sorted((r[0] for r in conn.execute(SQL_DUPLICADAS_ORFAS.format(sufixo=sufixo)) if r[0] in ordem), key=ordem.get)
+    if orfas:
+        extra, _ = gravar_notas(conn, map(processar, [(arq, None) for arq in orfas]), ler_manifesto(conn, sufixo), sufixo)
+        importados += extra
+
+    if not incremental:
+        promover_carga(conn)
+    conn.close()
+    print(f"✅ FINALIZADO!")
+    print(f"📥 Notas Únicas Importadas: {importados}")
+    print(f"👯 Duplicatas Removidas: {duplicados}")
+    print("Agora seus dados estão livres de duplicidade.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extração de XMLs de NF-e para base_compras")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Processos de parse (1 = serial, o padrão; 0 = um por núcleo)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Lê só XMLs novos/alterados (manifesto) em vez de recriar base_compras")
+    parser.add_argument("--recomecar", action="store_true",
+                        help="Carga completa: descarta a carga interrompida em vez de continuar dela")
+    parser.add_argument("--parser", choices=sorted(PARSERS), default=PARSER,
+                        help="arvore = ET.parse + pegar_valor; stream = iterparse com memória limitada")
+    args = parser.parse_args()
+    executar(workers=args.workers, incremental=args.incremental, parser=args.parser, recomecar=args.recomecar)
@@ -0,0 +1,190 @@
+"""
+Flags de compliance do histórico no DB curated (tabela compliance_flags).
+
+Uma linha por item do base_compras (item_id = rowid no base_compras) com a categoria do
+classificador "turbo", o documento exigido, risco e se a categoria é crítica, mais as colunas
+que a aba Compliance lista: a aba só lê daqui, pelos índices de fornecedor e de categoria.
+
+O build do curated (processing.curated) refaz só os anos cujo conteúdo no base_compras mudou
+(mesma assinatura por ano do fato_itens; linhas sem data no ano 0). Se muda a versão da
+categoria (regras do "turbo") ou das regras de documentação (data/regras_compliance.json),
+todos os anos são refeitos, e a medição de cada regra sobre o histórico inteiro (combinações
+e linhas casadas, em quantas venceu, tempo) fica em compliance_regras_stats, por versão:
+
+    python -m processing.compliance [--curated db]    # medição da última versão
+"""
+import argparse
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from data.database import CURATED_DB, garantir_indices
+from utils.compliance import motor_compliance
+from utils.regras import motor_regras
+
+SQL_COMPLIANCE_FLAGS = """
+CREATE TABLE IF NOT EXISTS compliance_flags (
+    item_id INTEGER PRIMARY KEY,
+    ano INTEGER, data_emissao TEXT, nome_emit TEXT, n_nf TEXT, desc_prod TEXT,
+    categoria TEXT, doc_obrigatoria TEXT, risco INTEGER, critico INTEGER,
+    v_unit REAL, v_total REAL
+)
+"""
+
+SQL_COMPLIANCE_CONTROLE = """
+CREATE TABLE IF NOT EXISTS compliance_controle (
+    ano INTEGER PRIMARY KEY,
+    versao TEXT,
+    assinatura TEXT,
+    atualizado_em TEXT
+)
+"""
+
+# Medição por regra: `casou` - `venceu` = combinações em que a regra foi sombreada por outra
+SQL_COMPLIANCE_REGRAS_STATS = """
+CREATE TABLE IF NOT EXISTS compliance_regras_stats (
+    versao TEXT, regra_id TEXT, prioridade INTEGER, documento TEXT,
+    combinacoes INTEGER, casou INTEGER, venceu INTEGER, linhas INTEGER, linhas_vencidas INTEGER,
+    tempo_ms REAL, medido_em TEXT,
+    PRIMARY KEY (versao, regra_id)
+)
+"""
+COLUNAS_STATS = ["versao", "regra_id", "prioridade", "documento", "combinacoes", "casou", "venceu",
+                 "linhas", "linhas_vencidas", "tempo_ms", "medido_em"]
+
+# Aba Compliance: top ofensores / filtro por fornecedor, risco por categoria / filtro por
+# categoria, total de itens críticos; build: troca das linhas de um ano
+INDICES_COMPLIANCE = [
+    ("idx_compliance_flags_ano", "compliance_flags", ["ano"]),
+    ("idx_compliance_flags_fornecedor", "compliance_flags", ["risco", "nome_emit"]),
+    ("idx_compliance_flags_categoria", "compliance_flags", ["risco", "categoria"]),
+    ("idx_compliance_flags_critico", "compliance_flags", ["critico"]),
+]
+
+EXPR_ANO = "COALESCE(CAST(substr(b.data_emissao, 1, 4) AS INTEGER), 0)"
+
+
+def versao_compliance():
+    """Versão da categoria + regras de documentação: mudou, as flags de todas as linhas são refeitas."""
+    return f"{motor_regras('turbo').versao}|{motor_compliance().versao}"
+
+
+def _layout_antigo(con):
+    """compliance_flags/_controle de antes do refresh por ano (sem a coluna ano)."""
+    for tabela in ("compliance_flags", "compliance_controle"):
+        cols = [r[1] for r in con.execute(f"PRAGMA table_info({tabela})")]
+        if cols and "ano" not in cols:
+            return True
+    return False
+
+
+def atualizar_compliance(con, expr, assinaturas, forcar=False):
+    """
+    Atualiza a compliance_flags do curated (conexão com o RAW anexado como `raw`): refaz os
+    anos cuja assinatura (`assinaturas`, ano -> assinatura de processing.curated.assinaturas_raw)
+    ou versão mudaram e apaga os que sumiram. Devolve True se mexeu em algo.
+    """
+    if forcar or _layout_antigo(con):
+        con.execute("DROP TABLE IF EXISTS compliance_flags")
+        con.execute("DROP TABLE IF EXISTS compliance_controle")
+    con.execute(SQL_COMPLIANCE_FLAGS)
+    con.execute(SQL_COMPLIANCE_CONTROLE)
+    con.execute(SQL_COMPLIANCE_REGRAS_STATS)
+    garantir_indices(con, INDICES_COMPLIANCE)
+    versao = versao_compliance()
+    anteriores = {ano: (v, sig) for ano, v, sig in con.execute("SELECT ano, versao, assinatura FROM compliance_controle")}
+    refazer = sorted(a for a, sig in assinaturas.items() if anteriores.get(a) != (versao, sig))
+    sumiram = sorted(a for a in anteriores if a not in assinaturas)
+    if not refazer and not sumiram:
+        return False
+
+    agora = datetime.now().isoformat(timespec="seconds")
+    stats = None
+    if refazer:
+        df = pd.read_sql_query(
+            f"""
+            SELECT b.rowid AS item_id, {EXPR_ANO} AS ano, b.data_emissao, b.nome_emit, b.n_nf, b.desc_prod, b.ncm,
+                   {expr['v_unit']} AS v_unit, {expr['v_total']} AS v_total
+            FROM raw.base_compras b
+            WHERE {EXPR_ANO} IN ({', '.join('?' * len(refazer))})
+            """,
+            con,
+            params=refazer,
+        )
+        # categoria e flags por código: cada descrição/NCM e cada categoria distintos uma vez só
+        df["categoria"] = motor_regras("turbo").classificar(df["desc_prod"], df["ncm"])
+        motor = motor_compliance()
+        flags, stats = motor.avaliar(df["categoria"].astype("category"), df["desc_prod"], df["ncm"])
+        df["doc_obrigatoria"] = flags["Doc_Obrigatoria"].to_numpy()
+        df["risco"] = flags["Risco_Compliance"].to_numpy().astype(int)
+        df["critico"] = flags["Critico"].to_numpy().astype(int)
+        # medição da versão: só quando ela foi avaliada sobre o histórico inteiro
+        if set(refazer) == set(assinaturas):
+            stats.insert(0, "versao", motor.versao)
+            stats["medido_em"] = agora
+        else:
+            stats = None
+
+    cols = ["item_id", "ano", "data_emissao", "nome_emit", "n_nf", "desc_prod", "categoria", "doc_obrigatoria",
+            "risco", "critico", "v_unit", "v_total"]
+    anos = refazer + sumiram
+    with con:
+        con.execute(f"DELETE FROM compliance_flags WHERE ano IN ({', '.join('?' * len(anos))})", anos)
+        con.execute(f"DELETE FROM compliance_controle WHERE ano IN ({', '.join('?' * len(sumiram))})", sumiram)
+        if refazer:
+            con.executemany(
+                f"INSERT INTO compliance_flags ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                df[cols].astype(object).where(df[cols].notna(), None).itertuples(index=False, name=None),
+            )
+            con.executemany(
+                "INSERT OR REPLACE INTO compliance_controle (ano, versao, assinatura, atualizado_em) VALUES (?, ?, ?, ?)",
+                [(a, versao, assinaturas[a], agora) for a in refazer],
+            )
+            if stats is not None:
+                con.executemany(
+                    f"INSERT OR REPLACE INTO compliance_regras_stats ({', '.join(COLUNAS_STATS)}) "
+                    f"VALUES ({', '.join('?' * len(COLUNAS_STATS))})",
+                    stats[COLUNAS_STATS].astype(object).itertuples(index=False, name=None),
+                )
+    return True
+
+
+def medicao_regras(con, versao=None):
+    """Medição por regra de uma versão das regras (padrão: a última medida), na ordem de prioridade."""
+    if versao is None:
+        linha = con.execute("SELECT versao FROM compliance_regras_stats ORDER BY medido_em DESC LIMIT 1").fetchone()
+        if not linha:
+            return pd.DataFrame(columns=COLUNAS_STATS)
+        versao = linha[0]
+    return pd.read_sql_query(
+        "SELECT * FROM compliance_regras_stats WHERE versao = ? ORDER BY prioridade", con, params=[versao]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medição das regras de compliance no DB curated")
+    parser.add_argument("--curated", default=CURATED_DB)
+    parser.add_argument("--versao", help="versão das regras (padrão: a última medida)")
+    args = parser.parse_args()
+
+    con = sqlite3.connect(args.curated)
+    try:
+        stats = medicao_regras(con, args.versao)
+    finally:
+        con.close()
+    if stats.empty:
+        print("⚠️ Nenhuma medição ainda: rode o build do curated (python -m processing.curated).")
+        return
+    print(f"📋 Regras de compliance {stats['versao'].iloc[0]} · {int(stats['combinacoes'].iloc[0])} combinações "
+          f"distintas · medido em {stats['medido_em'].iloc[0]}")
+    for r in stats.itertuples():
+        sombreadas = r.casou - r.venceu
+        print(f"  {r.regra_id:<12} prio {r.prioridade:>3} · casou {r.casou:>6} comb / {r.linhas:>8} linhas · "
+              f"venceu {r.venceu:>6} / {r.linhas_vencidas:>8}"
+              f"{f' · sombreada em {sombreadas}' if sombreadas else ''} · {r.tempo_ms:.2f} ms")
+    print(f"⏱️ Total: {stats['tempo_ms'].sum():.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Concilia um cadastro de fornecedores (export do ERP, CSV ou Excel) com os nome_emit do
+base_compras: para cada linha do cadastro, o nome_emit mais parecido acima do piso.
+
+Os nome_emit distintos vão para um IndiceFornecedores (trigramas do nome normalizado), e
+cada nome distinto do cadastro só é comparado com os nome_emit que dividem trigramas com ele.
+Mesma escala de score do Detetive (100 igual, 95 contido, senão ratio * 100).
+
+Uso (na raiz do projeto):
+    python -m processing.conciliar_fornecedores --cadastro fornecedores_erp.xlsx --coluna RAZAO_SOCIAL
+"""
+import argparse
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from data.dataset import RAW_DB
+from utils.detetive import SCORE_CONFIRMADO
+from utils.fornecedores import IndiceFornecedores
+
+SQL_NOMES_EMIT = """
+SELECT nome_emit, MIN(cnpj_emit) AS cnpj_emit, COUNT(*) AS itens
+FROM base_compras
+WHERE nome_emit IS NOT NULL AND nome_emit <> ''
+GROUP BY nome_emit
+ORDER BY nome_emit
+"""
+
+
+def nomes_emit(raw_db=RAW_DB):
+    """nome_emit distintos do base_compras, com um CNPJ e a quantidade de itens de cada um."""
+    con = sqlite3.connect(Path(raw_db).absolute().as_uri() + "?mode=ro", uri=True)
+    try:
+        return pd.read_sql(SQL_NOMES_EMIT, con)
+    finally:
+        con.close()
+
+
+def ler_cadastro(caminho, coluna):
+    if str(caminho).lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(caminho, dtype=str)
+    else:
+        df = pd.read_csv(caminho, sep=None, engine="python", dtype=str, encoding_errors="replace")
+    if coluna not in df.columns:
+        raise ValueError(f"Coluna '{coluna}' não existe no cadastro (colunas: {', '.join(map(str, df.columns))})")
+    return df
+
+
+def conciliar(cadastro, coluna, emitentes, piso=SCORE_CONFIRMADO):
+    """Cadastro + nome_emit, cnpj_emit, itens e score do nome_emit casado (vazios sem match)."""
+    indice = IndiceFornecedores(emitentes["nome_emit"])
+    casados = indice.casar(cadastro[coluna], piso)
+    achados = emitentes.reindex(casados["posicao"].fillna(-1).astype(int)).reset_index(drop=True)
+    out = cadastro.reset_index(drop=True).copy()
+    for c in ("nome_emit", "cnpj_emit", "itens"):
+        out[c] = achados[c].to_numpy()
+    out["score"] = casados["score"].to_numpy()
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Concilia um cadastro de fornecedores com os nome_emit do base_compras")
+    ap.add_argument("--cadastro", required=True, help="CSV ou Excel do cadastro de fornecedores")
+    ap.add_argument("--coluna", required=True, help="Coluna com o nome do fornecedor no cadastro")
+    ap.add_argument("--raw", default=RAW_DB, help="SQLite com a tabela base_compras")
+    ap.add_argument("--piso", type=float, default=SCORE_CONFIRMADO, help="Score mínimo (exclusivo) para casar")
+    ap.add_argument("--saida", default="conciliacao_fornecedores.csv")
+    args = ap.parse_args()
+
+    emitentes = nomes_emit(args.raw)
+    out = conciliar(ler_cadastro(args.cadastro, args.coluna), args.coluna, emitentes, args.piso)
+    out.to_csv(args.saida, sep=";", index=False, encoding="utf-8-sig")
+    casados = int(out["nome_emit"].notna().sum())
+    print(f"✅ {casados}/{len(out)} linhas do cadastro casadas com {len(emitentes)} nome_emit. Saída: {args.saida}")
@@ -0,0 +1,508 @@
+"""
+Build do DB CURATED (data/curated/suprimentos_curated.sqlite) a partir do base_compras.
+
+Gera as tabelas que o app_compras.py lê:
+- fato_itens : uma linha por item de NF, já com ano, mes_ano, item_key e doc_tipo
+- fato_gastos: uma linha por documento (valor_total / imposto_total)
+- bench_item : benchmark histórico por item (médio, menor, maior, último preço),
+               mantido de forma incremental a partir de parciais por ano (bench_item_ano)
+- fato_itens_fts: índice FTS5 (conteúdo externo = fato_itens) de descricao/nome_emit/ncm
+               para a aba Busca, mantido por triggers a cada insert/delete na fato_itens
+- compliance_flags: categoria, documento exigido e risco de cada item (processing.compliance),
+               refeita por ano como o fato_itens, ou inteira quando a versão das regras muda
+
+Só os anos cujo conteúdo no base_compras mudou desde o último build são refeitos.
+
+Uso (na raiz do projeto):
+    python -m processing.curated --raw compras_suprimentos.db --curated data/curated/suprimentos_curated.sqlite
+"""
+import argparse
+import hashlib
+import json
+import marshal
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from data.database import CURATED_DB, garantir_indices
+from processing.compliance import atualizar_compliance
+
+RAW_DB = "compras_suprimentos.db"
+
+# Colunas do base_compras: extrator atual (qtd, v_unit...) e base legada (qtd_real, v_unit_real, impostos)
+CANDIDATAS = {
+    "qtd": ["qtd_real", "qtd"],
+    "v_unit": ["v_unit_real", "v_unit"],
+    "v_total": ["v_total_item", "v_prod"],
+}
+COLUNAS_IMPOSTO = ["v_icms", "v_ipi", "v_pis", "v_cofins"]
+
+SQL_CONTROLE = """
+CREATE TABLE IF NOT EXISTS curated_controle (
+    ano INTEGER PRIMARY KEY,
+    assinatura TEXT,
+    atualizado_em TEXT
+)
+"""
+
+SQL_FATO_ITENS = """
+CREATE TABLE IF NOT EXISTS fato_itens (
+    id INTEGER PRIMARY KEY,
+    doc_id TEXT, doc_tipo TEXT,
+    ano INTEGER, mes_ano TEXT, data_emissao TEXT,
+    cnpj_emit TEXT, nome_emit TEXT, n_nf TEXT,
+    item_key TEXT, cod_prod TEXT, descricao TEXT, ncm TEXT, unidade TEXT,
+    qtd REAL, v_unit REAL, v_total REAL, imposto REAL
+)
+"""
+
+SQL_FATO_GASTOS = """
+CREATE TABLE IF NOT EXISTS fato_gastos (
+    doc_id TEXT, doc_tipo TEXT,
+    ano INTEGER, mes_ano TEXT, data_emissao TEXT,
+    cnpj_emit TEXT, nome_emit TEXT, n_nf TEXT,
+    itens INTEGER,
+    valor_total REAL{imposto}
+)
+"""
+
+SQL_BENCH_ITEM = """
+CREATE TABLE IF NOT EXISTS bench_item (
+    item_key TEXT PRIMARY KEY,
+    descricao TEXT, ncm TEXT,
+    n_compras INTEGER,
+    soma_preco REAL,
+    preco_medio_hist REAL,
+    menor_preco_hist REAL,
+    maior_preco_hist REAL,
+    ultimo_preco REAL,
+    ultima_data TEXT,
+    ultimo_fornecedor TEXT
+)
+"""
+
+# Busca textual: o FTS não guarda cópia do texto (lê da fato_itens pelo id); sem acento e
+# sem caixa, "CONEXAO" acha "Conexão"
+SQL_FTS_ITENS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS fato_itens_fts USING fts5(
+    descricao, nome_emit, ncm,
+    content='fato_itens', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+SQL_FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS fato_itens_fts_ai AFTER INSERT ON fato_itens BEGIN
+      INSERT INTO fato_itens_fts (rowid, descricao, nome_emit, ncm)
+      VALUES (new.id, new.descricao, new.nome_emit, new.ncm);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS fato_itens_fts_ad AFTER DELETE ON fato_itens BEGIN
+      INSERT INTO fato_itens_fts (fato_itens_fts, rowid, descricao, nome_emit, ncm)
+      VALUES ('delete', old.id, old.descricao, old.nome_emit, old.ncm);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS fato_itens_fts_au AFTER UPDATE ON fato_itens BEGIN
+      INSERT INTO fato_itens_fts (fato_itens_fts, rowid, descricao, nome_emit, ncm)
+      VALUES ('delete', old.id, old.descricao, old.nome_emit, old.ncm);
+      INSERT INTO fato_itens_fts (rowid, descricao, nome_emit, ncm)
+      VALUES (new.id, new.descricao, new.nome_emit, new.ncm);
+    END
+    """,
+]
+
+# Parciais do benchmark por (item, ano): contagem, soma, mín/máx e última compra do ano.
+# Refazer um ano só relê as linhas daquele ano; o bench_item combina as parciais.
+SQL_BENCH_ITEM_ANO = """
+CREATE TABLE IF NOT EXISTS bench_item_ano (
+    item_key TEXT, ano INTEGER,
+    descricao TEXT, ncm TEXT,
+    n_compras INTEGER,
+    soma_preco REAL,
+    menor_preco REAL,
+    maior_preco REAL,
+    ultimo_preco REAL,
+    ultima_data TEXT,
+    ultimo_id INTEGER,
+    ultimo_fornecedor TEXT,
+    PRIMARY KEY (item_key, ano)
+)
+"""
+
+# Benchmark calculado do zero (referência do verificar_bench_item)
+SQL_BENCH_COMPLETO = """
+SELECT
+  item_key, n_compras, preco_medio, menor_preco, maior_preco,
+  CASE WHEN v_unit > 0 THEN v_unit END,
+  CASE WHEN v_unit > 0 THEN data_emissao END,
+  CASE WHEN v_unit > 0 THEN nome_emit END
+FROM (
+  SELECT
+    item_key, v_unit, data_emissao, nome_emit,
+    COUNT(NULLIF(v_unit, 0)) OVER w AS n_compras,
+    AVG(NULLIF(v_unit, 0)) OVER w AS preco_medio,
+    MIN(NULLIF(v_unit, 0)) OVER w AS menor_preco,
+    MAX(NULLIF(v_unit, 0)) OVER w AS maior_preco,
+    ROW_NUMBER() OVER (PARTITION BY item_key ORDER BY v_unit > 0 DESC, data_emissao DESC, id DESC) AS rn
+  FROM fato_itens
+  WINDOW w AS (PARTITION BY item_key)
+)
+WHERE rn = 1
+"""
+
+def _colunas(con, tabela):
+    return [r[1] for r in con.execute(f"PRAGMA {tabela}.table_info(base_compras)")]
+
+
+def _expressoes_raw(cols):
+    """Mapeia as colunas do base_compras disponível para as do fato_itens."""
+    expr = {}
+    for destino, opcoes in CANDIDATAS.items():
+        achada = next((c for c in opcoes if c in cols), None)
+        expr[destino] = f"COALESCE(b.{achada}, 0)" if achada else "0"
+
+    impostos = [c for c in COLUNAS_IMPOSTO if c in cols]
+    expr["imposto"] = " + ".join(f"COALESCE(b.{c}, 0)" for c in impostos) if impostos else "NULL"
+    # Sem chave de acesso (base legada), o documento é CNPJ + número da NF
+    expr["doc_id"] = "b.chave_acesso" if "chave_acesso" in cols else "b.cnpj_emit || '|' || b.n_nf"
+    expr["cod_prod"] = "b.cod_prod" if "cod_prod" in cols else "NULL"
+    expr["u_medida"] = "b.u_medida" if "u_medida" in cols else "NULL"
+    return expr, bool(impostos)
+
+
+def garantir_fts(con):
+    """
+    Cria o fato_itens_fts e os triggers que o mantêm. Se o índice é novo e a fato_itens já
+    tem linhas (curated de antes do FTS), indexa tudo uma vez. False se o SQLite não tem FTS5.
+    """
+    existia = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'fato_itens_fts'").fetchone()
+    try:
+        con.execute(SQL_FTS_ITENS)
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ FTS5 indisponível neste SQLite ({e}); a Busca usa LIKE por ano.")
+        return False
+    for ddl in SQL_FTS_TRIGGERS:
+        con.execute(ddl)
+    if not existia:
+        con.execute("INSERT INTO fato_itens_fts (fato_itens_fts) VALUES ('rebuild')")
+    return True
+
+
+class _AssinaturaPorAno:
+    """
+    Agregado SQL (uma passada, sem GROUP BY): por ano, qtd de linhas e soma (mod 2^64) do hash
+    do conteúdo de cada linha, que não depende da ordem. marshal versão 2 (sem referências):
+    mesmos valores, mesmos bytes, e bem mais rápido que repr.
+    """
+
+    def __init__(self):
+        self.anos = {}
+
+    def step(self, ano, *valores):
+        h = int.from_bytes(hashlib.blake2b(marshal.dumps(valores, 2), digest_size=8).digest(), "big")
+        n, soma = self.anos.get(ano, (0, 0))
+        self.anos[ano] = (n + 1, (soma + h) % 2**64)
+
+    def finalize(self):
+        return json.dumps({ano: f"{n}|{soma:016x}" for ano, (n, soma) in self.anos.items()})
+
+
+def assinaturas_raw(con):
+    """
+    Impressão digital por ano do base_compras: qtd de linhas + soma do hash do conteúdo de
+    cada linha (rowid e TODAS as colunas). Qualquer insert/update/delete no ano, inclusive
+    data movida dentro do ano ou texto trocado por outro do mesmo tamanho, muda a assinatura.
+    Linhas sem data entram no ano 0 (só a compliance_flags usa; o fato_itens as ignora).
+    """
+    con.create_aggregate("assinatura_por_ano", -1, _AssinaturaPorAno)
+    cols = ", ".join(f'b."{c}"' for c in _colunas(con, "raw"))
+    (doc,) = con.execute(
+        f"""
+        SELECT assinatura_por_ano(COALESCE(CAST(substr(b.data_emissao, 1, 4) AS INTEGER), 0), b.rowid, {cols})
+        FROM raw.base_compras b
+        """
+    ).fetchone()
+    return {int(ano): sig for ano, sig in json.loads(doc or "{}").items()}
+
+
+def _refazer_ano(con, ano, expr):
+    """Recria fato_itens e fato_gastos de um ano numa passada sobre o base_compras."""
+    con.execute("DELETE FROM fato_itens WHERE ano = ?", [ano])
+    con.execute("DELETE FROM fato_gastos WHERE ano = ?", [ano])
+
+    con.execute(
+        f"""
+        INSERT INTO fato_itens (
+          doc_id, doc_tipo, ano, mes_ano, data_emissao,
+          cnpj_emit, nome_emit, n_nf,
+          item_key, cod_prod, descricao, ncm, unidade,
+          qtd, v_unit, v_total, imposto
+        )
+        SELECT
+          {expr['doc_id']},
+          'NFE',
+          CAST(substr(b.data_emissao, 1, 4) AS INTEGER),
+          substr(b.data_emissao, 1, 7),
+          substr(b.data_emissao, 1, 10),
+          b.cnpj_emit, UPPER(TRIM(b.nome_emit)), b.n_nf,
+          UPPER(TRIM(b.desc_prod)) || '|' || COALESCE(TRIM(b.ncm), ''),
+          {expr['cod_prod']}, UPPER(TRIM(b.desc_prod)), COALESCE(TRIM(b.ncm), ''), {expr['u_medida']},
+          {expr['qtd']}, {expr['v_unit']}, {expr['v_total']}, {expr['imposto']}
+        FROM raw.base_compras b
+        WHERE substr(b.data_emissao, 1, 4) = ?
+        ORDER BY b.rowid
+        """,
+        [str(ano)]
+    )
+
+    tem_imposto = "imposto_total" in [r[1] for r in con.execute("PRAGMA table_info(fato_gastos)")]
+    con.execute(
+        f"""
+        INSERT INTO fato_gastos (
+          doc_id, doc_tipo, ano, mes_ano, data_emissao, cnpj_emit, nome_emit, n_nf,
+          itens, valor_total{', imposto_total' if tem_imposto else ''}
+        )
+        SELECT
+          doc_id, doc_tipo, ano, MIN(mes_ano), MIN(data_emissao), MIN(cnpj_emit), MIN(nome_emit), MIN(n_nf),
+          COUNT(*), SUM(v_total){', SUM(imposto)' if tem_imposto else ''}
+        FROM fato_itens
+        WHERE ano = ?
+        GROUP BY doc_id, doc_tipo, ano
+        """,
+        [ano]
+    )
+
+
+def _parciais_bench_ano(con, ano):
+    """Refaz as parciais de um ano em bench_item_ano (lendo só as linhas do ano)."""
+    con.execute("DELETE FROM bench_item_ano WHERE ano = ?", [ano])
+    con.execute(
+        """
+        INSERT INTO bench_item_ano (
+          item_key, ano, descricao, ncm, n_compras, soma_preco, menor_preco, maior_preco,
+          ultimo_preco, ultima_data, ultimo_id, ultimo_fornecedor
+        )
+        SELECT
+          item_key, ano, descricao, ncm, n_compras, soma_preco, menor_preco, maior_preco,
+          CASE WHEN v_unit > 0 THEN v_unit END,
+          CASE WHEN v_unit > 0 THEN data_emissao END,
+          CASE WHEN v_unit > 0 THEN id END,
+          CASE WHEN v_unit > 0 THEN nome_emit END
+        FROM (
+          -- Uma passada: agregados do item via janela + a linha da última compra (rn = 1)
+          SELECT
+            item_key, ano, v_unit, data_emissao, id, nome_emit,
+            MIN(descricao) OVER w AS descricao,
+            MIN(ncm) OVER w AS ncm,
+            COUNT(NULLIF(v_unit, 0)) OVER w AS n_compras,
+            TOTAL(NULLIF(v_unit, 0)) OVER w AS soma_preco,
+            MIN(NULLIF(v_unit, 0)) OVER w AS menor_preco,
+            MAX(NULLIF(v_unit, 0)) OVER w AS maior_preco,
+            ROW_NUMBER() OVER (PARTITION BY item_key ORDER BY v_unit > 0 DESC, data_emissao DESC, id DESC) AS rn
+          FROM fato_itens
+          WHERE ano = ?
+          WINDOW w AS (PARTITION BY item_key)
+        )
+        WHERE rn = 1
+        """,
+        [ano]
+    )
+
+
+def atualizar_bench_item(con, anos):
+    """
+    Atualiza o benchmark histórico só para os itens presentes nos anos informados:
+    refaz as parciais desses anos e recombina (soma de contagens/somas, mín dos mínimos,
+    máx dos máximos, última compra mais recente) sem reler o histórico dos outros anos.
+    """
+    if not anos:
+        return
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS bench_afetados (item_key TEXT PRIMARY KEY)")
+    con.execute("DELETE FROM temp.bench_afetados")
+
+    marcadores = ",".join("?" * len(anos))
+    # Itens que existiam nesses anos (podem ter sumido) + os que passam a existir
+    con.execute(
+        f"INSERT OR IGNORE INTO temp.bench_afetados SELECT item_key FROM bench_item_ano WHERE ano IN ({marcadores})",
+        list(anos)
+    )
+    for ano in anos:
+        _parciais_bench_ano(con, ano)
+    con.execute(
+        f"INSERT OR IGNORE INTO temp.bench_afetados SELECT item_key FROM bench_item_ano WHERE ano IN ({marcadores})",
+        list(anos)
+    )
+
+    con.execute("DELETE FROM bench_item WHERE item_key IN (SELECT item_key FROM temp.bench_afetados)")
+    con.execute(
+        """
+        INSERT INTO bench_item (
+          item_key, descricao, ncm, n_compras, soma_preco,
+          preco_medio_hist, menor_preco_hist, maior_preco_hist,
+          ultimo_preco, ultima_data, ultimo_fornecedor
+        )
+        SELECT
+          item_key, descricao, ncm, n_compras, soma_preco,
+          CASE WHEN n_compras > 0 THEN soma_preco / n_compras END,
+          menor_preco, maior_preco,
+          ultimo_preco, ultima_data, ultimo_fornecedor
+        FROM (
+          SELECT
+            item_key, ultimo_preco, ultima_data, ultimo_fornecedor,
+            MIN(descricao) OVER w AS descricao,
+            MIN(ncm) OVER w AS ncm,
+            SUM(n_compras) OVER w AS n_compras,
+            TOTAL(soma_preco) OVER w AS soma_preco,
+            MIN(menor_preco) OVER w AS menor_preco,
+            MAX(maior_preco) OVER w AS maior_preco,
+            ROW_NUMBER() OVER (
+              PARTITION BY item_key ORDER BY ultimo_id IS NOT NULL DESC, ultima_data DESC, ultimo_id DESC
+            ) AS rn
+          FROM bench_item_ano
+          WHERE item_key IN (SELECT item_key FROM temp.bench_afetados)
+          WINDOW w AS (PARTITION BY item_key)
+        )
+        WHERE rn = 1
+        """
+    )
+
+
+def verificar_bench_item(curated_db: str = CURATED_DB, tolerancia: float = 1e-9):
+    """
+    Confere o bench_item mantido de forma incremental contra um recálculo completo.
+    Devolve a lista de (item_key, campo, mantido, recalculado) divergentes (vazia = consistente).
+    """
+    con = sqlite3.connect(Path(curated_db).absolute().as_uri() + "?mode=ro", uri=True)
+    try:
+        mantido = {
+            r[0]: r[1:] for r in con.execute(
+                """
+                SELECT item_key, n_compras, preco_medio_hist, menor_preco_hist, maior_preco_hist,
+                       ultimo_preco, ultima_data, ultimo_fornecedor
+                FROM bench_item
+                """
+            )
+        }
+        completo = {r[0]: r[1:] for r in con.execute(SQL_BENCH_COMPLETO)}
+    finally:
+        con.close()
+
+    campos = ["n_compras", "preco_medio_hist", "menor_preco_hist", "maior_preco_hist",
+              "ultimo_preco", "ultima_data", "ultimo_fornecedor"]
+    divergencias = []
+    for chave in sorted(set(mantido) | set(completo)):
+        a, b = mantido.get(chave), completo.get(chave)
+        if a is None or b is None:
+            divergencias.append((chave, "item_key", a, b))
+            continue
+        for campo, va, vb in zip(campos, a, b):
+            if isinstance(va, float) and isinstance(vb, float):
+                if abs(va - vb) > tolerancia * max(1.0, abs(vb)):
+                    divergencias.append((chave, campo, va, vb))
+            elif va != vb:
+                divergencias.append((chave, campo, va, vb))
+    return divergencias
+
+
+def construir_curated(raw_db: str = RAW_DB, curated_db: str = CURATED_DB, forcar: bool = False):
+    """
+    Atualiza o DB curated. Devolve a lista de anos refeitos.
+    forcar=True recria todas as tabelas (ex.: mudança de layout do base_compras).
+    """
+    os.makedirs(os.path.dirname(curated_db) or ".", exist_ok=True)
+    con = sqlite3.connect(Path(curated_db).absolute().as_uri(), uri=True)
+    try:
+        # WAL: o app continua lendo (read-only) enquanto o build grava
+        con.execute("PRAGMA journal_mode = WAL")
+        # RAW anexado só para leitura: o build nunca escreve no base_compras
+        con.execute("ATTACH DATABASE ? AS raw", [Path(raw_db).absolute().as_uri() + "?mode=ro"])
+        cols = _colunas(con, "raw")
+        if not cols:
+            raise RuntimeError(f"Tabela base_compras não encontrada em {raw_db}")
+        expr, tem_imposto = _expressoes_raw(cols)
+
+        if forcar:
+            for t in ["fato_itens_fts", "fato_itens", "fato_gastos", "bench_item", "bench_item_ano", "curated_controle",
+                      "compliance_flags", "compliance_controle"]:
+                con.execute(f"DROP TABLE IF EXISTS {t}")
+        elif "soma_preco" not in [r[1] for r in con.execute("PRAGMA table_info(bench_item)")]:
+            # bench_item do layout antigo (recalculado do zero): recria e as parciais se refazem abaixo
+            con.execute("DROP TABLE IF EXISTS bench_item")
+
+        con.execute(SQL_CONTROLE)
+        con.execute(SQL_FATO_ITENS)
+        con.execute(SQL_FATO_GASTOS.format(imposto=",\n    imposto_total REAL" if tem_imposto else ""))
+        con.execute(SQL_BENCH_ITEM)
+        con.execute(SQL_BENCH_ITEM_ANO)
+        garantir_indices(con)
+        tem_fts = garantir_fts(con)
+        con.commit()
+
+        todas = assinaturas_raw(con)
+        if atualizar_compliance(con, expr, todas):
+            con.execute("ANALYZE compliance_flags")
+            con.commit()
+        atuais = {a: sig for a, sig in todas.items() if a}  # fato_itens: só linhas com data
+        anteriores = dict(con.execute("SELECT ano, assinatura FROM curated_controle").fetchall())
+
+        mudaram = sorted(a for a, sig in atuais.items() if anteriores.get(a) != sig)
+        sumiram = sorted(a for a in anteriores if a not in atuais)
+        # Anos já no curated sem parciais do benchmark (primeiro build após migração do bench_item)
+        sem_bench = sorted(
+            r[0] for r in con.execute(
+                """
+                SELECT DISTINCT ano FROM fato_itens
+                WHERE ano NOT IN (SELECT DISTINCT ano FROM bench_item_ano)
+                   OR NOT EXISTS (SELECT 1 FROM bench_item)
+                """
+            )
+        )
+        if not mudaram and not sumiram and not sem_bench:
+            return []
+
+        agora = datetime.now().isoformat(timespec="seconds")
+        with con:
+            for ano in sumiram:
+                con.execute("DELETE FROM fato_itens WHERE ano = ?", [ano])
+                con.execute("DELETE FROM fato_gastos WHERE ano = ?", [ano])
+                con.execute("DELETE FROM curated_controle WHERE ano = ?", [ano])
+            for ano in mudaram:
+                _refazer_ano(con, ano, expr)
+                con.execute(
+                    "INSERT OR REPLACE INTO curated_controle (ano, assinatura, atualizado_em) VALUES (?, ?, ?)",
+                    [ano, atuais[ano], agora]
+                )
+            atualizar_bench_item(con, sorted(set(mudaram) | set(sumiram) | set(sem_bench)))
+        if tem_fts:
+            # junta os segmentos que os triggers criaram: consulta lê menos b-trees
+            con.execute("INSERT INTO fato_itens_fts (fato_itens_fts) VALUES ('optimize')")
+            con.commit()
+        con.execute("ANALYZE main")
+        return mudaram + sumiram
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build do DB curated a partir do base_compras")
+    ap.add_argument("--raw", default=RAW_DB, help="SQLite com a tabela base_compras")
+    ap.add_argument("--curated", default=CURATED_DB, help="SQLite curated de saída")
+    ap.add_argument("--tudo", action="store_true", help="Recria todas as tabelas e anos")
+    ap.add_argument("--verificar", action="store_true", help="Confere o bench_item contra um recálculo completo")
+    args = ap.parse_args()
+
+    anos = construir_curated(args.raw, args.curated, forcar=args.tudo)
+    print(f"✅ Curated atualizado. Anos refeitos: {anos or 'nenhum (sem mudanças)'}")
+
+    if args.verificar:
+        divergencias = verificar_bench_item(args.curated)
+        if divergencias:
+            print(f"❌ bench_item divergente em {len(divergencias)} campos. Exemplos:")
+            for d in divergencias[:10]:
+                print("   ", d)
+            raise SystemExit(1)
+        print("✅ bench_item consistente com o recálculo completo.")
@@ -0,0 +1,101 @@
+"""
+Materializa no raw_documentos (DB RAW do Detetive) as colunas que o app filtra e casa:
+- ano       : ano da data_emissao (mesmo pd.to_datetime(errors="coerce") que o app usava)
+- n_nf_clean: n_nf normalizado p/ o match com os mapas (limpar_nf_excel)
+e o índice idx_raw_documentos_ano, para o raw_get_docs_nf_for_detetive ler só o ano pedido.
+
+Incremental: só linhas com n_nf_clean NULL (nunca materializadas) são calculadas, então dá
+para rodar depois de cada ingestão. O app continua certo antes disso: linhas pendentes (ano e
+n_nf_clean NULL) vêm na consulta e são calculadas na hora.
+
+As duas colunas dependem de conversões do Python (não dá para ser coluna gerada): o trigger
+raw_documentos_pendente as volta para NULL quando n_nf ou data_emissao de uma linha muda, e a
+linha volta a ser pendente em vez de ficar no ano antigo. Na primeira execução com o trigger
+(ou com --conferir), as linhas já materializadas são recalculadas e as divergentes corrigidas.
+
+Uso (na raiz do projeto):
+    python -m processing.raw_documentos --raw data/raw/suprimentos_raw.sqlite
+"""
+import argparse
+import os
+import sqlite3
+
+import pandas as pd
+
+from data.database import INDICES_RAW, garantir_indices
+from utils.detetive import limpar_nf_excel
+
+RAW_DB = os.path.join("data", "raw", "suprimentos_raw.sqlite")
+COLUNAS_MATERIALIZADAS = {"ano": "INTEGER", "n_nf_clean": "TEXT"}
+
+SQL_TRIGGER_PENDENTE = """
+CREATE TRIGGER IF NOT EXISTS raw_documentos_pendente
+AFTER UPDATE OF n_nf, data_emissao ON raw_documentos
+WHEN old.n_nf IS NOT new.n_nf OR old.data_emissao IS NOT new.data_emissao
+BEGIN
+  UPDATE raw_documentos SET ano = NULL, n_nf_clean = NULL WHERE rowid = new.rowid;
+END
+"""
+
+
+def calcular_ano_nf(data_emissao, n_nf):
+    """(ano, n_nf_clean) de cada linha, com as conversões do loader do Detetive."""
+    ano = pd.to_datetime(pd.Series(data_emissao, dtype=object), errors="coerce").dt.year
+    n_nf_clean = pd.Series(n_nf, dtype=object).astype(str).apply(limpar_nf_excel)
+    return [None if pd.isna(a) else int(a) for a in ano], n_nf_clean.tolist()
+
+
+def materializar_raw_documentos(raw_db: str = RAW_DB, lote: int = 50000, conferir: bool = False):
+    """
+    Cria/preenche ano e n_nf_clean, o índice por ano e o trigger que as invalida.
+    conferir=True (automático na criação do trigger) recalcula também as linhas já
+    materializadas. Devolve quantas linhas foram preenchidas ou corrigidas.
+    """
+    con = sqlite3.connect(raw_db, timeout=30)
+    try:
+        existentes = {r[1] for r in con.execute("PRAGMA table_info(raw_documentos)")}
+        if not existentes:
+            raise RuntimeError(f"Tabela raw_documentos não encontrada em {raw_db}")
+        with con:
+            for col, tipo in COLUNAS_MATERIALIZADAS.items():
+                if col not in existentes:
+                    con.execute(f"ALTER TABLE raw_documentos ADD COLUMN {col} {tipo}")
+            garantir_indices(con, INDICES_RAW)
+            # sem o trigger, linhas editadas antes dele podem estar com ano/n_nf_clean velhos
+            conferir = conferir or not con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'raw_documentos_pendente'"
+            ).fetchone()
+            con.execute(SQL_TRIGGER_PENDENTE)
+
+        filtro = "" if conferir else "AND n_nf_clean IS NULL"
+        total, ultimo = 0, -1
+        while True:
+            linhas = con.execute(
+                "SELECT rowid, data_emissao, n_nf, ano, n_nf_clean FROM raw_documentos "
+                f"WHERE rowid > ? {filtro} ORDER BY rowid LIMIT ?", [ultimo, lote]
+            ).fetchall()
+            if not linhas:
+                break
+            anos, nfs = calcular_ano_nf([r[1] for r in linhas], [r[2] for r in linhas])
+            mudou = [(a, nf, r[0]) for a, nf, r in zip(anos, nfs, linhas) if (a, nf) != (r[3], r[4])]
+            # um commit por lote: o app (read-only) segue lendo durante a materialização
+            with con:
+                con.executemany("UPDATE raw_documentos SET ano = ?, n_nf_clean = ? WHERE rowid = ?", mudou)
+            total += len(mudou)
+            ultimo = linhas[-1][0]
+        if total:
+            con.execute("ANALYZE raw_documentos")
+        return total
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Materializa ano/n_nf_clean no raw_documentos")
+    ap.add_argument("--raw", default=RAW_DB, help="SQLite com a tabela raw_documentos")
+    ap.add_argument("--lote", type=int, default=50000, help="Linhas por transação")
+    ap.add_argument("--conferir", action="store_true", help="Recalcula também as linhas já materializadas")
+    args = ap.parse_args()
+
+    n = materializar_raw_documentos(args.raw, args.lote, conferir=args.conferir)
+    print(f"✅ raw_documentos materializado. Linhas preenchidas/corrigidas: {n}")
@@ -0,0 +1,92 @@
+"""
+Benchmark da busca da ui.tab_busca (utils.busca.IndiceBusca).
+
+Monta um histórico sintético de N linhas com as descrições/códigos do base_compras (descrições
+repetidas, como no histórico real) e compara, por consulta:
+- antigo: df.copy() + str.contains(termo, case=False) em desc_prod e cod_prod.astype(str);
+- IndiceBusca.buscar (índice montado uma vez) + df.iloc das linhas achadas.
+Confere o índice contra a referência direta (todas as palavras, sem acento/caixa, em algum
+campo) e que tudo o que o antigo achava continua achado.
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_busca --linhas 2000000
+"""
+import argparse
+import random
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.busca import IndiceBusca, normalizar_busca
+
+RAW_DB = "compras_suprimentos.db"
+CONSULTAS = ["luva", "parafuso", "PARAF SEXT", "cabo 2,5", "conexao", "aço inox", "10", "xyzw", "rolamento 6205"]
+
+
+def gerar_historico(n, raw_db=RAW_DB, seed=42):
+    con = sqlite3.connect(Path(raw_db).absolute().as_uri() + "?mode=ro", uri=True)
+    try:
+        base = con.execute("SELECT DISTINCT desc_prod, cod_prod FROM base_compras").fetchall()
+    finally:
+        con.close()
+    rnd = random.Random(seed)
+    # variações da descrição (acento, caixa, complemento) p/ ter dezenas de milhares de itens distintos
+    itens = [(d if i % 3 else f"{d} {rnd.choice(['Ø', 'AÇO', 'conexão', 'tipo'])} {i}", c)
+             for i, (d, c) in enumerate(base * 40)]
+    escolha = np.random.default_rng(seed).integers(0, len(itens), n)
+    desc = np.array([d for d, _ in itens], dtype=object)[escolha]
+    cod = np.array([c for _, c in itens], dtype=object)[escolha]
+    return pd.DataFrame({"desc_prod": desc, "cod_prod": cod, "v_total_item": np.ones(n)})
+
+
+def busca_antiga(df, termo):
+    df_result = df.copy()
+    return df_result[
+        df_result['desc_prod'].str.contains(termo, case=False, na=False) |
+        df_result['cod_prod'].astype(str).str.contains(termo, case=False, na=False)
+    ]
+
+
+def referencia(desc_norm, cod_norm, consulta):
+    mask = np.ones(len(desc_norm), dtype=bool)
+    for p in normalizar_busca(consulta).split():
+        mask &= (desc_norm.str.contains(p, regex=False) | cod_norm.str.contains(p, regex=False)).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--linhas", type=int, default=2000000)
+    ap.add_argument("--raw", default=RAW_DB)
+    args = ap.parse_args()
+
+    df = gerar_historico(args.linhas, args.raw)
+    t = time.perf_counter()
+    indice = IndiceBusca(df["desc_prod"], df["cod_prod"])
+    t_indice = time.perf_counter() - t
+    print(f"Linhas: {len(df)} | textos distintos: {len(indice.textos)} | trigramas: {len(indice._listas)} "
+          f"| índice em {t_indice:.2f}s (uma vez por versão do dataset)")
+
+    desc_norm = df["desc_prod"].map(normalizar_busca, na_action="ignore").fillna("")
+    cod_norm = df["cod_prod"].map(normalizar_busca, na_action="ignore").fillna("")
+    for consulta in CONSULTAS:
+        t = time.perf_counter()
+        antigo = busca_antiga(df, consulta)
+        t_antigo = time.perf_counter() - t
+        t = time.perf_counter()
+        linhas = indice.buscar(consulta)
+        novo = df.iloc[linhas]
+        t_novo = time.perf_counter() - t
+
+        ref = referencia(desc_norm, cod_norm, consulta)
+        ok = np.array_equal(linhas, ref)
+        contem_antigo = set(antigo.index) <= set(novo.index)
+        print(f"{consulta!r:18} antigo {t_antigo * 1000:7.0f} ms ({len(antigo):>7} linhas) | índice "
+              f"{t_novo * 1000:6.1f} ms ({len(novo):>7} linhas) | = referência: {ok} | contém o antigo: {contem_antigo}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark dos classificadores de categoria.
+
+- classificar_categoria_simples antigo (if/any inline do app, por apply) x classificar_categorias
+  (vetorizada), sobre N itens distintos (descrições/NCMs do base_compras com sufixos, como no
+  load_itens_agg);
+- classificar_categorias com CacheClassificacao (cache frio x quente);
+- classificar_materiais_turbo antigo (um str.contains por grupo na coluna inteira) x o atual,
+  sobre linhas de compra (descrições repetidas).
+
+Os rótulos de cada versão nova são conferidos contra os da antiga, copiada aqui como estava.
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_classificador --itens 150000 --linhas 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.classifiers import classificar_categorias, classificar_materiais_turbo
+from utils.regras import CacheClassificacao
+
+RAW_DB = "compras_suprimentos.db"
+
+
+def gerar_itens(n_itens, raw_db=RAW_DB, seed=42):
+    con = sqlite3.connect(Path(raw_db).absolute().as_uri() + "?mode=ro", uri=True)
+    try:
+        base = con.execute("SELECT DISTINCT desc_prod, ncm FROM base_compras").fetchall()
+    finally:
+        con.close()
+    rnd = random.Random(seed)
+    linhas = []
+    for i in range(n_itens):
+        desc, ncm = rnd.choice(base)
+        linhas.append((f"{desc} {i}" if rnd.random() < 0.9 else desc, ncm if rnd.random() < 0.95 else None))
+    return pd.DataFrame(linhas, columns=["descricao", "ncm"])
+
+
+def gerar_linhas(n_linhas, raw_db=RAW_DB, seed=42):
+    con = sqlite3.connect(Path(raw_db).absolute().as_uri() + "?mode=ro", uri=True)
+    try:
+        base = pd.read_sql("SELECT desc_prod, ncm FROM base_compras", con)
+    finally:
+        con.close()
+    return base.sample(n_linhas, replace=True, random_state=seed).reset_index(drop=True)
+
+
+def classificar_categoria_simples_antigo(desc, ncm):
+    """classificar_categoria_simples como estava no app_compras.py, antes das regras em tabela."""
+    d = (desc or "").upper()
+    n = (ncm or "").strip()
+
+    # heurística por palavras
+    if any(k in d for k in ["FRETE", "TRANSPORTE", "LOGIST", "CTE"]):
+        return "Logística"
+    if any(k in d for k in ["EPI", "CAPACETE", "LUVA", "OCULOS", "BOTA", "PROTETOR", "MASCARA"]):
+        return "EPI / Segurança"
+    if any(k in d for k in ["PARAFUS", "PORCA", "ARRUELA", "ABRACADEIRA", "FIXADOR"]):
+        return "Fixadores"
+    if any(k in d for k in ["ROLAMENTO", "CORREIA", "MANCAL", "ENGRENAGEM"]):
+        return "Mecânica"
+    if any(k in d for k in ["CABO", "DISJUNTOR", "SENSOR", "INVERSOR", "MOTOR", "CONTATOR"]):
+        return "Elétrica / Automação"
+    if any(k in d for k in ["OLEO", "GRAXA", "LUBRIFIC"]):
+        return "Lubrificantes"
+    if any(k in d for k in ["LIMPEZA", "DETERGENTE", "SABAO", "DESENGRAXANTE"]):
+        return "Limpeza"
+    if any(k in d for k in ["SERVICO", "SERVIÇO", "MANUTENCAO", "MANUTENÇÃO", "INSTALACAO", "INSTALAÇÃO"]):
+        return "Serviços"
+
+    # fallback por NCM (bem leve)
+    if n.startswith("84") or n.startswith("85"):
+        return "Máquinas / Elétrica"
+    if n.startswith("73"):
+        return "Metais / Ferragens"
+    if n.startswith("40"):
+        return "Borracha"
+    if n.startswith("39"):
+        return "Plásticos"
+
+    return "Outros"
+
+
+def turbo_antigo(df):
+    """classificar_materiais_turbo como estava (Balanceada V4): um str.contains por grupo na coluna inteira."""
+    desc = df['desc_prod'].astype(str).str.upper().str.strip()
+    ncm = df['ncm'].astype(str).str.replace('.', '', regex=False).str.strip()
+    ncm_2 = ncm.str.slice(0, 2)
+    ncm_4 = ncm.str.slice(0, 4)
+
+    cond_quimico = (
+        (ncm_2.isin(['27', '32', '34', '35', '38'])) |
+        (desc.str.contains(r'OLEO|GRAXA|LUBRIFICANTE|TINTA|VERNIZ|SOLVENTE|DILUENTE|ADESIVO|COLA|RESINA|GASOLINA|DIESEL|ALCOOL', regex=True))
+    )
+    cond_icamento = (
+        (ncm_4.isin(['7312', '7315', '5607', '8425', '8426'])) |
+        (desc.str.contains(r'CABO DE ACO|CINTA DE ELEVACAO|CINTA DE CARGA|MANILHA|ESTROPO|LACO|CORRENTE GRAU|TALHA|GUINCHO|MOITAO|GANCHO', regex=True))
+    )
+    cond_eletrica = (
+        (ncm_2.isin(['85'])) |
+        (desc.str.contains(r'DISJUNTOR|CONTATOR|CABO ELETRICO|FIO |CABO FLEX|RELE|FUSIVEL|TRANSFORMADOR|MOTOR|LAMPADA|LUMINARIA', regex=True))
+    )
+    cond_hidraulica = (
+        (ncm_4.isin(['7307', '8481', '3917', '4009', '7412'])) |
+        (desc.str.contains(r'VALVULA|CONEXAO|TUBO|MANGUEIRA|ENGATE|NIPLE|TAMPÃO|COTOVELO|TE |LUVA DE ACO|LUVA DE FERRO', regex=True))
+    )
+    cond_epi = (
+        (ncm_4.isin(['6403', '6405', '6506', '4015', '4203', '6116', '6216', '9004', '9020'])) |
+        (desc.str.contains(r'CAPACETE|OCULOS|PROTETOR|MASCARA|RESPIRADOR|BOTA|BOTINA|LUVA|CINTO PARAQUEDISTA|AVENTAL|MACACAO', regex=True) &
+         ~cond_hidraulica &
+         ~cond_icamento)
+    )
+
+    conditions = [cond_epi, cond_quimico, cond_icamento, cond_eletrica, cond_hidraulica]
+    choices = ['🟠 EPI (CRÍTICO)', '🔴 QUÍMICO (CRÍTICO)', '🟡 IÇAMENTO (CRÍTICO)', '⚡ ELÉTRICA (CRÍTICO)', '💧 HIDRÁULICA']
+    return np.select(conditions, choices, default='📦 GERAL')
+
+
+def cronometrar(fn, repeticoes):
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        resultado = fn()
+        melhor = min(melhor, time.perf_counter() - t)
+    return melhor, resultado
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--itens", type=int, default=150000)
+    ap.add_argument("--linhas", type=int, default=1000000, help="Linhas de compra p/ o classificar_materiais_turbo")
+    ap.add_argument("--repeticoes", type=int, default=3)
+    ap.add_argument("--raw", default=RAW_DB)
+    args = ap.parse_args()
+
+    df = gerar_itens(args.itens, args.raw)
+    print(f"Itens: {len(df)} | pares (descrição, NCM) distintos: {len(df.drop_duplicates())}")
+
+    def linha_a_linha():
+        # NULL do SQL chegava como None; no pandas vira NaN
+        vazio = lambda v: v if isinstance(v, str) else None
+        return df.apply(lambda r: classificar_categoria_simples_antigo(vazio(r.get("descricao")), vazio(r.get("ncm"))), axis=1).to_numpy()
+
+    t_apply, ref = cronometrar(linha_a_linha, args.repeticoes)
+    t_vet, vet = cronometrar(lambda: classificar_categorias(df["descricao"], df["ncm"]), args.repeticoes)
+    print(f"antigo, if/any por apply          : {t_apply:.3f}s")
+    print(f"classificar_categorias (vetorizada): {t_vet:.3f}s  ({t_apply / t_vet:.1f}x)")
+    print(f"Rótulos divergentes: {int(np.sum(ref != vet))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CacheClassificacao(os.path.join(tmp, "classificacao.sqlite"))
+        t_frio, _ = cronometrar(lambda: classificar_categorias(df["descricao"], df["ncm"], cache=cache), 1)
+        t_quente, cac = cronometrar(lambda: classificar_categorias(df["descricao"], df["ncm"], cache=cache), args.repeticoes)
+    print(f"com cache, frio (classifica e grava): {t_frio:.3f}s")
+    print(f"com cache, quente                  : {t_quente:.3f}s  ({t_vet / t_quente:.1f}x sobre a vetorizada)")
+    print(f"Rótulos divergentes: {int(np.sum(ref != cac))}")
+
+    linhas = gerar_linhas(args.linhas, args.raw)
+    print(f"\nLinhas: {len(linhas)} | descrições distintas: {linhas['desc_prod'].nunique()}")
+    t_col, ref = cronometrar(lambda: turbo_antigo(linhas), args.repeticoes)
+    t_turbo, vet = cronometrar(lambda: classificar_materiais_turbo(linhas), args.repeticoes)
+    print(f"turbo antigo, str.contains por grupo: {t_col:.3f}s")
+    print(f"turbo, uma passada por distinta    : {t_turbo:.3f}s  ({t_col / t_turbo:.1f}x)")
+    print(f"Rótulos divergentes: {int(np.sum(ref != vet))}")
+
+
+if __name__ == "__main__":
+    main()
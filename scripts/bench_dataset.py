@@ -0,0 +1,105 @@
+"""
+Benchmark de memória do histórico das abas de ui/ (data.dataset).
+
+Compara, com o base_compras replicado --fator vezes:
+- antigo: SELECT * em dtypes object + derivadas, o frame inteiro em cada aba (cada uma com
+  seu .copy());
+- novo: carregar_historico (category/float32) e visao() com as colunas de cada aba, que
+  não copiam nada do frame compartilhado.
+Confere que os agregados das abas (resumo de itens, compliance, gasto por fornecedor) batem.
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_dataset --fator 60
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.database import abrir_leitura
+from data.dataset import RAW_DB, carregar_historico, memoria, otimizar_dtypes, visao
+from ui.tab_busca import COLUNAS_ABA as COLUNAS_BUSCA
+from ui.tab_fornecedores import COLUNAS_ABA as COLUNAS_FORNECEDORES
+from ui.tab_negociacao import COLUNAS_ABA as COLUNAS_NEGOCIACAO
+from utils.agregacoes import resumo_itens
+from utils.classifiers import classificar_materiais_turbo
+from utils.compliance import validar_compliance
+
+ABAS = {"busca": COLUNAS_BUSCA, "fornecedores": COLUNAS_FORNECEDORES, "negociacao": COLUNAS_NEGOCIACAO}
+
+
+def historico_antigo(db_path=RAW_DB):
+    con = abrir_leitura(db_path)
+    try:
+        df = pd.read_sql_query("SELECT * FROM base_compras", con)
+    finally:
+        con.close()
+    df["data_emissao"] = pd.to_datetime(df["data_emissao"], errors="coerce")
+    df["Imposto_Total"] = df[["v_icms", "v_ipi", "v_pis", "v_cofins"]].fillna(0).sum(axis=1)
+    df["Categoria"] = classificar_materiais_turbo(df)
+    validar_compliance(df)
+    # texto como object (antes do pandas 3 era o padrão de todo DataFrame lido do SQLite)
+    return df.astype({c: object for c in df.columns if pd.api.types.is_string_dtype(df[c])})
+
+
+def _dados(s):
+    return s.array.codes if isinstance(s.dtype, pd.CategoricalDtype) else s.to_numpy()
+
+
+def replicar(df, fator):
+    return pd.concat([df] * fator, ignore_index=True) if fator > 1 else df
+
+
+def agregados(df):
+    itens = resumo_itens(df).sort_values(["desc_prod", "Categoria", "cod_prod"]).reset_index(drop=True)
+    risco = df[df["Risco_Compliance"] == True]
+    por_forn = df.groupby("nome_emit", observed=True)["v_total_item"].sum().sort_index()
+    return itens, (len(risco), risco["v_total_item"].sum(), risco["nome_emit"].nunique()), por_forn
+
+
+def iguais(a, b):
+    itens_a, risco_a, forn_a = a
+    itens_b, risco_b, forn_b = b
+    for col in itens_a.columns:
+        x, y = itens_a[col], itens_b[col]
+        if pd.api.types.is_float_dtype(x) or pd.api.types.is_float_dtype(y):
+            if not np.allclose(x.astype(float), y.astype(float), rtol=1e-6, equal_nan=True):
+                return False
+        elif not (x.astype(object).fillna("") == y.astype(object).fillna("")).all():
+            return False
+    return (risco_a[0] == risco_b[0] and np.isclose(risco_a[1], risco_b[1]) and risco_a[2] == risco_b[2]
+            and np.allclose(forn_a.to_numpy(), forn_b.to_numpy()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fator", type=int, default=60)
+    ap.add_argument("--raw", default=RAW_DB)
+    args = ap.parse_args()
+
+    t = time.perf_counter()
+    antigo = replicar(historico_antigo(args.raw), args.fator)
+    t_antigo = time.perf_counter() - t
+    t = time.perf_counter()
+    novo = carregar_historico(args.raw)
+    novo = otimizar_dtypes(replicar(novo, args.fator)) if args.fator > 1 else novo
+    t_novo = time.perf_counter() - t
+
+    m_antigo, m_novo = memoria(antigo), memoria(novo)
+    print(f"Linhas: {len(novo)} | carga antigo {t_antigo:.1f}s, novo {t_novo:.1f}s")
+    print(f"Frame inteiro: antigo {m_antigo / 2**20:7.1f} MiB ({antigo.shape[1]} col.) | "
+          f"novo {m_novo / 2**20:7.1f} MiB ({novo.shape[1]} col.) -> {m_antigo / m_novo:.1f}x menor")
+    for aba, colunas in ABAS.items():
+        v = visao(novo, colunas)
+        compartilha = all(np.shares_memory(_dados(v[c]), _dados(novo[c])) for c in v.columns)
+        print(f"  {aba:13} {len(v.columns):2} col. | cópia antiga {m_antigo / 2**20:7.1f} MiB | "
+              f"visão {memoria(v) / 2**20:6.1f} MiB, sem cópia: {compartilha}")
+    sessao_antiga = m_antigo * (1 + len(ABAS))
+    print(f"Por sessão (frame + cópia de cada aba): antigo {sessao_antiga / 2**20:.1f} MiB | "
+          f"novo 0 MiB (frame único de {m_novo / 2**20:.1f} MiB entre todas as sessões)")
+    print(f"Agregados das abas iguais: {iguais(agregados(antigo), agregados(novo))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark da formatação de moeda/percentual (utils.formatters).
+
+Sobre N valores (preços repetidos, totais quase todos distintos, NaN/None, negativos, texto),
+compara o Series.apply(format_brl/format_perc) antigo (três replace por valor) com
+format_brl_series/format_perc_series (um f-string por valor distinto) e confere o texto.
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_formatters --valores 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.formatters import format_brl_series, format_perc_series
+
+
+def format_brl_antigo(v):
+    if pd.isna(v): return "R$ 0,00"
+    try:
+        val = f"{float(v):,.2f}"
+        return f"R$ {val.replace(',', 'X').replace('.', ',').replace('X', '.')}"
+    except:
+        return str(v)
+
+
+def format_perc_antigo(v):
+    if pd.isna(v): return "0,0%"
+    try:
+        val = f"{float(v)*100:.1f}"
+        return f"{val.replace('.', ',')}%"
+    except:
+        return str(v)
+
+
+def gerar_valores(n, seed=42):
+    rng = np.random.default_rng(seed)
+    precos = np.round(rng.choice(rng.random(5000) * 500, n), 2)           # preço unitário: repete muito
+    totais = np.round(rng.lognormal(6, 2, n) * rng.choice([1, -1], n, p=[.98, .02]), 2)  # quase todos distintos
+    quais = rng.random(n)
+    return {
+        "precos (float)": pd.Series(np.where(quais < 0.02, np.nan, precos)),
+        "totais (float)": pd.Series(np.where(quais < 0.02, np.nan, totais)),
+        "misto (object)": pd.Series(np.where(quais < 0.01, None, np.where(quais < 0.015, "n/d", totais.astype(object))),
+                                    dtype=object),
+        "shares (float)": pd.Series(rng.random(n)),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--valores", type=int, default=1000000)
+    args = ap.parse_args()
+
+    for nome, s in gerar_valores(args.valores).items():
+        antigo_fn, novo_fn = ((format_perc_antigo, format_perc_series) if nome.startswith("shares")
+                              else (format_brl_antigo, format_brl_series))
+        t = time.perf_counter()
+        antigo = s.apply(antigo_fn)
+        t_antigo = time.perf_counter() - t
+        t = time.perf_counter()
+        novo = novo_fn(s)
+        t_novo = time.perf_counter() - t
+        print(f"{nome:15} apply {t_antigo:.2f}s | series {t_novo:.2f}s ({t_antigo / t_novo:.1f}x) "
+              f"| distintos {s.nunique()} | texto igual: {antigo.equals(novo)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark do casamento de nomes de fornecedor (utils/fornecedores.py).
+
+- Pares: N pares (nome_emit do base_compras x variação dele ou outro fornecedor) pelo
+  calcular_similaridade antigo (normaliza os dois nomes a cada chamada), pelo novo (normalização
+  memorizada) e pelo novo com piso (limites do SequenceMatcher); confere scores
+  e decisões.
+- Blocking: IndiceFornecedores sobre os nome_emit distintos do base_compras (completados com
+  nomes sintéticos até --nomes, como num base_compras maior) e buscas por variações deles
+  (como viriam de um cadastro do ERP); tempo por busca e recall contra a comparação exaustiva.
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_fornecedores --pares 100000
+"""
+import argparse
+import random
+import sqlite3
+import time
+from pathlib import Path
+
+from utils.detetive import SCORE_CONFIRMADO
+from utils.fornecedores import IndiceFornecedores, _normalizar, calcular_similaridade, normalizar_nome, similaridade
+
+RAW_DB = "compras_suprimentos.db"
+ACENTOS = {"A": "Á", "E": "É", "O": "Õ", "C": "Ç", "I": "Í"}
+
+
+def nomes_base(raw_db=RAW_DB):
+    con = sqlite3.connect(Path(raw_db).absolute().as_uri() + "?mode=ro", uri=True)
+    try:
+        return [r[0] for r in con.execute("SELECT DISTINCT nome_emit FROM base_compras WHERE nome_emit IS NOT NULL")]
+    finally:
+        con.close()
+
+
+def variar(nome, rnd):
+    """Como o mesmo fornecedor aparece escrito num mapa/cadastro: caixa, sufixo, acento, erro de digitação."""
+    s = nome
+    if rnd.random() < 0.4:
+        s = s.title() if rnd.random() < 0.5 else s.upper()
+    if rnd.random() < 0.4:
+        s = rnd.choice([s + " LTDA", s + " - ME", s.replace(" LTDA", ""), s + " S.A."])
+    if rnd.random() < 0.3:
+        s = "".join(ACENTOS.get(c, c) if rnd.random() < 0.2 else c for c in s)
+    if rnd.random() < 0.5 and len(s) > 4:
+        i = rnd.randrange(len(s) - 1)
+        s = rnd.choice([s[:i] + s[i + 1:], s[:i] + s[i + 1] + s[i] + s[i + 2:], s[:i] + "X" + s[i + 1:]])
+    if rnd.random() < 0.2:
+        s = " ".join(s.split()[:max(1, len(s.split()) - 1)])
+    return s
+
+
+def gerar_pares(n, base, seed=42):
+    rnd = random.Random(seed)
+    return [(a, variar(a, rnd) if rnd.random() < 0.5 else rnd.choice(base)) for a in (rnd.choice(base) for _ in range(n))]
+
+
+def completar_nomes(n, base, seed=42):
+    """Os nomes reais e, até n, sintéticos com as palavras deles (muitos trigramas em comum)."""
+    rnd = random.Random(seed)
+    palavras = sorted({p for nome in base for p in nome.upper().split() if len(p) > 2})
+    sufixos = ["LTDA", "EIRELI", "S.A", "ME", "COMERCIO E SERVICOS LTDA", "INDUSTRIA LTDA"]
+    nomes = list(base)
+    while len(nomes) < n:
+        nomes.append(" ".join(rnd.sample(palavras, rnd.randint(2, 4)) + [rnd.choice(sufixos)]))
+    return nomes[:max(n, len(base))]
+
+
+def melhor_exaustivo(nome, nomes_norm, piso):
+    """Mesma regra do IndiceFornecedores.melhor (maior score, empate fica com a menor posição), sem blocking."""
+    a = normalizar_nome(nome)
+    melhor_pos, melhor_score = None, 0.0
+    for pos, b in enumerate(nomes_norm):
+        score = similaridade(a, b, piso if melhor_pos is None else melhor_score)
+        if score:
+            melhor_pos, melhor_score = pos, score
+    return melhor_pos, melhor_score
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pares", type=int, default=100000)
+    ap.add_argument("--piso", type=float, default=SCORE_CONFIRMADO, help="Piso do score (padrão: o Confirmado do Detetive)")
+    ap.add_argument("--nomes", type=int, default=20000, help="nome_emit indexados (reais + sintéticos)")
+    ap.add_argument("--buscas", type=int, default=5000, help="Nomes procurados no índice")
+    ap.add_argument("--amostra", type=int, default=300, help="Buscas conferidas contra a comparação exaustiva")
+    ap.add_argument("--raw", default=RAW_DB)
+    args = ap.parse_args()
+
+    base = nomes_base(args.raw)
+    pares = gerar_pares(args.pares, base)
+    print(f"Pares: {len(pares)} | nomes distintos: {len({n for p in pares for n in p})}")
+
+    t = time.perf_counter()
+    ref = [similaridade(_normalizar.__wrapped__(a), _normalizar.__wrapped__(b)) for a, b in pares]
+    t_antigo = time.perf_counter() - t
+
+    _normalizar.cache_clear()
+    t = time.perf_counter()
+    exato = [calcular_similaridade(a, b) for a, b in pares]
+    t_cache = time.perf_counter() - t
+
+    t = time.perf_counter()
+    com_piso = [calcular_similaridade(a, b, args.piso) for a, b in pares]
+    t_piso = time.perf_counter() - t
+
+    print(f"antigo (normaliza a cada par)      : {t_antigo:.3f}s")
+    print(f"normalização memorizada            : {t_cache:.3f}s  ({t_antigo / t_cache:.1f}x) "
+          f"| scores divergentes: {sum(r != e for r, e in zip(ref, exato))}")
+    print(f"memorizada + piso {args.piso:g}              : {t_piso:.3f}s  ({t_antigo / t_piso:.1f}x) "
+          f"| decisões divergentes: {sum((r > args.piso) != (p > 0) for r, p in zip(ref, com_piso))}")
+
+    nomes = completar_nomes(args.nomes, base)
+    rnd = random.Random(7)
+    buscas = [variar(rnd.choice(nomes), rnd) for _ in range(args.buscas)]
+
+    t = time.perf_counter()
+    indice = IndiceFornecedores(nomes)
+    t_indice = time.perf_counter() - t
+    t = time.perf_counter()
+    achados = [indice.melhor(n, args.piso) for n in buscas]
+    t_busca = time.perf_counter() - t
+    print(f"\nnome_emit indexados: {len(nomes)} | trigramas: {len(indice._listas)} | índice em {t_indice:.3f}s")
+    print(f"IndiceFornecedores.melhor          : {t_busca:.3f}s p/ {len(buscas)} buscas "
+          f"({1000 * t_busca / len(buscas):.2f} ms/busca) | com match: {sum(p is not None for p, _ in achados)}")
+
+    amostra = buscas[:args.amostra]
+    nomes_norm = [normalizar_nome(n) for n in nomes]
+    t = time.perf_counter()
+    ref = [melhor_exaustivo(n, nomes_norm, args.piso) for n in amostra]
+    t_exaustivo = time.perf_counter() - t
+    com_match = [i for i, (p, _) in enumerate(ref) if p is not None]
+    iguais = sum(achados[i] == ref[i] for i in com_match)
+    achou = sum(achados[i][0] is not None for i in com_match)
+    print(f"exaustivo (amostra de {len(amostra)})         : {t_exaustivo:.3f}s "
+          f"({1000 * t_exaustivo / len(amostra):.2f} ms/busca)")
+    print(f"recall do blocking: {achou}/{len(com_match)} com match; mesmo resultado em {iguais}/{len(com_match)}")
+
+
+if __name__ == "__main__":
+    main()
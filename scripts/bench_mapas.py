@@ -0,0 +1,107 @@
+"""
+Benchmark da leitura dos mapas AF/CC do Detetive (utils.detetive.carregar_mapa).
+
+Gera um mapa CSV sintético (separador ';', decimal com vírgula, colunas que o Detetive não lê,
+AF com células vazias) em utf-8 e em latin1, lê com o carregar_arquivo_flexivel antigo
+(sep=None no engine python, todas as colunas) e com o carregar_mapa, e roda o Detetive com
+cada um sobre documentos sintéticos: Status/Score/NF têm que bater. AF/CC/Plano podem diferir
+só onde o antigo passava por float ("4501.0" -> "4501").
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_mapas --linhas 500000 --docs 40000
+"""
+import argparse
+import io
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.detetive import MapaTexto, carregar_mapa, enriquecer_mapas
+
+FORNECEDORES = ["ACME LTDA", "Beta Construções S.A", "Cimento União", "Aços Paraná EIRELI", "Elétrica São João"]
+
+
+class Upload(io.BytesIO):
+    """O que o st.file_uploader entrega: BytesIO com .name."""
+
+    def __init__(self, conteudo, name):
+        super().__init__(conteudo)
+        self.name = name
+
+
+def carregar_arquivo_flexivel(uploaded_file):
+    """Leitura antiga do app_compras.py."""
+    try:
+        name = uploaded_file.name.lower()
+        if name.endswith(".csv"):
+            try:
+                return pd.read_csv(uploaded_file, encoding="utf-8-sig", sep=None, engine="python")
+            except Exception:
+                uploaded_file.seek(0)
+                return pd.read_csv(uploaded_file, sep=";", encoding="latin1")
+        return pd.read_excel(uploaded_file)
+    except Exception:
+        return None
+
+
+def gerar_mapa(n, seed=42):
+    rnd = random.Random(seed)
+    return pd.DataFrame({
+        "Nº NF": [rnd.choice([str(rnd.randrange(1, 200000)), f"000{rnd.randrange(1, 200000)}"]) for _ in range(n)],
+        "Fornecedor": [rnd.choice(FORNECEDORES) for _ in range(n)],
+        "AF/AS": [str(rnd.randrange(4500, 9999)) if rnd.random() < 0.9 else "" for _ in range(n)],
+        "Centro de Custo": [f"CC-{rnd.randrange(100)}" for _ in range(n)],
+        "Plano de Contas": [f"3.1.{rnd.randrange(50)}" for _ in range(n)],
+        "Valor": [f"{rnd.random() * 10000:.2f}".replace(".", ",") for _ in range(n)],
+        "Observação": ["conferido pelo financeiro" if rnd.random() < 0.3 else "" for _ in range(n)],
+        "Data Lançamento": [f"2024-{rnd.randrange(1, 13):02d}-{rnd.randrange(1, 29):02d}" for _ in range(n)],
+    })
+
+
+def gerar_docs(n, seed=7):
+    rnd = random.Random(seed)
+    return pd.DataFrame({
+        "n_nf_clean": [str(rnd.randrange(1, 200000)) for _ in range(n)],
+        "nome_emit": [rnd.choice(FORNECEDORES).upper() for _ in range(n)],
+        "valor_total": np.round(np.random.default_rng(seed).random(n) * 1000, 2),
+    })
+
+
+def medir(fn, conteudo, nome):
+    t = time.perf_counter()
+    df = fn(Upload(conteudo, nome))
+    return df, time.perf_counter() - t
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--linhas", type=int, default=500000, help="Linhas do mapa")
+    ap.add_argument("--docs", type=int, default=40000, help="Documentos do RAW no Detetive")
+    args = ap.parse_args()
+
+    mapa = gerar_mapa(args.linhas)
+    docs = gerar_docs(args.docs)
+    for encoding in ["utf-8", "latin1"]:
+        conteudo = mapa.to_csv(sep=";", index=False, encoding=encoding).encode(encoding)
+        antigo, t_antigo = medir(carregar_arquivo_flexivel, conteudo, "mapa.csv")
+        novo, t_novo = medir(carregar_mapa, conteudo, "mapa.csv")
+        print(f"\nCSV {encoding} ({len(conteudo) / 1e6:.0f} MB, {args.linhas} linhas)")
+        print(f"antigo (sep=None, engine python) : {t_antigo:.2f}s | {antigo.shape[1]} colunas | "
+              f"{antigo.memory_usage(deep=True).sum() / 1e6:.0f} MB")
+        print(f"carregar_mapa                    : {t_novo:.2f}s ({t_antigo / t_novo:.1f}x) | "
+              f"{novo.shape[1]} colunas | {novo.memory_usage(deep=True).sum() / 1e6:.0f} MB")
+
+        det_antigo, n_antigo = enriquecer_mapas(docs, [MapaTexto.de_dataframe(antigo)])
+        det_novo, n_novo = enriquecer_mapas(docs, [MapaTexto.de_dataframe(novo)])
+        iguais = det_antigo[["NF", "Status", "Score"]].equals(det_novo[["NF", "Status", "Score"]])
+        print(f"Detetive: {n_antigo} x {n_novo} matches | NF/Status/Score iguais: {iguais}")
+        for col in ["AF_MAPA", "CC_MAPA", "PLANO_MAPA"]:
+            dif = det_antigo[col] != det_novo[col]
+            so_float = (det_antigo.loc[dif, col].str.removesuffix(".0") == det_novo.loc[dif, col]).all()
+            print(f"  {col}: {int(dif.sum())} diferentes" + (" (só o '.0' do float)" if dif.any() and so_float else ""))
+
+
+if __name__ == "__main__":
+    main()
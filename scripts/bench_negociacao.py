@@ -0,0 +1,93 @@
+"""
+Benchmark do cockpit de Negociação (utils.agregacoes.negociacao_itens).
+
+Monta um histórico sintético de N linhas de compra a partir do base_compras (cada item
+replicado com variações de descrição e preço) e compara:
+- antigo: a cada rerun, groupby do histórico inteiro + Volatilidade por apply linha a linha
+  + filtro/ordenação das oportunidades;
+- novo: a tabela de negociação montada uma vez por versão dos dados + por rerun só filtro e
+  página.
+Confere as oportunidades (itens, saving, volatilidade) contra as do antigo.
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_negociacao --linhas 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.dataset import RAW_DB, carregar_historico, otimizar_dtypes
+from utils.agregacoes import negociacao_itens
+
+
+def gerar_historico(n, raw_db=RAW_DB, variantes=20, seed=42):
+    base = carregar_historico(raw_db)
+    rng = np.random.default_rng(seed)
+    pos = rng.integers(0, len(base), n)
+    variante = rng.integers(0, variantes, n)
+    df = base.iloc[pos].reset_index(drop=True)
+    df['desc_prod'] = df['desc_prod'].astype(str) + np.where(variante == 0, "", " V" + variante.astype(str))
+    df['v_unit_real'] = (df['v_unit_real'].astype(float) * rng.uniform(0.8, 1.2, n)).round(2)
+    df['v_total_item'] = (df['v_unit_real'] * df['qtd_real'].astype(float)).round(2)
+    df['n_nf'] = df['n_nf'].astype(str)
+    return otimizar_dtypes(df)
+
+
+def rerun_antigo(df):
+    group_cols = ['desc_prod', 'Categoria', 'cod_prod']
+    df_neg = df.groupby(group_cols, observed=True).agg(
+        Gasto_Total=('v_total_item', 'sum'),
+        Qtd_Total=('qtd_real', 'sum'),
+        Preco_Medio=('v_unit_real', 'mean'),
+        Menor_Preco=('v_unit_real', 'min'),
+        Maior_Preco=('v_unit_real', 'max'),
+        Qtd_Compras=('n_nf', 'count')
+    ).reset_index()
+    df_neg['Saving_Potencial'] = df_neg['Gasto_Total'] - (df_neg['Menor_Preco'] * df_neg['Qtd_Total'])
+    df_neg['Volatilidade'] = df_neg.apply(
+        lambda x: (x['Maior_Preco'] - x['Menor_Preco']) / x['Menor_Preco'] if x['Menor_Preco'] > 0 else 0, axis=1
+    )
+    return df_neg[df_neg['Saving_Potencial'] > 10].sort_values('Saving_Potencial', ascending=False)
+
+
+def rerun_novo(tabela, pagina=1, por_pagina=50):
+    opps = tabela[tabela['Saving_Potencial'] > 10]
+    inicio = (pagina - 1) * por_pagina
+    return opps, opps.iloc[inicio:inicio + por_pagina]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--linhas", type=int, default=1000000)
+    ap.add_argument("--raw", default=RAW_DB)
+    args = ap.parse_args()
+
+    df = gerar_historico(args.linhas, args.raw)
+    t = time.perf_counter()
+    antigo = rerun_antigo(df)
+    t_antigo = time.perf_counter() - t
+    t = time.perf_counter()
+    tabela = negociacao_itens(df)
+    t_tabela = time.perf_counter() - t
+    t = time.perf_counter()
+    novo, _ = rerun_novo(tabela)
+    t_novo = time.perf_counter() - t
+
+    print(f"Linhas: {len(df)} | itens: {len(tabela)} | oportunidades: {len(novo)}")
+    print(f"Rerun antigo {t_antigo:.2f}s | tabela (uma vez por versão) {t_tabela:.2f}s | "
+          f"rerun novo {t_novo * 1000:.1f} ms ({t_antigo / t_novo:.0f}x)")
+
+    chave = ['desc_prod', 'Categoria', 'cod_prod']
+    a = antigo.astype({c: str for c in chave}).sort_values(chave).reset_index(drop=True)
+    b = novo.astype({c: str for c in chave}).sort_values(chave).reset_index(drop=True)
+    ok = (len(a) == len(b) and (a[chave] == b[chave]).all().all()
+          and all(np.allclose(a[c].astype(float), b[c].astype(float), equal_nan=True)
+                  for c in ['Gasto_Total', 'Qtd_Total', 'Preco_Medio', 'Menor_Preco', 'Maior_Preco',
+                            'Qtd_Compras', 'Saving_Potencial', 'Volatilidade']))
+    print(f"Oportunidades iguais: {ok} | ordem por saving: {novo['Saving_Potencial'].is_monotonic_decreasing}")
+
+
+if __name__ == "__main__":
+    main()
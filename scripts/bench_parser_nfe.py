@@ -0,0 +1,117 @@
+"""
+Micro-benchmark: extrair_nota (ET.parse + pegar_valor) x extrair_nota_stream (iterparse).
+
+No fim, um procNFe grande gravado em disco passa pelo processar_arquivo (hash + parse, lendo
+em blocos) e pelo caminho antigo dele (arquivo inteiro em memória, parse de uma cópia em
+BytesIO): pico de memória de cada um com os dois parsers.
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_parser_nfe --notas 2000 --itens 40 --itens-grande 20000
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from extrator_compras import NS_NFE, PARSERS, extrair_nota, extrair_nota_stream, processar_arquivo
+
+
+def gerar_nota(i, n_itens, envelope=True, rnd=None):
+    rnd = rnd or random.Random(i)
+    dets = []
+    for k in range(n_itens):
+        inf_ad = f"<infAdProd>LOTE {rnd.randrange(999)}</infAdProd>" if rnd.random() < 0.3 else ""
+        dets.append(
+            f'<det nItem="{k + 1}"><prod><cProd>P{rnd.randrange(99999)}</cProd><cEAN>SEM GTIN</cEAN>'
+            f'<xProd>PARAFUSO SEXTAVADO M{rnd.randrange(4, 30)} INOX</xProd><NCM>7318{rnd.randrange(1000, 9999)}</NCM>'
+            f'<CFOP>{rnd.choice(["5102", "6102", "5405", "1202"])}</CFOP><uCom>PC</uCom>'
+            f'<qCom>{rnd.randrange(1, 500)}.0000</qCom><vUnCom>{rnd.random() * 50:.4f}</vUnCom>'
+            f'<vProd>{rnd.random() * 5000:.2f}</vProd><indTot>1</indTot></prod>'
+            f'<imposto><ICMS><ICMS00><orig>0</orig><CST>00</CST><vICMS>{rnd.random() * 90:.2f}</vICMS></ICMS00></ICMS>'
+            f'<PIS><PISAliq><CST>01</CST><vPIS>1.00</vPIS></PISAliq></PIS></imposto>{inf_ad}</det>'
+        )
+    inf = (
+        f'<infNFe Id="NFe3524{i:040d}" versao="4.00">'
+        f'<ide><cUF>35</cUF><natOp>VENDA DE MERCADORIA</natOp><nNF>{i}</nNF><dhEmi>2024-05-10T10:00:00-03:00</dhEmi></ide>'
+        f'<emit><CNPJ>11222333000144</CNPJ><xNome>FORNECEDOR {i % 97} LTDA</xNome>'
+        f'<enderEmit><xLgr>RUA A</xLgr><nro>1</nro><xBairro>CENTRO</xBairro><xMun>SAO PAULO</xMun><UF>SP</UF><CEP>01000000</CEP></enderEmit></emit>'
+        + "".join(dets)
+        + '<total><ICMSTot><vNF>1.00</vNF></ICMSTot></total></infNFe>'
+    )
+    xml = f'<NFe xmlns="{NS_NFE}">{inf}</NFe>'
+    if envelope:
+        xml = f'<nfeProc xmlns="{NS_NFE}" versao="4.00">{xml}<protNFe><infProt><chNFe>{i}</chNFe></infProt></protNFe></nfeProc>'
+    return ('<?xml version="1.0" encoding="UTF-8"?>' + xml).encode()
+
+
+def cronometrar(parser, corpus, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        for dados in corpus:
+            parser(io.BytesIO(dados))
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+
+def pico_memoria(fn, *args):
+    tracemalloc.start()
+    fn(*args)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico
+
+
+def processar_antigo(tarefa, parser='arvore'):
+    """processar_arquivo como era: lê o arquivo inteiro, faz o hash e parseia uma cópia em BytesIO."""
+    arq, _ = tarefa
+    with open(arq, 'rb') as f:
+        dados = f.read()
+    return hashlib.sha1(dados).hexdigest(), PARSERS[parser](io.BytesIO(dados))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--notas", type=int, default=2000)
+    ap.add_argument("--itens", type=int, default=40, help="Máximo de itens por nota")
+    ap.add_argument("--repeticoes", type=int, default=3)
+    ap.add_argument("--itens-grande", type=int, default=20000, help="Itens do procNFe grande lido do disco")
+    args = ap.parse_args()
+
+    rnd = random.Random(42)
+    corpus = [gerar_nota(i, rnd.randint(1, args.itens), envelope=i % 2 == 0) for i in range(args.notas)]
+
+    divergentes = sum(extrair_nota(io.BytesIO(d)) != extrair_nota_stream(io.BytesIO(d)) for d in corpus)
+    print(f"Corpus: {len(corpus)} notas, {sum(map(len, corpus)) / 1e6:.1f} MB | divergências: {divergentes}")
+
+    t_arvore = cronometrar(extrair_nota, corpus, args.repeticoes)
+    t_stream = cronometrar(extrair_nota_stream, corpus, args.repeticoes)
+    print(f"ET.parse + pegar_valor : {t_arvore:.3f}s")
+    print(f"iterparse (stream)     : {t_stream:.3f}s  ({t_arvore / t_stream:.2f}x)")
+
+    grande = gerar_nota(0, 3000)
+    print(f"Pico de memória, nota com 3000 itens ({len(grande) / 1e6:.1f} MB):")
+    print(f"  ET.parse  : {pico_memoria(lambda: extrair_nota(io.BytesIO(grande))) / 1e6:.1f} MB")
+    print(f"  iterparse : {pico_memoria(lambda: extrair_nota_stream(io.BytesIO(grande))) / 1e6:.1f} MB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arq = os.path.join(tmp, "procNFe_grande.xml")
+        with open(arq, "wb") as f:
+            f.write(gerar_nota(1, args.itens_grande, envelope=True))
+        tarefa = (arq, None)
+        print(f"\nprocNFe em disco com {args.itens_grande} itens ({os.path.getsize(arq) / 1e6:.1f} MB), hash + parse:")
+        for parser in ("arvore", "stream"):
+            antigo = processar_antigo(tarefa, parser)
+            _, _, _, hash_novo, resultado = processar_arquivo(tarefa, parser)
+            igual = (hash_novo, resultado) == antigo
+            print(f"  {parser:<6} antigo (read + BytesIO): {pico_memoria(processar_antigo, tarefa, parser) / 1e6:6.1f} MB"
+                  f" | processar_arquivo: {pico_memoria(processar_arquivo, tarefa, parser) / 1e6:6.1f} MB"
+                  f" | hash e linhas iguais: {igual}")
+
+
+if __name__ == "__main__":
+    main()
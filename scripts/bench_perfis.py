@@ -0,0 +1,101 @@
+"""
+Benchmark do perfil de fornecedor da aba Fornecedores (utils.agregacoes.PerfisFornecedores).
+
+Com o histórico de data.dataset replicado --fator vezes, compara por clique no fornecedor:
+- antigo: df_full[nome_emit == f].copy(), definir_criticidade (soma o gasto global), contagem
+  de risco, sort por data e desc_view por apply linha a linha;
+- novo: consulta ao perfil (montado uma vez) + recorte das linhas do fornecedor.
+Confere criticidade, gasto, última compra, risco e as linhas, também com o histórico
+embaralhado (linhas do fornecedor fora de ordem: o perfil guarda a ordem).
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_perfis --fator 60
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.dataset import RAW_DB, carregar_historico
+from utils.agregacoes import PerfisFornecedores
+
+
+def definir_criticidade(df_fornecedor, gasto_total_global):
+    gasto_forn = df_fornecedor['v_total_item'].sum()
+    share = gasto_forn / gasto_total_global if gasto_total_global > 0 else 0
+    tem_critico = df_fornecedor['Categoria'].str.contains('CRÍTICO|QUÍMICO|IÇAMENTO|EPI', na=False).any()
+    if share > 0.05 or (tem_critico and share > 0.01):
+        return "🔴 ESTRATÉGICO"
+    elif share > 0.01 or tem_critico:
+        return "🟡 TÁTICO"
+    return "🟢 OPERACIONAL"
+
+
+def clique_antigo(df_full, forn):
+    df_forn = df_full[df_full['nome_emit'] == forn].copy()
+    tag = definir_criticidade(df_forn, df_full['v_total_item'].sum())
+    qtd_risco = len(df_forn[df_forn['Risco_Compliance'] == True])
+    view = df_forn.sort_values('data_emissao', ascending=False).copy()
+    view['desc_view'] = view.apply(lambda x: f"⚠️ {x['desc_prod']}" if x['Risco_Compliance'] else x['desc_prod'], axis=1)
+    return tag, df_forn['v_total_item'].sum(), df_forn['data_emissao'].max(), qtd_risco, view
+
+
+def clique_novo(df_full, perfis, forn):
+    perfil = perfis.tabela.loc[forn]
+    view = perfis.linhas(df_full, forn)
+    desc = view['desc_prod'].astype(object)
+    risco = view['Risco_Compliance'].fillna(False).astype(bool)
+    view = view.assign(desc_view=desc.where(~risco, "⚠️ " + desc.astype(str)))
+    return perfil['Criticidade'], perfil['Gasto_Total'], perfil['Ultima_Compra'], perfil['Qtd_Risco'], view
+
+
+def confere(df, perfis, fornecedores):
+    for f in fornecedores:
+        a, b = clique_antigo(df, f), clique_novo(df, perfis, f)
+        if a[0] != b[0] or not np.isclose(a[1], b[1]) or a[2] != b[2] or a[3] != b[3]:
+            return False
+        # mesmas linhas, em ordem de data decrescente (empates de data podem trocar de lugar)
+        if not (a[4]['data_emissao'].to_numpy() == b[4]['data_emissao'].to_numpy()).all():
+            return False
+        if sorted(a[4]['desc_view'].astype(str)) != sorted(b[4]['desc_view'].astype(str)):
+            return False
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fator", type=int, default=60)
+    ap.add_argument("--raw", default=RAW_DB)
+    args = ap.parse_args()
+
+    base = carregar_historico(args.raw)
+    df = pd.concat([base] * args.fator, ignore_index=True) if args.fator > 1 else base
+    df = df.sort_values(['nome_emit', 'data_emissao'], ascending=[True, False], kind='stable',
+                        na_position='last', ignore_index=True)
+    t = time.perf_counter()
+    perfis = PerfisFornecedores(df)
+    t_perfis = time.perf_counter() - t
+    print(f"Linhas: {len(df)} | fornecedores: {len(perfis.tabela)} | perfis em {t_perfis:.2f}s (uma vez por versão)")
+
+    # fornecedores de tamanhos variados: o maior, um mediano e um pequeno
+    tabela = perfis.tabela.sort_values('Qtd_Linhas', ascending=False)
+    amostra = [tabela.index[0], tabela.index[len(tabela) // 10], tabela.index[len(tabela) // 2]]
+    for f in amostra:
+        t = time.perf_counter()
+        clique_antigo(df, f)
+        t_antigo = time.perf_counter() - t
+        t = time.perf_counter()
+        clique_novo(df, perfis, f)
+        t_novo = time.perf_counter() - t
+        print(f"{f[:40]:40} {int(tabela.at[f, 'Qtd_Linhas']):>7} linhas | antigo {t_antigo * 1000:7.0f} ms | "
+              f"perfil {t_novo * 1000:6.1f} ms ({t_antigo / t_novo:.0f}x)")
+
+    conferir = list(tabela.index[:: max(1, len(tabela) // 200)])
+    embaralhado = base.sample(frac=1, random_state=42).reset_index(drop=True)
+    print(f"Iguais ao antigo: ordenado {confere(df, perfis, conferir[:20])} | "
+          f"embaralhado {confere(embaralhado, PerfisFornecedores(embaralhado), conferir)}")
+
+
+if __name__ == "__main__":
+    main()
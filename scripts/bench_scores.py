@@ -0,0 +1,80 @@
+"""
+Benchmark do score de fornecedores (utils.agregacoes.scores_fornecedores).
+
+Com o histórico de data.dataset (base_compras replicado --fator vezes, um sufixo por cópia no
+nome do fornecedor para multiplicar os fornecedores) e o mercado por item (Menor_Preco),
+compara o calcular_score_fornecedor antigo — isin + groupby + merge a cada fornecedor — chamado
+para todos os fornecedores com a tabela de scores de uma passada, e confere as notas.
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_scores --fator 4
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.dataset import RAW_DB, carregar_historico, otimizar_dtypes
+from utils.agregacoes import resumo_itens, scores_fornecedores
+
+
+def calcular_score_fornecedor(df_fornecedor, df_mercado):
+    itens = df_fornecedor['desc_prod'].unique()
+    ref = df_mercado[df_mercado['desc_prod'].isin(itens)]
+    if ref.empty:
+        score_preco = 10
+    else:
+        comp = df_fornecedor.groupby('desc_prod', observed=True)['v_unit_real'].mean().reset_index()
+        comp = comp.merge(ref[['desc_prod', 'Menor_Preco']], on='desc_prod')
+        comp = comp[comp['v_unit_real'] > 0]
+        if comp.empty:
+            score_preco = 10
+        else:
+            comp['ratio'] = comp['Menor_Preco'] / comp['v_unit_real']
+            score_preco = comp['ratio'].mean() * 10
+    total = df_fornecedor['v_total_item'].sum()
+    taxa = (df_fornecedor['Imposto_Total'].sum() / total) if total > 0 else 0
+    score_tax = (1 - taxa) * 10
+    nota = (score_preco * 0.7) + (score_tax * 0.3)
+    return min(10, max(0, nota))
+
+
+def historico(fator, raw_db=RAW_DB):
+    df = carregar_historico(raw_db)
+    if fator > 1:
+        copias = []
+        for i in range(fator):
+            c = df.copy()
+            c['nome_emit'] = c['nome_emit'].astype(str) + ("" if i == 0 else f" #{i}")
+            copias.append(c)
+        df = otimizar_dtypes(pd.concat(copias, ignore_index=True))
+    return df
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fator", type=int, default=4)
+    ap.add_argument("--raw", default=RAW_DB)
+    args = ap.parse_args()
+
+    df = historico(args.fator, args.raw)
+    mercado = resumo_itens(df).rename(columns={'Preco_Min': 'Menor_Preco'})
+    fornecedores = df['nome_emit'].dropna().unique()
+    print(f"Linhas: {len(df)} | fornecedores: {len(fornecedores)} | itens no mercado: {len(mercado)}")
+
+    t = time.perf_counter()
+    antigo = pd.Series({f: calcular_score_fornecedor(df[df['nome_emit'] == f], mercado) for f in fornecedores})
+    t_antigo = time.perf_counter() - t
+    t = time.perf_counter()
+    scores = scores_fornecedores(df, mercado)
+    t_novo = time.perf_counter() - t
+
+    novo = scores['Score'].reindex(antigo.index)
+    ok = np.allclose(antigo.to_numpy(dtype=float), novo.to_numpy(dtype=float), atol=1e-9)
+    print(f"Um fornecedor por vez {t_antigo:.2f}s ({t_antigo / len(fornecedores) * 1000:.1f} ms cada) | "
+          f"tabela de scores {t_novo:.2f}s ({t_antigo / t_novo:.0f}x) | notas iguais: {ok}")
+
+
+if __name__ == "__main__":
+    main()
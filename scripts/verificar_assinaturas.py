@@ -0,0 +1,110 @@
+"""
+Regressão da detecção de mudanças do build incremental do curated.
+
+Monta o curated sobre uma cópia do base_compras (fixture sintética ou --raw), edita uma
+linha por vez nas colunas que a assinatura por ano precisa enxergar (data movida dentro do
+ano, unidade, código, CNPJ, NF, texto trocado por outro do mesmo tamanho), e confere que
+cada build refaz exatamente o ano editado. No fim compara o curated incremental (fato_itens,
+bench_item e compliance_flags) com um build do zero. Sai com código 1 se alguma edição passar despercebida.
+
+Uso (na raiz do projeto):
+    python -m scripts.verificar_assinaturas --linhas 5000
+    python -m scripts.verificar_assinaturas --raw compras_suprimentos.db   # edita uma CÓPIA
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from processing.curated import construir_curated, verificar_bench_item
+from scripts.verificar_planos import gerar_raw
+
+SQL_FATO = """
+SELECT doc_id, ano, data_emissao, cnpj_emit, nome_emit, n_nf, item_key, cod_prod, descricao, ncm, unidade,
+       qtd, v_unit, v_total, imposto
+FROM fato_itens
+"""
+SQL_BENCH = "SELECT * FROM bench_item"
+SQL_COMPLIANCE = "SELECT * FROM compliance_flags"
+
+
+def _troca_letra(texto):
+    """Mesmo tamanho, conteúdo diferente."""
+    texto = texto or "X"
+    return ("Z" if texto[0] != "Z" else "Y") + texto[1:]
+
+
+def edicoes(con):
+    """(rótulo, coluna, novo valor) para a primeira linha do base_compras."""
+    rowid, data, u, cod, cnpj, nf, desc = con.execute(
+        "SELECT rowid, data_emissao, u_medida, cod_prod, cnpj_emit, n_nf, desc_prod FROM base_compras "
+        "WHERE length(data_emissao) >= 10 ORDER BY rowid LIMIT 1"
+    ).fetchone()
+    mes = int(data[5:7]) % 12 + 1
+    return rowid, int(data[:4]), [
+        ("data movida dentro do ano", "data_emissao", f"{data[:4]}-{mes:02d}-{data[8:10]}"),
+        ("unidade", "u_medida", "CX" if u != "CX" else "UN"),
+        ("código do produto", "cod_prod", _troca_letra(cod)),
+        ("CNPJ do emitente", "cnpj_emit", _troca_letra(cnpj)),
+        ("número da NF", "n_nf", _troca_letra(nf)),
+        ("descrição do mesmo tamanho", "desc_prod", _troca_letra(desc)),
+        ("descrição que muda a categoria", "desc_prod", "LUVA NITRILICA EPI CA 12345"),
+    ]
+
+
+def _conteudo(caminho, sql):
+    con = sqlite3.connect(caminho)
+    try:
+        return sorted(con.execute(sql).fetchall(), key=repr)
+    finally:
+        con.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--linhas", type=int, default=5000, help="Linhas do base_compras sintético")
+    ap.add_argument("--raw", help="Usa uma cópia deste base_compras em vez da fixture")
+    args = ap.parse_args()
+
+    falhas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = os.path.join(tmp, "raw.db")
+        curated = os.path.join(tmp, "curated.sqlite")
+        if args.raw:
+            shutil.copyfile(args.raw, raw)
+        else:
+            gerar_raw(raw, "legado", args.linhas)
+        construir_curated(raw, curated)
+        if construir_curated(raw, curated):
+            falhas.append("build sem edição refez anos")
+
+        con = sqlite3.connect(raw)
+        rowid, ano, casos = edicoes(con)
+        con.close()
+        for rotulo, coluna, valor in casos:
+            with sqlite3.connect(raw) as con:
+                con.execute(f"UPDATE base_compras SET {coluna} = ? WHERE rowid = ?", [valor, rowid])
+            con.close()
+            refeitos = construir_curated(raw, curated)
+            ok = refeitos == [ano]
+            print(f"  {'✅' if ok else '❌'} {rotulo}: anos refeitos {refeitos} (esperado [{ano}])")
+            if not ok:
+                falhas.append(rotulo)
+
+        referencia = os.path.join(tmp, "referencia.sqlite")
+        construir_curated(raw, referencia, forcar=True)
+        for tabela, sql in (("fato_itens", SQL_FATO), ("bench_item", SQL_BENCH), ("compliance_flags", SQL_COMPLIANCE)):
+            if _conteudo(curated, sql) != _conteudo(referencia, sql):
+                falhas.append(f"{tabela} incremental difere do build do zero")
+        if verificar_bench_item(curated):
+            falhas.append("bench_item divergente do recálculo completo")
+
+    if falhas:
+        print(f"❌ {len(falhas)} falha(s): {falhas}")
+        raise SystemExit(1)
+    print("✅ Toda edição refez o ano certo e o curated incremental bate com o build do zero.")
+
+
+if __name__ == "__main__":
+    main()
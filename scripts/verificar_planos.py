@@ -0,0 +1,106 @@
+"""
+Regressão de planos de execução dos loaders do app sobre o DB curated.
+
+Gera um base_compras sintético (layout legado, com impostos, e layout do extrator, sem),
+roda o build do curated e confere com EXPLAIN QUERY PLAN que nenhum loader varre a
+fato_itens (ou a compliance_flags) inteira. Sai com código 1 se algum plano regredir.
+
+Uso (na raiz do projeto):
+    python -m scripts.verificar_planos --linhas 50000
+    python -m scripts.verificar_planos --curated data/curated/suprimentos_curated.sqlite
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+
+from data.database import TABELAS_VIGIADAS, abrir_leitura, verificar_planos
+from processing.curated import construir_curated
+
+LAYOUTS = {
+    "legado": (
+        ["data_emissao", "nome_emit", "cnpj_emit", "n_nf", "cod_prod", "desc_prod", "ncm", "u_medida",
+         "qtd_real", "v_unit_real", "v_total_item", "v_icms", "v_ipi", "v_pis", "v_cofins"]
+    ),
+    "extrator": (
+        ["chave_acesso", "data_emissao", "nome_emit", "cnpj_emit", "n_nf", "cod_prod", "desc_prod", "ncm",
+         "u_medida", "qtd", "v_unit", "v_prod", "v_total_item"]
+    ),
+}
+
+MATERIAIS = ["PARAFUSO SEXTAVADO", "LUVA NITRILICA", "CABO FLEXIVEL", "ROLAMENTO", "OLEO HIDRAULICO",
+             "DISJUNTOR", "CORREIA DENTADA", "DETERGENTE", "CAPACETE", "MANGUEIRA"]
+
+
+def gerar_raw(caminho, layout, n_linhas, seed=42):
+    rnd = random.Random(seed)
+    cols = LAYOUTS[layout]
+    with sqlite3.connect(caminho) as con:
+        con.execute(f"CREATE TABLE base_compras ({', '.join(cols)})")
+        linhas = []
+        for i in range(n_linhas):
+            n_nf = i // 8
+            qtd = rnd.randint(1, 200)
+            v_unit = round(rnd.uniform(0.5, 900), 2)
+            reg = {
+                "chave_acesso": f"3524{n_nf:040d}",
+                "data_emissao": f"{rnd.choice([2023, 2024, 2025])}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                "nome_emit": f"FORNECEDOR {n_nf % 150} LTDA",
+                "cnpj_emit": f"{n_nf % 150:014d}",
+                "n_nf": str(n_nf),
+                "cod_prod": f"P{rnd.randrange(5000)}",
+                "desc_prod": f"{rnd.choice(MATERIAIS)} {rnd.randrange(400)}",
+                "ncm": f"{rnd.randrange(10000000, 99999999)}",
+                "u_medida": rnd.choice(["UN", "PC", "KG", "M"]),
+                "qtd_real": qtd, "qtd": qtd,
+                "v_unit_real": v_unit, "v_unit": v_unit,
+                "v_total_item": round(qtd * v_unit, 2), "v_prod": round(qtd * v_unit, 2),
+                "v_icms": round(qtd * v_unit * 0.18, 2), "v_ipi": 0.0, "v_pis": 1.0, "v_cofins": 2.0,
+            }
+            linhas.append([reg[c] for c in cols])
+        con.executemany(f"INSERT INTO base_compras VALUES ({','.join('?' * len(cols))})", linhas)
+
+
+def conferir(curated_db, rotulo):
+    con = abrir_leitura(curated_db)
+    try:
+        planos, problemas = verificar_planos(con)
+    finally:
+        con.close()
+    print(f"--- {rotulo}")
+    for loader, linhas in planos.items():
+        print(f"  {loader}")
+        for det in linhas:
+            print(f"      {det}")
+    for loader, det in problemas:
+        print(f"  ❌ {loader}: {det}")
+    return problemas
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--linhas", type=int, default=50000, help="Linhas do base_compras sintético")
+    ap.add_argument("--curated", help="Confere um DB curated existente em vez da fixture")
+    args = ap.parse_args()
+
+    problemas = []
+    if args.curated:
+        problemas += conferir(args.curated, args.curated)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            for layout in LAYOUTS:
+                raw = os.path.join(tmp, f"raw_{layout}.db")
+                curated = os.path.join(tmp, f"curated_{layout}.sqlite")
+                gerar_raw(raw, layout, args.linhas)
+                construir_curated(raw, curated)
+                problemas += conferir(curated, f"fixture {layout} ({args.linhas} linhas)")
+
+    if problemas:
+        print(f"❌ {len(problemas)} plano(s) com varredura completa de {'/'.join(TABELAS_VIGIADAS)}.")
+        raise SystemExit(1)
+    print(f"✅ Nenhum loader varre {'/'.join(TABELAS_VIGIADAS)} inteira.")
+
+
+if __name__ == "__main__":
+    main()
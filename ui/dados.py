@@ -0,0 +1,22 @@
+import streamlit as st
+
+from data.database import PoolLeitura, versao_arquivo
+from data.dataset import RAW_DB, carregar_historico, visao
+
+
+@st.cache_resource(show_spinner=False)
+def pool_leitura(db_path):
+    # Um pool por DB, compartilhado entre sessões/reruns (conexões read-only já com PRAGMAs)
+    return PoolLeitura(db_path)
+
+
+@st.cache_resource(show_spinner="Carregando o histórico de compras...", max_entries=2)
+def historico_compartilhado(db_path, versao):
+    # Um frame por versão do DB, o mesmo para todas as sessões e abas (que só leem)
+    return carregar_historico(db_path)
+
+
+def dados_da_aba(colunas, db_path=RAW_DB):
+    """(recorte do histórico com as colunas que a aba declara, versão do DB p/ os caches da aba)"""
+    versao = versao_arquivo(db_path)
+    return visao(historico_compartilhado(db_path, versao), colunas), versao
@@ -1,8 +1,22 @@
 import streamlit as st
 import pandas as pd
-from utils.formatters import format_brl
+from utils.agregacoes import resumo_itens
+from utils.busca import IndiceBusca, versao_frame
+from utils.formatters import format_brl, format_brl_series
 
-def render_tab_busca(df):
+COLUNAS_BUSCA = ['desc_prod', 'cod_prod']
+# Colunas do histórico que a aba usa (data.dataset.visao)
+COLUNAS_ABA = ['data_emissao', 'nome_emit', 'n_nf', 'cod_prod', 'desc_prod', 'Categoria', 'u_medida',
+               'qtd_real', 'v_unit_real', 'v_total_item', 'cod_tributario']
+
+
+@st.cache_resource(show_spinner="Indexando o histórico para a busca...", max_entries=4)
+def indice_busca(_df, versao):
+    # Um índice por versão do dataset, compartilhado entre reruns e sessões
+    return IndiceBusca(*[_df[c] for c in COLUNAS_BUSCA if c in _df.columns])
+
+
+def render_tab_busca(df, versao=None):
     st.markdown("### 🔍 Busca Avançada de Itens")
     st.caption("Pesquise em todo o histórico de compras (Base Completa).")
 
@@ -23,14 +37,13 @@ def render_tab_busca(df):
         forn_sel = st.selectbox("Fornecedor:", options=fornecedores)
 
     # 2. LÓGICA DE FILTRAGEM
-    df_result = df.copy()
-
+    # Busca pelo índice: todas as palavras, sem acento/caixa, na descrição ou no código
+    df_result = df
     if termo_busca:
-        # Busca insensível a maiúsculas/minúsculas
-        df_result = df_result[
-            df_result['desc_prod'].str.contains(termo_busca, case=False, na=False) |
-            df_result['cod_prod'].astype(str).str.contains(termo_busca, case=False, na=False)
-        ]
+        # versao: a de ui.dados.dados_da_aba; sem ela, hash do frame inteiro (a cada rerun)
+        if versao is None:
+            versao = versao_frame(df, COLUNAS_BUSCA)
+        df_result = df.iloc[indice_busca(df, versao).buscar(termo_busca)]
 
     if cat_sel != "Todas":
         df_result = df_result[df_result['Categoria'] == cat_sel]
@@ -50,31 +63,17 @@ def render_tab_busca(df):
     # 3. VISÃO AGRUPADA (Resumo do Item)
     st.subheader("📦 Resumo por Item")
     
-    # Define as chaves de agrupamento com segurança
-    # Se 'cod_prod' estiver vazio ou zerado, agrupa só pela descrição
-    group_cols = ['desc_prod', 'Categoria']
-    if 'cod_prod' in df_result.columns:
-        group_cols.append('cod_prod')
-
-    # Agregação usando as NOVAS colunas (v_unit_real, qtd_real, u_medida)
-    # Usamos a moda (valor mais comum) para a Unidade de Medida
-    df_group = df_result.groupby(group_cols).agg(
-        Preco_Medio=('v_unit_real', 'mean'),
-        Preco_Min=('v_unit_real', 'min'),
-        Preco_Max=('v_unit_real', 'max'),
-        Qtd_Total=('qtd_real', 'sum'),
-        Gasto_Total=('v_total_item', 'sum'),
-        Qtd_Compras=('n_nf', 'count'),
-        Unidade=('u_medida', lambda x: x.mode()[0] if not x.mode().empty else x.iloc[0])
-    ).reset_index()
+    # Agregação usando as NOVAS colunas (v_unit_real, qtd_real, u_medida), por item
+    # (desc_prod, Categoria e cod_prod se existir); Unidade = a mais comum no item
+    df_group = resumo_itens(df_result)
 
     # Formatação para exibição
-    df_view = df_group.sort_values('Gasto_Total', ascending=False).copy()
+    df_view = df_group.sort_values('Gasto_Total', ascending=False)
     
-    df_view['Preço Médio'] = df_view['Preco_Medio'].apply(format_brl)
-    df_view['Menor Preço'] = df_view['Preco_Min'].apply(format_brl)
-    df_view['Maior Preço'] = df_view['Preco_Max'].apply(format_brl)
-    df_view['Total Gasto'] = df_view['Gasto_Total'].apply(format_brl)
+    df_view['Preço Médio'] = format_brl_series(df_view['Preco_Medio'])
+    df_view['Menor Preço'] = format_brl_series(df_view['Preco_Min'])
+    df_view['Maior Preço'] = format_brl_series(df_view['Preco_Max'])
+    df_view['Total Gasto'] = format_brl_series(df_view['Gasto_Total'])
 
     # Seleção de colunas finais
     cols_final = ['desc_prod', 'Categoria', 'Unidade', 'Qtd_Compras', 'Qtd_Total', 'Preço Médio', 'Menor Preço', 'Maior Preço', 'Total Gasto']
@@ -95,25 +94,23 @@ def render_tab_busca(df):
 
     # 4. DETALHE DOS REGISTROS (Tabela Completa)
     with st.expander("📝 Ver Detalhe de Todas as Compras (Histórico Completo)"):
-        # Prepara tabela detalhada
-        df_detalhe = df_result.sort_values('data_emissao', ascending=False).copy()
-        
-        # Formatações
-        df_detalhe['Data'] = df_detalhe['data_emissao'].dt.strftime('%d/%m/%Y')
-        df_detalhe['Preço Unit.'] = df_detalhe['v_unit_real'].apply(format_brl)
-        df_detalhe['Total Item'] = df_detalhe['v_total_item'].apply(format_brl)
-        
+        # Prepara tabela detalhada (valores seguem numéricos: o column_config formata na tela)
+        df_detalhe = df_result.sort_values('data_emissao', ascending=False)
+
         # Colunas de exibição
-        cols_detalhe = ['Data', 'nome_emit', 'n_nf', 'desc_prod', 'qtd_real', 'u_medida', 'Preço Unit.', 'Total Item']
+        cols_detalhe = ['data_emissao', 'nome_emit', 'n_nf', 'desc_prod', 'qtd_real', 'u_medida', 'v_unit_real', 'v_total_item']
         if 'cod_tributario' in df_detalhe.columns:
              cols_detalhe.append('cod_tributario')
 
         st.dataframe(
             df_detalhe[cols_detalhe],
             column_config={
+                "data_emissao": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
                 "nome_emit": "Fornecedor",
                 "qtd_real": st.column_config.NumberColumn("Qtd", format="%.2f"),
                 "u_medida": "Un.",
+                "v_unit_real": st.column_config.NumberColumn("Preço Unit.", format="R$ %.2f"),
+                "v_total_item": st.column_config.NumberColumn("Total Item", format="R$ %.2f"),
                 "cod_tributario": "CST/CSOSN"
             },
             use_container_width=True,
@@ -1,26 +1,58 @@
+import os
 import streamlit as st
 import pandas as pd
-from utils.formatters import format_brl
+from data.database import CURATED_DB, versao_arquivo
+from data.queries import (
+    SQL_COMPLIANCE_RESUMO, SQL_COMPLIANCE_CATEGORIAS, SQL_COMPLIANCE_FORNECEDORES, SQL_COMPLIANCE_OFENSORES,
+    sql_relatorio_acao,
+)
+from ui.dados import pool_leitura
+from utils.formatters import format_brl, format_brl_series
 
-def render_tab_compliance(df_full):
+
+def tem_compliance(db_path):
+    if not os.path.exists(db_path):
+        return False
+    with pool_leitura(db_path).conexao() as con:
+        return con.execute("SELECT 1 FROM sqlite_master WHERE name = 'compliance_flags'").fetchone() is not None
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_compliance(db_path, versao):
+    # Flags materializadas no build (processing.compliance); a aba só lê pelos índices
+    with pool_leitura(db_path).conexao() as con:
+        resumo = con.execute(SQL_COMPLIANCE_RESUMO).fetchone()
+        categorias = pd.read_sql_query(SQL_COMPLIANCE_CATEGORIAS, con)
+        fornecedores = [r[0] for r in con.execute(SQL_COMPLIANCE_FORNECEDORES)]
+        ofensores = pd.read_sql_query(SQL_COMPLIANCE_OFENSORES, con, params=[10])
+    return resumo, categorias, fornecedores, ofensores
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_relatorio_acao(db_path, versao, categorias, fornecedores):
+    sql, params = sql_relatorio_acao(categorias, fornecedores)
+    with pool_leitura(db_path).conexao() as con:
+        return pd.read_sql_query(sql, con, params=params)
+
+
+def render_tab_compliance(df_full=None, *, db_path=CURATED_DB):
+    # df_full: aceito como antes, mas não é mais lido (as flags vêm da compliance_flags do curated)
     st.markdown("### 🛡️ Painel de Compliance e Governança")
     st.caption("Monitoramento de riscos regulatórios e documentais (Base Completa)")
 
-    if 'Risco_Compliance' not in df_full.columns:
+    if not tem_compliance(db_path):
         st.info("Nenhum dado de compliance processado ainda.")
+        st.caption("Rode o build do curated: `python -m processing.curated`")
         return
 
-    # Filtra apenas itens que FALHARAM na validação
-    df_risco = df_full[df_full['Risco_Compliance'] == True].copy()
-    df_criticos = df_full[df_full['Categoria'].str.contains('CRÍTICO|QUÍMICO|EPI|IÇAMENTO', na=False)].copy()
+    versao = versao_arquivo(db_path)
+    (qtd_itens_risco, total_gasto_risco, forn_irregulares, total_critico), risco_cat, fornecedores, top_offenders = (
+        load_compliance(db_path, versao)
+    )
 
     # --- KPI CARDS ---
     c1, c2, c3, c4 = st.columns(4)
     
-    total_gasto_risco = df_risco['v_total_item'].sum()
-    qtd_itens_risco = len(df_risco)
-    forn_irregulares = df_risco['nome_emit'].nunique()
-    
     with c1:
         st.metric("Volume Financeiro em Risco", format_brl(total_gasto_risco))
     with c2:
@@ -28,7 +60,6 @@ def render_tab_compliance(df_full):
     with c3:
         st.metric("Fornecedores Ofensores", forn_irregulares)
     with c4:
-        total_critico = len(df_criticos)
         compliance_rate = ((total_critico - qtd_itens_risco) / total_critico * 100) if total_critico > 0 else 100
         st.metric("Índice de Conformidade", f"{compliance_rate:.1f}%")
 
@@ -39,24 +70,17 @@ def render_tab_compliance(df_full):
     
     with c_chart:
         st.subheader("🚨 Risco por Categoria")
-        if not df_risco.empty:
-            risco_cat = df_risco['Categoria'].value_counts()
-            st.bar_chart(risco_cat, color="#d32f2f")
+        if qtd_itens_risco:
+            st.bar_chart(risco_cat.set_index('categoria')['itens'], color="#d32f2f")
         else:
             st.success("Nenhum risco detectado.")
 
     with c_table:
         st.subheader("📋 Top Fornecedores com Pendências")
-        if not df_risco.empty:
-            top_offenders = df_risco.groupby('nome_emit').agg(
-                Itens_Irregulares=('desc_prod', 'count'),
-                Valor_Risco=('v_total_item', 'sum'),
-                Ultima_Infracao=('data_emissao', 'max')
-            ).sort_values('Itens_Irregulares', ascending=False).head(10).reset_index()
-            
+        if qtd_itens_risco:
             # Formatação manual antes de enviar para o dataframe para evitar erro de JSON
-            top_offenders['Valor_Risco_Formatado'] = top_offenders['Valor_Risco'].apply(format_brl)
-            top_offenders['Data_Formatada'] = top_offenders['Ultima_Infracao'].dt.strftime('%d/%m/%Y')
+            top_offenders['Valor_Risco_Formatado'] = format_brl_series(top_offenders['Valor_Risco'])
+            top_offenders['Data_Formatada'] = pd.to_datetime(top_offenders['Ultima_Infracao'], errors='coerce').dt.strftime('%d/%m/%Y')
             
             # Garantir que max_value para a barra de progresso seja pelo menos 1
             max_pendencias = int(top_offenders['Itens_Irregulares'].max()) if not top_offenders.empty else 1
@@ -85,22 +109,20 @@ def render_tab_compliance(df_full):
     # --- VISÃO 2: RELATÓRIO DE AÇÃO ---
     st.subheader("📝 Relatório de Ação (Itens para Regularização)")
     
-    if not df_risco.empty:
+    if qtd_itens_risco:
         # Filtros
         col_f1, col_f2 = st.columns(2)
         with col_f1:
-            filtro_cat = st.multiselect("Filtrar Categoria:", options=df_risco['Categoria'].unique(), key="f_cat")
+            filtro_cat = st.multiselect("Filtrar Categoria:", options=risco_cat['categoria'].tolist(), key="f_cat")
         with col_f2:
-            filtro_forn = st.multiselect("Filtrar Fornecedor:", options=df_risco['nome_emit'].unique(), key="f_forn")
+            filtro_forn = st.multiselect("Filtrar Fornecedor:", options=fornecedores, key="f_forn")
             
-        df_view = df_risco.copy()
-        if filtro_cat: df_view = df_view[df_view['Categoria'].isin(filtro_cat)]
-        if filtro_forn: df_view = df_view[df_view['nome_emit'].isin(filtro_forn)]
-        
-        # Limpeza de dados para o Dataframe (evita tipos não serializáveis)
-        df_export = df_view[['data_emissao', 'nome_emit', 'n_nf', 'desc_prod', 'Categoria', 'v_unit_real']].copy()
-        df_export['data_emissao'] = df_export['data_emissao'].dt.strftime('%d/%m/%Y')
-        df_export['Valor'] = df_export['v_unit_real'].apply(format_brl)
+        # Itens em risco com os filtros (pelos índices de categoria/fornecedor)
+        df_export = load_relatorio_acao(db_path, versao, tuple(filtro_cat), tuple(filtro_forn)).rename(
+            columns={'categoria': 'Categoria', 'v_unit': 'v_unit_real'}
+        )
+        df_export['data_emissao'] = pd.to_datetime(df_export['data_emissao'], errors='coerce').dt.strftime('%d/%m/%Y')
+        df_export['Valor'] = format_brl_series(df_export['v_unit_real'])
         
         def definir_acao(cat):
             cat = str(cat)
@@ -1,13 +1,7 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-
-
-def _brl(v):
-    try:
-        return f"R$ {float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except:
-        return "R$ 0,00"
+from utils.formatters import format_brl
 
 
 def render_tab_exec_review(df_ano: pd.DataFrame, df_grouped: pd.DataFrame):
@@ -45,7 +39,7 @@ def render_tab_exec_review(df_ano: pd.DataFrame, df_grouped: pd.DataFrame):
     with c1:
         st.metric(
             "💰 Gasto Total",
-            _brl(gasto_total),
+            format_brl(gasto_total),
             help=(
                 "Valor total gasto no período selecionado. "
                 "Representa o impacto financeiro direto das compras realizadas."
@@ -58,7 +52,7 @@ def render_tab_exec_review(df_ano: pd.DataFrame, df_grouped: pd.DataFrame):
 
     c2.metric(
         "🎯 Oportunidade de Saving",
-        _brl(saving_equalizado),
+        format_brl(saving_equalizado),
         help=(
             "Estimativa de economia baseada na equalização do preço da última compra "
             "em relação ao preço médio histórico do item, considerando o volume do período."
@@ -67,7 +61,7 @@ def render_tab_exec_review(df_ano: pd.DataFrame, df_grouped: pd.DataFrame):
 
     c3.metric(
         "⚠️ Gasto com Itens Críticos",
-        _brl(gasto_critico),
+        format_brl(gasto_critico),
         help=(
             "Total gasto em itens classificados como críticos "
             "(impacto operacional, segurança, compliance ou continuidade)."
@@ -77,7 +71,7 @@ def render_tab_exec_review(df_ano: pd.DataFrame, df_grouped: pd.DataFrame):
     with c4:
         st.metric(
             "🏛️ Imposto Total",
-            _brl(imposto_total),
+            format_brl(imposto_total),
             help=(
                 "Total de impostos incidentes sobre as compras do período "
                 "(ICMS, IPI, PIS, COFINS, conforme disponibilidade dos dados)."
@@ -2,8 +2,14 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import random
+from utils.agregacoes import PerfisFornecedores, scores_fornecedores
+from utils.busca import versao_frame
 from utils.formatters import format_brl, format_perc
 
+# Colunas do histórico que a aba usa (data.dataset.visao)
+COLUNAS_ABA = ['data_emissao', 'nome_emit', 'cnpj_emit', 'n_nf', 'desc_prod', 'Categoria', 'u_medida', 'qtd_real',
+               'v_unit_real', 'v_total_item', 'Imposto_Total', 'Risco_Compliance', 'Numero_CA']
+
 # --- LÓGICA DE NEGÓCIO ---
 
 def gerar_dados_cadastrais(nome_fornecedor):
@@ -16,56 +22,29 @@ def gerar_dados_cadastrais(nome_fornecedor):
         "email": f"{random.choice(dominios)}@{nome_fornecedor.split()[0].lower()}.com.br".replace(".", "").replace(",", "")
     }
 
-def definir_criticidade(df_fornecedor, gasto_total_global):
-    gasto_forn = df_fornecedor['v_total_item'].sum()
-    share = gasto_forn / gasto_total_global if gasto_total_global > 0 else 0
-    
-    # Verifica itens críticos
-    tem_critico = False
-    if 'Categoria' in df_fornecedor.columns:
-        tem_critico = df_fornecedor['Categoria'].str.contains('CRÍTICO|QUÍMICO|IÇAMENTO|EPI', na=False).any()
-    
-    if share > 0.05 or (tem_critico and share > 0.01):
-        return "🔴 ESTRATÉGICO", "Alto volume financeiro ou itens de risco crítico."
-    elif share > 0.01 or tem_critico:
-        return "🟡 TÁTICO", "Fornecimento relevante ou itens técnicos."
-    else:
-        return "🟢 OPERACIONAL", "Itens de baixo risco ou cauda longa (Spot)."
+@st.cache_resource(show_spinner="Calculando o score dos fornecedores...", max_entries=4)
+def tabela_scores(_df_full, _df_mercado, versao):
+    # Score de todos os fornecedores de uma vez, por versão dos dados (a aba só consulta)
+    return scores_fornecedores(_df_full, _df_mercado)
 
-def calcular_score_fornecedor(df_fornecedor, df_mercado):
-    # 1. Preço
-    itens = df_fornecedor['desc_prod'].unique()
-    ref = df_mercado[df_mercado['desc_prod'].isin(itens)]
-    
-    if ref.empty:
-        score_preco = 10
-    else:
-        # Usa v_unit_real (novo nome)
-        comp = df_fornecedor.groupby('desc_prod')['v_unit_real'].mean().reset_index()
-        comp = comp.merge(ref[['desc_prod', 'Menor_Preco']], on='desc_prod')
-        comp = comp[comp['v_unit_real'] > 0]
-        
-        if comp.empty:
-            score_preco = 10
-        else:
-            comp['ratio'] = comp['Menor_Preco'] / comp['v_unit_real']
-            score_preco = comp['ratio'].mean() * 10
-
-    # 2. Fiscal
-    total = df_fornecedor['v_total_item'].sum()
-    taxa = (df_fornecedor['Imposto_Total'].sum() / total) if total > 0 else 0
-    score_tax = (1 - taxa) * 10
-    
-    nota = (score_preco * 0.7) + (score_tax * 0.3)
-    return min(10, max(0, nota))
+
+@st.cache_resource(show_spinner="Montando o perfil dos fornecedores...", max_entries=4)
+def perfis_fornecedores(_df_full, versao):
+    # Gasto, criticidade, risco e onde estão as linhas de cada fornecedor, por versão dos dados
+    return PerfisFornecedores(_df_full)
 
 # --- RENDERIZAÇÃO ---
 
-def render_tab_fornecedores(df_full, df_final_full):
+def render_tab_fornecedores(df_full, df_final_full, versao=None):
     st.markdown("### 📇 Gestão de Relacionamento (SRM)")
     st.caption("Base Completa (Sem filtro de ano)")
     
-    lista_f = df_full.groupby('nome_emit')['v_total_item'].sum().sort_values(ascending=False).index
+    # versao: a de ui.dados.dados_da_aba; sem ela, hash do frame inteiro (a cada rerun)
+    if versao is None:
+        versao = versao_frame(df_full, ['nome_emit', 'data_emissao', 'desc_prod', 'v_unit_real', 'v_total_item'])
+    perfis = perfis_fornecedores(df_full, versao)
+    scores = tabela_scores(df_full, df_final_full, (versao, versao_frame(df_final_full, ['desc_prod', 'Menor_Preco'])))
+    lista_f = perfis.tabela.index
     
     c_search, _ = st.columns([1, 2])
     with c_search:
@@ -73,19 +52,45 @@ def render_tab_fornecedores(df_full, df_final_full):
 
     st.divider()
 
+    with st.expander("🏆 Ranking de Fornecedores (Score)", expanded=not forn_sel):
+        f1, f2 = st.columns([2, 1])
+        with f1:
+            filtro_nome = st.text_input("Filtrar fornecedor:", key="rank_nome")
+        with f2:
+            nota_min = st.slider("Score mínimo:", 0.0, 10.0, 0.0, 0.5, key="rank_min")
+        ranking = scores[scores['Score'] >= nota_min]
+        if filtro_nome:
+            ranking = ranking[ranking.index.str.contains(filtro_nome, case=False, na=False, regex=False)]
+        st.caption(f"{len(ranking)} de {len(scores)} fornecedores")
+        st.dataframe(
+            ranking.reset_index()[['Ranking', 'nome_emit', 'Score', 'Score_Preco', 'Score_Fiscal',
+                                   'Itens_Comparados', 'Gasto_Total', 'Carga_Tributaria']],
+            column_config={
+                "Ranking": st.column_config.NumberColumn("#", format="%d"),
+                "nome_emit": "Fornecedor",
+                "Score": st.column_config.ProgressColumn("Score", format="%.1f", min_value=0, max_value=10),
+                "Score_Preco": st.column_config.NumberColumn("Preço", format="%.1f"),
+                "Score_Fiscal": st.column_config.NumberColumn("Fiscal", format="%.1f"),
+                "Itens_Comparados": st.column_config.NumberColumn("Itens c/ Ref.", format="%d"),
+                "Gasto_Total": st.column_config.NumberColumn("Volume", format="R$ %.2f"),
+                "Carga_Tributaria": st.column_config.NumberColumn("Carga Trib.", format="percent"),
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
     if not forn_sel:
         st.info("👆 Selecione um fornecedor acima.")
         return
 
-    df_forn = df_full[df_full['nome_emit'] == forn_sel].copy()
+    # Só as linhas do fornecedor (já da mais recente para a mais antiga), pela faixa do perfil
+    perfil = perfis.tabela.loc[forn_sel]
+    df_forn = perfis.linhas(df_full, forn_sel)
     cadastro = gerar_dados_cadastrais(forn_sel)
     
-    tag_criticidade, motivo = definir_criticidade(df_forn, df_full['v_total_item'].sum())
-    nota = calcular_score_fornecedor(df_forn, df_final_full)
-    
-    qtd_risco = 0
-    if 'Risco_Compliance' in df_forn.columns:
-        qtd_risco = len(df_forn[df_forn['Risco_Compliance'] == True])
+    tag_criticidade, motivo = perfil['Criticidade'], perfil['Motivo']
+    nota = scores.at[forn_sel, 'Score']
+    qtd_risco = int(perfil['Qtd_Risco'])
 
     cor_borda = "#388e3c"
     if "ESTRATÉGICO" in tag_criticidade: cor_borda = "#d32f2f"
@@ -113,8 +118,8 @@ def render_tab_fornecedores(df_full, df_final_full):
                 st.error(f"⚠️ **COMPLIANCE:** {qtd_risco} itens sem documentação.")
 
         with c2:
-            st.metric("Volume Total (Lifetime)", format_brl(df_forn['v_total_item'].sum()))
-            st.metric("Última Compra", df_forn['data_emissao'].max().strftime('%d/%m/%Y'))
+            st.metric("Volume Total (Lifetime)", format_brl(perfil['Gasto_Total']))
+            st.metric("Última Compra", perfil['Ultima_Compra'].strftime('%d/%m/%Y') if pd.notna(perfil['Ultima_Compra']) else "-")
 
         with c3:
             st.markdown(f"<div class='big-score'>{nota:.1f}</div>", unsafe_allow_html=True)
@@ -125,22 +130,19 @@ def render_tab_fornecedores(df_full, df_final_full):
     # --- TABELA HISTÓRICA ---
     st.subheader(f"📦 Histórico de Fornecimento ({len(df_forn)} itens)")
     
-    view = df_forn.sort_values('data_emissao', ascending=False).copy()
+    view = df_forn
     
-    # Criação segura da coluna visual
+    # Criação segura da coluna visual (⚠️ na frente dos itens com risco de compliance)
+    desc = view['desc_prod'].astype(object)
     if 'Risco_Compliance' in view.columns:
-        view['desc_view'] = view.apply(
-            lambda x: f"⚠️ {x['desc_prod']}" if x['Risco_Compliance'] else x['desc_prod'], axis=1
-        )
+        risco = view['Risco_Compliance'].fillna(False).astype(bool)
+        view = view.assign(desc_view=desc.where(~risco, "⚠️ " + desc.astype(str)))
     else:
-        view['desc_view'] = view['desc_prod']
+        view = view.assign(desc_view=desc)
         
-    view['Preço Unit.'] = view['v_unit_real'].apply(format_brl)
-    view['Total'] = view['v_total_item'].apply(format_brl)
-    
     # DEFINIÇÃO SEGURA DAS COLUNAS (AQUI ESTAVA O ERRO)
     # Lista de colunas desejadas na ordem
-    desired_cols = ['data_emissao', 'desc_view', 'qtd_real', 'u_medida', 'Preço Unit.', 'Total', 'n_nf', 'Numero_CA']
+    desired_cols = ['data_emissao', 'desc_view', 'qtd_real', 'u_medida', 'v_unit_real', 'v_total_item', 'n_nf', 'Numero_CA']
     
     # Filtra apenas as que realmente existem no dataframe para evitar KeyError
     final_cols = [c for c in desired_cols if c in view.columns]
@@ -152,6 +154,9 @@ def render_tab_fornecedores(df_full, df_final_full):
             "desc_view": "Material / Serviço",
             "qtd_real": st.column_config.NumberColumn("Qtd.", format="%.2f"),
             "u_medida": "Unid.",  # Nome corrigido (antes era un_real)
+            # Preço/total seguem numéricos (ordenáveis); o column_config formata na tela
+            "v_unit_real": st.column_config.NumberColumn("Preço Unit.", format="R$ %.2f"),
+            "v_total_item": st.column_config.NumberColumn("Total", format="R$ %.2f"),
             "Numero_CA": "CA (EPI)"
         },
         use_container_width=True,
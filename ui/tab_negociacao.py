@@ -1,46 +1,65 @@
 import streamlit as st
 import pandas as pd
+from utils.agregacoes import chaves_item, negociacao_itens
+from utils.busca import versao_frame
 from utils.formatters import format_brl, format_perc
 
-def render_tab_negociacao(df):
+# Colunas do histórico que a aba usa (data.dataset.visao)
+COLUNAS_ABA = ['n_nf', 'cod_prod', 'desc_prod', 'Categoria', 'qtd_real', 'v_unit_real', 'v_total_item']
+POR_PAGINA = 50
+
+
+@st.cache_resource(show_spinner="Calculando oportunidades de negociação...", max_entries=4)
+def tabela_negociacao(_df, versao):
+    # Uma tabela por versão dos dados; a aba só filtra e pagina sobre ela
+    return negociacao_itens(_df)
+
+
+def render_tab_negociacao(df, versao=None):
     st.markdown("### 💰 Cockpit de Negociação & Savings")
 
     # DEFINE COLUNAS DE AGRUPAMENTO COM SEGURANÇA
-    group_cols = ['desc_prod', 'Categoria']
-    if 'cod_prod' in df.columns:
-        group_cols.append('cod_prod')
+    group_cols = chaves_item(df)
 
     try:
-        df_neg = df.groupby(group_cols).agg(
-            Gasto_Total=('v_total_item', 'sum'),
-            Qtd_Total=('qtd_real', 'sum'),
-            Preco_Medio=('v_unit_real', 'mean'),
-            Menor_Preco=('v_unit_real', 'min'),
-            Maior_Preco=('v_unit_real', 'max'),
-            Qtd_Compras=('n_nf', 'count')
-        ).reset_index()
+        # versao: a de ui.dados.dados_da_aba; sem ela, hash do frame inteiro (a cada rerun)
+        if versao is None:
+            versao = versao_frame(df, group_cols + ['v_unit_real', 'qtd_real', 'v_total_item'])
+        df_neg = tabela_negociacao(df, versao)
     except KeyError as e:
         st.error(f"Erro no agrupamento: {e}")
         return
 
-    df_neg['Saving_Potencial'] = df_neg['Gasto_Total'] - (df_neg['Menor_Preco'] * df_neg['Qtd_Total'])
-    
-    # Volatilidade
-    df_neg['Volatilidade'] = df_neg.apply(
-        lambda x: (x['Maior_Preco'] - x['Menor_Preco']) / x['Menor_Preco'] if x['Menor_Preco'] > 0 else 0, axis=1
-    )
+    # Filtros (a tabela já vem do maior saving para o menor)
+    f1, f2, f3 = st.columns([2, 2, 1])
+    with f1:
+        termo = st.text_input("Filtrar item:", key="neg_item")
+    with f2:
+        cats = st.multiselect("Categoria:", options=sorted(df_neg['Categoria'].dropna().unique().tolist()), key="neg_cat")
+    with f3:
+        saving_min = st.number_input("Saving mínimo (R$)", min_value=0.0, value=10.0, step=100.0, key="neg_min")
+
+    df_opps = df_neg[df_neg['Saving_Potencial'] > saving_min]
+    if cats:
+        df_opps = df_opps[df_opps['Categoria'].isin(cats)]
+    if termo:
+        df_opps = df_opps[df_opps['desc_prod'].str.contains(termo, case=False, na=False, regex=False)]
 
-    df_opps = df_neg[df_neg['Saving_Potencial'] > 10].sort_values('Saving_Potencial', ascending=False)
-    
     c1, c2, c3 = st.columns(3)
     c1.metric("Potencial Economia", format_brl(df_opps['Saving_Potencial'].sum()))
     c2.metric("Oportunidades", len(df_opps))
     c3.metric("Volatilidade Média", f"{df_opps['Volatilidade'].mean()*100:.1f}%")
 
     st.subheader("🏆 Top Oportunidades")
-    
+
+    paginas = max(1, -(-len(df_opps) // POR_PAGINA))
+    pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1, key="neg_pagina")
+    inicio = (int(pagina) - 1) * POR_PAGINA
+    df_pagina = df_opps.iloc[inicio:inicio + POR_PAGINA]
+    st.caption(f"Oportunidades {inicio + 1 if len(df_opps) else 0}–{inicio + len(df_pagina)} de {len(df_opps)} · página {int(pagina)} de {paginas}")
+
     cols_show = ['desc_prod', 'Categoria', 'Qtd_Compras', 'Preco_Medio', 'Menor_Preco', 'Saving_Potencial']
-    st.dataframe(df_opps[cols_show].head(50), use_container_width=True, hide_index=True)
+    st.dataframe(df_pagina[cols_show], use_container_width=True, hide_index=True)
 
-    if not df_opps.empty:
-        st.scatter_chart(df_opps, x='Volatilidade', y='Gasto_Total', color='Categoria', size='Saving_Potencial')
+    if not df_pagina.empty:
+        st.scatter_chart(df_pagina, x='Volatilidade', y='Gasto_Total', color='Categoria', size='Saving_Potencial')
@@ -0,0 +1,178 @@
+"""
+Agregações vetorizadas do histórico de compras (colunas desc_prod, v_unit_real, qtd_real...).
+
+resumo_itens é o resumo por item da Busca: agregados do groupby (cython) + a unidade mais
+frequente de cada item por moda_por_grupo, sem lambda por grupo. scores_fornecedores e
+PerfisFornecedores calculam de uma vez, para todos os fornecedores, o que a aba Fornecedores
+mostra de um só; negociacao_itens é a tabela do cockpit de Negociação.
+"""
+import numpy as np
+import pandas as pd
+
+
+def chaves_item(df):
+    """Colunas que identificam o item no histórico (cod_prod só se existir)."""
+    return ['desc_prod', 'Categoria'] + (['cod_prod'] if 'cod_prod' in df.columns else [])
+
+
+def moda_por_grupo(grupo, valores, n_grupos):
+    """
+    Valor mais frequente de cada grupo (grupo = código 0..n_grupos-1 por linha; negativo fica
+    de fora), como Series.mode()[0]: vazios não contam e empate fica com o menor valor.
+    Grupo sem nenhum valor volta None.
+    """
+    t = pd.DataFrame({"g": np.asarray(grupo), "v": np.asarray(valores, dtype=object)})
+    t = t[(t["g"] >= 0) & t["v"].notna()]
+    cont = t.groupby(["g", "v"], sort=False).size().reset_index(name="n")
+    cont = cont.sort_values(["g", "n", "v"], ascending=[True, False, True], kind="stable").drop_duplicates("g")
+    moda = np.full(n_grupos, None, dtype=object)
+    moda[cont["g"].to_numpy()] = cont["v"].to_numpy()
+    return moda
+
+
+def _agregados_item(gb):
+    return gb.agg(
+        Preco_Medio=('v_unit_real', 'mean'),
+        Preco_Min=('v_unit_real', 'min'),
+        Preco_Max=('v_unit_real', 'max'),
+        Qtd_Total=('qtd_real', 'sum'),
+        Gasto_Total=('v_total_item', 'sum'),
+        Qtd_Compras=('n_nf', 'count'),
+    )
+
+
+def resumo_itens(df, group_cols=None):
+    """
+    Uma linha por item: Preco_Medio/Min/Max (v_unit_real), Qtd_Total, Gasto_Total,
+    Qtd_Compras (notas) e Unidade (u_medida mais frequente). Mesmas linhas e ordem do
+    groupby(group_cols).agg de antes.
+    """
+    group_cols = group_cols or chaves_item(df)
+    gb = df.groupby(group_cols, observed=True)
+    resumo = _agregados_item(gb).reset_index()
+    # ngroup numera os grupos na ordem das linhas do agg (linhas com chave vazia: NaN)
+    grupo = gb.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    resumo['Unidade'] = moda_por_grupo(grupo, df['u_medida'], len(resumo))
+    return resumo
+
+
+def scores_fornecedores(df, df_mercado, peso_preco=0.7, peso_fiscal=0.3):
+    """
+    Score (0 a 10) de todos os fornecedores numa passada, na conta de sempre:
+    - preço: 10 x média de Menor_Preco / preço médio do fornecedor, nos itens dele que têm
+      referência em df_mercado (10 se nenhum tiver);
+    - fiscal: 10 x (1 - Imposto_Total / v_total_item).
+    Uma linha por nome_emit (índice), do maior score para o menor, com a posição no ranking.
+    """
+    precos = df.groupby(['nome_emit', 'desc_prod'], observed=True)['v_unit_real'].mean().reset_index()
+    comp = precos.merge(df_mercado[['desc_prod', 'Menor_Preco']], on='desc_prod')
+    comp = comp[comp['v_unit_real'] > 0]
+    comp['ratio'] = comp['Menor_Preco'].astype(float) / comp['v_unit_real'].astype(float)
+    por_preco = comp.groupby('nome_emit', observed=True)['ratio'].agg(['mean', 'size'])
+
+    impostos = df['Imposto_Total'] if 'Imposto_Total' in df.columns else 0.0
+    scores = (df.assign(_imposto=impostos)
+              .groupby('nome_emit', observed=True)
+              .agg(Gasto_Total=('v_total_item', 'sum'), Imposto_Total=('_imposto', 'sum')))
+    gasto = scores['Gasto_Total']
+    scores['Carga_Tributaria'] = (scores['Imposto_Total'] / gasto.where(gasto > 0)).fillna(0.0)
+    scores['Itens_Comparados'] = por_preco['size'].reindex(scores.index, fill_value=0)
+    # sem item comparável: 10; comparações todas NaN ficam NaN e o score vai a 0
+    scores['Score_Preco'] = (por_preco['mean'] * 10).reindex(scores.index)
+    scores.loc[scores['Itens_Comparados'] == 0, 'Score_Preco'] = 10.0
+    scores['Score_Fiscal'] = (1 - scores['Carga_Tributaria']) * 10
+    nota = scores['Score_Preco'] * peso_preco + scores['Score_Fiscal'] * peso_fiscal
+    scores['Score'] = nota.clip(0, 10).fillna(0.0)
+    scores = scores.sort_values(['Score', 'Gasto_Total'], ascending=False)
+    scores['Ranking'] = scores['Score'].rank(ascending=False, method='min').astype(int)
+    return scores
+
+
+def negociacao_itens(df, group_cols=None):
+    """
+    Tabela do cockpit de Negociação, uma linha por item, do maior saving para o menor:
+    Gasto_Total, Qtd_Total, Preco_Medio, Menor_Preco, Maior_Preco, Qtd_Compras,
+    Saving_Potencial (gasto - menor preço x quantidade) e Volatilidade ((maior - menor) /
+    menor; 0 sem menor preço positivo).
+    """
+    group_cols = group_cols or chaves_item(df)
+    neg = (_agregados_item(df.groupby(group_cols, observed=True))
+           .rename(columns={'Preco_Min': 'Menor_Preco', 'Preco_Max': 'Maior_Preco'})
+           [['Gasto_Total', 'Qtd_Total', 'Preco_Medio', 'Menor_Preco', 'Maior_Preco', 'Qtd_Compras']]
+           .reset_index())
+    menor = neg['Menor_Preco'].to_numpy(dtype=float)
+    maior = neg['Maior_Preco'].to_numpy(dtype=float)
+    neg['Saving_Potencial'] = neg['Gasto_Total'] - neg['Menor_Preco'] * neg['Qtd_Total']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        neg['Volatilidade'] = np.where(menor > 0, (maior - menor) / menor, 0.0)
+    return neg.sort_values('Saving_Potencial', ascending=False, kind='stable', ignore_index=True)
+
+
+# Categoria de item crítico e faixas de criticidade do fornecedor (aba Fornecedores)
+PADRAO_CRITICO = 'CRÍTICO|QUÍMICO|IÇAMENTO|EPI'
+CRITICIDADES = [
+    ("🔴 ESTRATÉGICO", "Alto volume financeiro ou itens de risco crítico."),
+    ("🟡 TÁTICO", "Fornecimento relevante ou itens técnicos."),
+    ("🟢 OPERACIONAL", "Itens de baixo risco ou cauda longa (Spot)."),
+]
+
+
+def criticidade(share, tem_critico):
+    """
+    Índice em CRITICIDADES de cada fornecedor: estratégico acima de 5% do gasto (ou 1% com item
+    crítico), tático acima de 1% ou com item crítico, operacional no resto.
+    """
+    share = np.asarray(share, dtype=float)
+    tem_critico = np.asarray(tem_critico, dtype=bool)
+    return np.select([(share > 0.05) | (tem_critico & (share > 0.01)), (share > 0.01) | tem_critico], [0, 1], 2)
+
+
+class PerfisFornecedores:
+    """
+    Perfil de todos os fornecedores do histórico, montado uma vez por versão dos dados.
+
+    tabela: uma linha por nome_emit (índice), do maior gasto para o menor: Gasto_Total, Share
+    (do gasto global), Criticidade/Motivo, Ultima_Compra, Qtd_Risco (linhas com
+    Risco_Compliance), Qtd_Linhas e a faixa [Linha_Ini, Linha_Fim) das linhas dele na ordem
+    (fornecedor, compra mais recente primeiro).
+    linhas(df, nome): as linhas do fornecedor nessa ordem, sem varrer o histórico — um recorte
+    direto se o df já estiver ordenado assim (data.dataset guarda o histórico desse jeito).
+    """
+
+    def __init__(self, df):
+        ordenado = df[['nome_emit', 'data_emissao']].assign(_pos=np.arange(len(df))).sort_values(
+            ['nome_emit', 'data_emissao'], ascending=[True, False], kind='stable', na_position='last')
+        ordem = ordenado['_pos'].to_numpy()
+        self._ordem = None if np.array_equal(ordem, np.arange(len(df))) else ordem
+
+        nomes = ordenado['nome_emit']
+        validas = int(nomes.notna().sum())  # fornecedor vazio fica no fim e sem perfil
+        codigos, unicos = pd.factorize(nomes.iloc[:validas].astype(object))
+        fim = np.cumsum(np.bincount(codigos, minlength=len(unicos)))
+        tabela = pd.DataFrame({'Linha_Ini': fim - np.bincount(codigos, minlength=len(unicos)), 'Linha_Fim': fim},
+                              index=pd.Index(unicos, name='nome_emit'))
+
+        risco = df['Risco_Compliance'].fillna(False).astype(bool) if 'Risco_Compliance' in df.columns else False
+        critico = (df['Categoria'].str.contains(PADRAO_CRITICO, na=False).astype(bool)
+                   if 'Categoria' in df.columns else False)
+        agg = (df.assign(_risco=risco, _critico=critico)
+               .groupby('nome_emit', observed=True)
+               .agg(Gasto_Total=('v_total_item', 'sum'), Ultima_Compra=('data_emissao', 'max'),
+                    Qtd_Risco=('_risco', 'sum'), Tem_Critico=('_critico', 'any')))
+        agg.index = agg.index.astype(object)
+        tabela = tabela.join(agg)
+
+        gasto_global = df['v_total_item'].sum()
+        tabela['Share'] = tabela['Gasto_Total'] / gasto_global if gasto_global > 0 else 0.0
+        faixa = criticidade(tabela['Share'], tabela['Tem_Critico'])
+        tabela['Criticidade'] = np.array([c for c, _ in CRITICIDADES], dtype=object)[faixa]
+        tabela['Motivo'] = np.array([m for _, m in CRITICIDADES], dtype=object)[faixa]
+        tabela['Qtd_Linhas'] = tabela['Linha_Fim'] - tabela['Linha_Ini']
+        tabela['Qtd_Risco'] = tabela['Qtd_Risco'].astype(int)
+        self.tabela = tabela.sort_values('Gasto_Total', ascending=False, kind='stable')
+
+    def linhas(self, df, nome):
+        ini, fim = int(self.tabela.at[nome, 'Linha_Ini']), int(self.tabela.at[nome, 'Linha_Fim'])
+        if self._ordem is None:
+            return df.iloc[ini:fim]
+        return df.iloc[self._ordem[ini:fim]]
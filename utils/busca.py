@@ -0,0 +1,102 @@
+"""
+Busca textual em memória sobre o histórico de compras (ui.tab_busca).
+
+IndiceBusca indexa por trigrama o texto de cada linha (descrição + código), uma vez por texto
+distinto — a mesma descrição se repete em milhares de linhas — e devolve direto as posições
+das linhas que casam. Cada palavra da consulta precisa aparecer (E), como substring, em algum
+dos campos; sem acento e sem caixa ("conexao" acha "Conexão").
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from utils.fornecedores import remover_acentos, trigramas
+
+SEPARADOR = "\x1f"  # entre campos: uma palavra nunca casa "emendando" descrição e código
+
+
+def normalizar_busca(texto):
+    return remover_acentos(texto).upper()
+
+
+def versao_frame(df, colunas):
+    """
+    Impressão digital de um DataFrame: hash de todas as linhas das colunas, na ordem (o índice
+    devolve posições). Chave de cache para quem não tem a versão do dataset; com o histórico
+    de ui.dados.dados_da_aba, passe a versão que ela devolve e esta conta nem roda.
+    """
+    cols = [c for c in colunas if c in df.columns]
+    h = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    return len(df), tuple(cols), hashlib.blake2b(h.tobytes(), digest_size=16).hexdigest()
+
+
+class IndiceBusca:
+    """
+    Índice invertido de trigramas sobre os textos distintos de uma ou mais colunas.
+
+    buscar(consulta) -> posições (ordenadas) das linhas cujo texto contém todas as palavras.
+    Palavras com 3+ letras saem das listas de trigramas (e são conferidas no texto); as mais
+    curtas são conferidas nos textos que sobraram das outras (ou em todos, se vierem sozinhas).
+    """
+
+    def __init__(self, *colunas):
+        colunas = [pd.Series(c).reset_index(drop=True) for c in colunas if c is not None]
+        self.n = len(colunas[0]) if colunas else 0
+        chave = np.zeros(self.n, dtype=np.int64)
+        campos = []
+        for col in colunas:
+            codigos, unicos = pd.factorize(col)
+            campos.append((codigos, [normalizar_busca(u) for u in unicos] + [""]))  # -1 (vazio) -> ""
+            chave = chave * (len(unicos) + 1) + (codigos + 1)
+        # linha -> texto distinto (combinação dos campos)
+        self._codigos, combinacoes = pd.factorize(chave)
+        primeira = np.zeros(len(combinacoes), dtype=np.int64)
+        primeira[self._codigos] = np.arange(self.n)  # uma linha qualquer de cada combinação
+        self.textos = [
+            SEPARADOR.join(norm[cod[i]] for cod, norm in campos) for i in primeira
+        ]
+        listas = {}
+        for i, texto in enumerate(self.textos):
+            for g in trigramas(texto):
+                listas.setdefault(g, []).append(i)
+        self._listas = {g: np.asarray(ids, dtype=np.int64) for g, ids in listas.items()}
+
+    def _textos_com(self, palavra):
+        """Ids (em textos) que podem conter a palavra, pela interseção das listas dos trigramas dela."""
+        listas = [self._listas.get(g) for g in trigramas(palavra)]
+        if any(lista is None for lista in listas):
+            return np.array([], dtype=np.int64)
+        listas.sort(key=len)
+        ids = listas[0]
+        for lista in listas[1:]:
+            ids = np.intersect1d(ids, lista, assume_unique=True)
+            if not len(ids):
+                break
+        return ids
+
+    def textos_que_casam(self, consulta):
+        """Ids dos textos distintos com todas as palavras da consulta (None = consulta vazia)."""
+        palavras = sorted(set(normalizar_busca(consulta).split()), key=len, reverse=True)
+        if not palavras:
+            return None
+        ids = None
+        for p in palavras:
+            if len(p) >= 3:
+                cand = self._textos_com(p)
+                ids = cand if ids is None else np.intersect1d(ids, cand, assume_unique=True)
+            elif ids is None:
+                ids = np.arange(len(self.textos))
+            ids = np.array([i for i in ids if p in self.textos[i]], dtype=np.int64)
+            if not len(ids):
+                break
+        return ids
+
+    def buscar(self, consulta):
+        """Posições das linhas que casam com a consulta (todas, se a consulta for vazia)."""
+        ids = self.textos_que_casam(consulta)
+        if ids is None:
+            return np.arange(self.n)
+        casou = np.zeros(len(self.textos), dtype=bool)
+        casou[ids] = True
+        return np.flatnonzero(casou[self._codigos])
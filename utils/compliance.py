@@ -1,49 +1,186 @@
-import pandas as pd
+"""
+Regras de documentação (compliance) dos itens comprados. As regras ficam em
+data/regras_compliance.json (ver o _leia_me de lá).
+
+- motor_compliance(): motor compilado das regras, relido sozinho quando o arquivo muda.
+- MotorCompliance.avaliar(categoria, desc, ncm): flags por linha + medição por regra
+  (combinações casadas, em quantas ela venceu, linhas e tempo). Cada combinação distinta de
+  (categoria, descrição, NCM) é avaliada uma vez só e o resultado volta às linhas pelos códigos.
+- flags_compliance / validar_compliance: as flags da aba Compliance (Risco_Compliance,
+  Doc_Obrigatoria, Critico).
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
 import numpy as np
+import pandas as pd
 
-def validar_compliance(df):
+from utils.regras import RAIZ
+
+ARQUIVO_COMPLIANCE = RAIZ / "data" / "regras_compliance.json"
+
+# Categorias que a aba Compliance conta como críticas (base do índice de conformidade)
+PADRAO_CRITICO = 'CRÍTICO|QUÍMICO|EPI|IÇAMENTO'
+
+CONDICOES = ("categoria", "descricao", "ncm_prefixos")
+
+
+def _casa(padrao, valores):
+    regex = re.compile(padrao)
+    return np.array([isinstance(v, str) and regex.search(v) is not None for v in valores], dtype=bool)
+
+
+def _validar(regras):
+    ids = [r["id"] for r in regras]
+    if len(set(ids)) != len(ids):
+        raise ValueError("[compliance] ids de regra repetidos")
+    prioridades = [r["prioridade"] for r in regras]
+    if len(set(prioridades)) != len(prioridades):
+        raise ValueError("[compliance] prioridades repetidas (a ordem entre regras precisa ser explícita)")
+    for r in regras:
+        if not any(r.get(c) for c in CONDICOES):
+            raise ValueError(f"[compliance] regra {r['id']} sem condição ({', '.join(CONDICOES)})")
+        if not r.get("documento"):
+            raise ValueError(f"[compliance] regra {r['id']} sem documento")
+        for c in ("categoria", "descricao"):
+            if r.get(c):
+                re.compile(r[c])
+
+
+class MotorCompliance:
+    """
+    Regras de documentação. Uma regra casa quando todas as condições que declara casam:
+    `categoria` (regex na categoria em caixa alta), `descricao` (regex na descrição) e
+    `ncm_prefixos` (NCM sem ponto). Ganha a de menor prioridade que casar (documento exigido,
+    com risco); nenhuma casando, fica o `padrao`, sem risco.
+    """
+
+    def __init__(self, cfg, versao):
+        self.cfg = cfg
+        self.versao = versao
+        self.padrao = cfg.get("padrao", "N/A")
+        _validar(cfg["regras"])
+        self.regras = sorted(cfg["regras"], key=lambda r: r["prioridade"])
+        self.documentos = np.array([r["documento"] for r in self.regras] + [self.padrao], dtype=object)
+
+    def _casamentos(self, regra, cats, descs, ncms, tc, td, tn):
+        """Combinações (tc/td/tn = códigos de cada uma) em que a regra casa."""
+        m = np.ones(len(tc), dtype=bool)
+        if regra.get("categoria"):
+            m &= _casa(regra["categoria"], cats)[tc]
+        if regra.get("ncm_prefixos") and m.any():
+            prefixos = tuple(regra["ncm_prefixos"])
+            m &= np.array([n.startswith(prefixos) for n in ncms], dtype=bool)[tn]
+        if regra.get("descricao") and m.any():
+            # só as descrições das combinações que ainda podem casar
+            alvo = np.unique(td[m])
+            casa = np.zeros(len(descs), dtype=bool)
+            casa[alvo] = _casa(regra["descricao"], [descs[i] for i in alvo])
+            m &= casa[td]
+        return m
+
+    def avaliar(self, categoria, desc, ncm=None):
+        """
+        (flags, medicao). flags: Risco_Compliance, Doc_Obrigatoria, Regra (id da vencedora ou
+        None) e Critico por linha. medicao: uma linha por regra, na ordem de prioridade, com
+        combinações avaliadas/casadas/vencidas, linhas casadas/vencidas e tempo (ms).
+        """
+        categoria = pd.Series(categoria)
+        cod_c, cats = pd.factorize(categoria, use_na_sentinel=False)  # vazio vira "NAN", como no astype(str)
+        cod_d, descs = pd.factorize(pd.Series(desc), use_na_sentinel=False)
+        if ncm is None:
+            cod_n, ncms = np.zeros(len(categoria), dtype=np.int64), [None]
+        else:
+            cod_n, ncms = pd.factorize(pd.Series(ncm), use_na_sentinel=False)
+        cats_upper = [str(c).upper() for c in cats]
+        descs = list(descs)
+        ncms = ["" if not isinstance(v, str) else v.replace(".", "").strip() for v in ncms]
+
+        # combinação distinta (categoria, descrição, NCM) de cada linha
+        base_d, base_n = len(descs), len(ncms)
+        cod_t, combinacoes = pd.factorize((cod_c.astype(np.int64) * base_d + cod_d) * base_n + cod_n)
+        tc, td, tn = combinacoes // (base_d * base_n), (combinacoes // base_n) % base_d, combinacoes % base_n
+        linhas_por_t = np.bincount(cod_t, minlength=len(combinacoes))
+
+        vencedora = np.full(len(combinacoes), len(self.regras))  # len(regras) = nenhuma (padrão)
+        medicao = []
+        for i, regra in enumerate(self.regras):
+            t0 = time.perf_counter()
+            m = self._casamentos(regra, cats_upper, descs, ncms, tc, td, tn)
+            tempo = (time.perf_counter() - t0) * 1000
+            venceu = m & (vencedora == len(self.regras))
+            vencedora[venceu] = i
+            medicao.append({
+                "regra_id": regra["id"], "prioridade": regra["prioridade"], "documento": regra["documento"],
+                "combinacoes": len(combinacoes), "casou": int(m.sum()), "venceu": int(venceu.sum()),
+                "linhas": int(linhas_por_t[m].sum()), "linhas_vencidas": int(linhas_por_t[venceu].sum()),
+                "tempo_ms": tempo,
+            })
+
+        por_linha = vencedora[cod_t]
+        ids = np.array([r["id"] for r in self.regras] + [None], dtype=object)
+        flags = pd.DataFrame({
+            'Risco_Compliance': por_linha < len(self.regras),
+            'Doc_Obrigatoria': self.documentos[por_linha],
+            'Regra': ids[por_linha],
+            'Critico': _casa(PADRAO_CRITICO, list(cats))[cod_c],
+        }, index=categoria.index)
+        return flags, pd.DataFrame(medicao)
+
+
+# ==============================================================================
+# CARGA COM HOT RELOAD
+# ==============================================================================
+_carregados = {}  # caminho -> ((mtime_ns, tamanho), MotorCompliance)
+_trava = threading.Lock()
+
+
+def motor_compliance(caminho=ARQUIVO_COMPLIANCE):
     """
-    Define a documentação exigida baseada na Categoria do item.
+    MotorCompliance do arquivo de regras. Só relê quando o arquivo muda; se a nova versão
+    estiver inválida (ex.: JSON salvo pela metade), segue com a anterior.
     """
-    # 1. Cria colunas padrão
-    df['Risco_Compliance'] = False
-    df['Doc_Obrigatoria'] = "N/A"
-    
-    # Normaliza categoria para evitar erros de caixa alta/baixa
-    cat = df['Categoria'].astype(str).str.upper()
-
-    # ==========================================================================
-    # MATRIZ DE DOCUMENTAÇÃO (REGRA DE NEGÓCIO)
-    # ==========================================================================
-    
-    # 1. QUÍMICOS (Risco Ambiental e Saúde)
-    # Regra: Todo produto químico precisa de FISPQ atualizada.
-    mask_quim = cat.str.contains('QUÍMICO|QUIMICO')
-    df.loc[mask_quim, 'Risco_Compliance'] = True
-    df.loc[mask_quim, 'Doc_Obrigatoria'] = "FISPQ + Ficha Emergência"
-
-    # 2. IÇAMENTO (Risco de Acidente Fatal)
-    # Regra: Cabos, cintas e manilhas precisam de teste de tração.
-    mask_ica = cat.str.contains('IÇAMENTO|ICAMENTO')
-    df.loc[mask_ica, 'Risco_Compliance'] = True
-    df.loc[mask_ica, 'Doc_Obrigatoria'] = "Certificado de Teste de Carga"
-
-    # 3. ELÉTRICA (Risco de Incêndio/Choque - NR10)
-    # Regra: Itens de baixa/média tensão precisam de conformidade.
-    mask_elet = cat.str.contains('ELÉTRICA|ELETRICA')
-    df.loc[mask_elet, 'Risco_Compliance'] = True
-    df.loc[mask_elet, 'Doc_Obrigatoria'] = "Certificado Conformidade / INMETRO"
-
-    # 4. EPI (Risco de Proteção Pessoal - NR6)
-    # Regra: Precisa de CA válido.
-    mask_epi = cat.str.contains('EPI')
-    df.loc[mask_epi, 'Risco_Compliance'] = True
-    df.loc[mask_epi, 'Doc_Obrigatoria'] = "CA (Certificado de Aprovação)"
-
-    # 5. VASOS DE PRESSÃO / HIDRÁULICA CRÍTICA (Opcional - NR13)
-    # Se quiser ser rigorosa com válvulas de segurança
-    mask_nr13 = (cat.str.contains('HIDRÁULICA')) & (df['desc_prod'].str.contains('SEGURANCA|ALIVIO|CALDEIRA'))
-    df.loc[mask_nr13, 'Risco_Compliance'] = True
-    df.loc[mask_nr13, 'Doc_Obrigatoria'] = "Prontuário NR-13 / Calibração"
+    caminho = str(caminho)
+    st = os.stat(caminho)
+    assinatura = (st.st_mtime_ns, st.st_size)
+    atual = _carregados.get(caminho)
+    if atual and atual[0] == assinatura:
+        return atual[1]
+    with _trava:
+        atual = _carregados.get(caminho)
+        if atual and atual[0] == assinatura:
+            return atual[1]
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                doc = json.load(f)
+            cfg = {k: v for k, v in doc.items() if k not in ("versao", "_leia_me")}
+            # versão = a declarada + hash do conteúdo: editar sem subir a versão não serve cache velho
+            conteudo = json.dumps(cfg, sort_keys=True, ensure_ascii=False).encode("utf-8")
+            motor = MotorCompliance(cfg, f"{doc.get('versao', 0)}-{hashlib.sha1(conteudo).hexdigest()[:10]}")
+        except (ValueError, KeyError, TypeError, re.error) as e:
+            if not atual:
+                raise
+            print(f"⚠️ Regras de compliance inválidas em {caminho} ({e}); mantendo a versão anterior.")
+            motor = atual[1]
+        _carregados[caminho] = (assinatura, motor)
+        return motor
+
+
+def flags_compliance(categoria, desc, ncm=None):
+    """Risco_Compliance, Doc_Obrigatoria, Regra e Critico de cada linha, sem alterar nada."""
+    return motor_compliance().avaliar(categoria, desc, ncm)[0]
 
+
+def validar_compliance(df):
+    """
+    Define a documentação exigida baseada na Categoria do item (grava Risco_Compliance e
+    Doc_Obrigatoria no próprio df; flags_compliance devolve as mesmas colunas sem alterar nada).
+    """
+    flags = flags_compliance(df['Categoria'], df['desc_prod'], df['ncm'] if 'ncm' in df.columns else None)
+    df['Risco_Compliance'] = flags['Risco_Compliance'].to_numpy()
+    df['Doc_Obrigatoria'] = flags['Doc_Obrigatoria'].to_numpy()
     return df
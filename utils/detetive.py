@@ -0,0 +1,515 @@
+"""
+Detetive: cruza os documentos do RAW (NF do XML) com os mapas carregados (AF/CC/Plano).
+
+O match é um merge por nf_key: cada NF do XML encontra os candidatos do mapa com o mesmo
+número e o fornecedor decide entre eles. Nomes são normalizados uma vez por nome distinto e só
+o melhor candidato de cada documento é pontuado (utils.fornecedores.maior_similaridade).
+
+Cada mapa vira um MapaTexto (str() de cada célula + quais eram vazias), que é tudo o que o
+match lê. CacheDetetive guarda em disco o MapaTexto de cada arquivo (pelo hash do conteúdo) e
+os pares (documento, linha do mapa, score) de cada mapa por ano/versão do RAW: repetir o
+Detetive com os mesmos mapas não relê nem recasa nada, e um mapa novo só casa as linhas dele.
+
+carregar_mapa lê do arquivo só as colunas que os SINONIMOS_MAPA resolvem, como texto; CSV com
+separador/encoding detectados numa amostra, no engine C e em blocos (um concat no fim).
+"""
+import codecs
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.fornecedores import maior_similaridade, normalizar_nome
+
+RAIZ = Path(__file__).resolve().parent.parent
+CACHE_DB = RAIZ / "data" / "cache" / "detetive.sqlite"
+
+NAO_MAPEADO = "Não Mapeado"
+
+# Colunas do mapa, na ordem de procura; vale a 1ª coluna que contém algum sinônimo
+SINONIMOS_MAPA = {
+    "NF": ["NF", "NOTA", "N_NF", "NUMERO"],
+    "FORNECEDOR": ["FORNECEDOR", "NOME", "EMPRESA"],
+    "AF": ["AF/AS", "AF", "AS", "PEDIDO", "OC"],
+    "PLANO": ["PLANO DE CONTAS", "PLANO", "CONTA"],
+    "CC": ["CC", "CENTRO", "CUSTO", "DEPARTAMENTO"],
+}
+
+# Status do match pelo score do fornecedor
+SCORE_CONFIRMADO = 60
+SCORE_APROXIMADO = 30
+
+# Sobe quando a regra de candidatos/score mudar: invalida os pares guardados
+VERSAO_PARES = 3
+# Sobe quando a leitura do arquivo (carregar_mapa) mudar: invalida os mapas guardados
+VERSAO_MAPA = 2
+
+SEPARADORES_CSV = ";,\t|"
+AMOSTRA_CSV = 64 * 1024
+LINHAS_POR_BLOCO = 100_000
+
+
+def _nf_de_texto(s):
+    s = s.strip()
+    if s.endswith(".0"):
+        s = s[:-2]
+    return re.sub(r"\D", "", s).lstrip("0")
+
+
+def limpar_nf_excel(valor):
+    if pd.isna(valor) or valor == "":
+        return ""
+    return _nf_de_texto(str(valor))
+
+
+def por_valor_distinto(valores, fn):
+    """
+    fn aplicada uma vez por valor distinto, devolvida linha a linha. O tipo entra na chave:
+    o factorize junta None com NaN e 1 com 1.0, mas str() dá resultados diferentes para eles.
+    """
+    valores = np.asarray(valores, dtype=object)
+    saida = np.empty(len(valores), dtype=object)
+    cod_tipo, tipos = pd.factorize(np.fromiter(map(type, valores), dtype=object, count=len(valores)))
+    for t in range(len(tipos)):
+        pos = np.flatnonzero(cod_tipo == t)
+        codigos, unicos = pd.factorize(valores[pos])
+        nulos = codigos == -1  # None/NaN/NaT: fn do valor original, um por tipo
+        res = [fn(v) for v in unicos] + ([fn(valores[pos[nulos.argmax()]])] if nulos.any() else [None])
+        saida[pos] = np.array(res, dtype=object)[codigos]
+    return saida
+
+
+def detectar_colunas_mapa(colunas):
+    """{"NF": col | None, "FORNECEDOR": ..., "AF": ..., "CC": ..., "PLANO": ...} pelos sinônimos."""
+    mapa_cols = {"NF": None, "FORNECEDOR": None, "AF": None, "CC": None, "PLANO": None}
+    for chave, lista in SINONIMOS_MAPA.items():
+        for col_real in colunas:
+            if any(nome == col_real or nome in col_real for nome in lista):
+                if chave == "CC" and "PLANO" in col_real:
+                    continue
+                mapa_cols[chave] = col_real
+                break
+    return mapa_cols
+
+
+def coluna_do_mapa(coluna):
+    """A coluna pode ser resolvida por algum sinônimo (as demais o Detetive nunca lê)."""
+    c = str(coluna).upper().strip()
+    return any(nome in c for lista in SINONIMOS_MAPA.values() for nome in lista)
+
+
+def detectar_csv(amostra: bytes):
+    """(encoding, separador) pelo começo do arquivo: utf-8-sig se decodifica, senão latin1."""
+    try:
+        texto = codecs.getincrementaldecoder("utf-8-sig")().decode(amostra, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        texto, encoding = amostra.decode("latin1"), "latin1"
+    linhas = texto.splitlines()
+    if len(amostra) >= AMOSTRA_CSV and len(linhas) > 1:
+        linhas = linhas[:-1]  # última linha da amostra pode estar cortada
+    try:
+        sep = csv.Sniffer().sniff("\n".join(linhas[:50]), delimiters=SEPARADORES_CSV).delimiter
+    except csv.Error:
+        sep = ";"
+    return encoding, sep
+
+
+def _ler_csv(arquivo, encoding, sep):
+    blocos = pd.read_csv(
+        arquivo, sep=sep, encoding=encoding, engine="c", dtype=str,
+        usecols=coluna_do_mapa, chunksize=LINHAS_POR_BLOCO,
+    )
+    with blocos:
+        return pd.concat(list(blocos), ignore_index=True)
+
+
+def carregar_mapa(arquivo):
+    """
+    Mapa AF/CC enviado (CSV ou Excel) -> DataFrame com as colunas que os sinônimos resolvem,
+    todas como texto (o MapaTexto só faz str() das células). None se não abrir.
+    """
+    try:
+        if arquivo.name.lower().endswith(".csv"):
+            encoding, sep = detectar_csv(arquivo.read(AMOSTRA_CSV))
+            arquivo.seek(0)
+            try:
+                return _ler_csv(arquivo, encoding, sep)
+            except UnicodeDecodeError:  # utf-8 na amostra, mas não no resto do arquivo
+                arquivo.seek(0)
+                return _ler_csv(arquivo, "latin1", sep)
+        return pd.read_excel(arquivo, usecols=coluna_do_mapa, dtype=str)
+    except Exception:
+        return None
+
+
+class MapaTexto:
+    """
+    Um mapa como o Detetive o lê: colunas em caixa alta, str() de cada célula e quais células
+    eram vazias (NaN/None). Coluna que o mapa não tem vale "nan" vazio em todas as linhas,
+    como ficava no pd.concat dos mapas.
+    """
+
+    def __init__(self, n, colunas, textos, nulos):
+        self.n = n
+        self.colunas = colunas
+        self.textos = textos  # coluna -> array object de str
+        self.nulos = nulos    # coluna -> array bool
+
+    @classmethod
+    def de_dataframe(cls, df):
+        colunas, textos, nulos = [], {}, {}
+        for j, c in enumerate(str(c).upper().strip() for c in df.columns):
+            if c in textos:
+                continue
+            v = df.iloc[:, j].to_numpy(dtype=object)
+            colunas.append(c)
+            textos[c] = por_valor_distinto(v, str)
+            nulos[c] = np.asarray(pd.isna(v), dtype=bool)
+        return cls(len(df), colunas, textos, nulos)
+
+    def texto(self, col):
+        if col in self.textos:
+            return self.textos[col]
+        return np.full(self.n, "nan", dtype=object)
+
+    def nf_keys(self, col):
+        if col not in self.textos:
+            return np.full(self.n, "", dtype=object)
+        nf = por_valor_distinto(self.textos[col], _nf_de_texto)
+        nf[self.nulos[col]] = ""
+        return nf
+
+    def para_blob(self):
+        dados = {
+            "n": self.n,
+            "colunas": self.colunas,
+            "textos": {c: self.textos[c].tolist() for c in self.colunas},
+            "nulos": {c: np.flatnonzero(self.nulos[c]).tolist() for c in self.colunas},
+        }
+        return zlib.compress(json.dumps(dados, ensure_ascii=False).encode("utf-8"))
+
+    @classmethod
+    def de_blob(cls, blob):
+        dados = json.loads(zlib.decompress(blob).decode("utf-8"))
+        n = dados["n"]
+        textos = {c: np.array(v, dtype=object) for c, v in dados["textos"].items()}
+        nulos = {}
+        for c, pos in dados["nulos"].items():
+            nulos[c] = np.zeros(n, dtype=bool)
+            nulos[c][pos] = True
+        return cls(n, dados["colunas"], textos, nulos)
+
+
+def textos_docs(df_docs_raw):
+    """NF e fornecedor dos documentos, com as mesmas conversões do str(valor or "") de antes."""
+    n_docs = len(df_docs_raw)
+    col_nf = df_docs_raw["n_nf_clean"] if "n_nf_clean" in df_docs_raw.columns else pd.Series([None] * n_docs)
+    col_forn = df_docs_raw["nome_emit"] if "nome_emit" in df_docs_raw.columns else pd.Series([None] * n_docs)
+    nf_xml = por_valor_distinto(col_nf.to_numpy(dtype=object), lambda v: str(v or ""))
+    forn_xml = por_valor_distinto(col_forn.to_numpy(dtype=object), lambda v: str(v or ""))
+    return nf_xml, forn_xml
+
+
+def pares_mapa(nf_xml, forn_xml, mapa, col_nf, col_forn):
+    """
+    (pos_doc, pos_mapa, score) de cada documento com cada linha do mapa de mesma NF. O score
+    (exato) só vem no par de maior score do documento neste mapa, e nos empatados com ele; os
+    demais valem 0.
+    """
+    cand = pd.DataFrame({"nf": mapa.nf_keys(col_nf), "pos_mapa": np.arange(mapa.n)})
+    cand = cand[cand["nf"] != ""]
+    docs = pd.DataFrame({"nf": nf_xml, "pos_doc": np.arange(len(nf_xml))})
+    pares = docs.merge(cand, on="nf", how="inner")
+
+    if col_forn:
+        limpo_xml = por_valor_distinto(forn_xml[pares["pos_doc"].to_numpy()], normalizar_nome)
+        limpo_mapa = por_valor_distinto(mapa.texto(col_forn)[pares["pos_mapa"].to_numpy()], normalizar_nome)
+        # só o melhor candidato de cada documento precisa de score: é ele que decide status e
+        # aparece no Score. maior_similaridade uma vez por (nome, candidatos) distinto; os demais
+        # pares ficam com 0
+        pos_doc = pares["pos_doc"].to_numpy()
+        ordem = np.argsort(pos_doc, kind="stable")
+        inicios = np.flatnonzero(np.diff(pos_doc[ordem])) + 1
+        score = np.zeros(len(pares))
+        feitos = {}
+        for idx in np.split(ordem, inicios) if len(ordem) else []:
+            nomes = limpo_mapa[idx]
+            chave = (limpo_xml[idx[0]], frozenset(nomes))
+            if chave not in feitos:
+                feitos[chave] = maior_similaridade(*chave)
+            melhor, empatados = feitos[chave]
+            if empatados:
+                score[idx[[n in empatados for n in nomes]]] = melhor
+        pares["score"] = score
+    else:
+        pares["score"] = 50.0
+    return pares[["pos_doc", "pos_mapa", "score"]].astype({"pos_doc": np.int64, "pos_mapa": np.int64, "score": float})
+
+
+def enriquecer_mapas(df_docs_raw, mapas, calcular_pares=None):
+    """
+    Detetive sobre vários mapas (MapaTexto, na ordem do upload), como se fossem um só
+    concatenado. calcular_pares(i, col_nf, col_forn, calcular) devolve os pares do i-ésimo
+    mapa; o padrão é calcular() direto (o CacheDetetive troca por pares guardados).
+
+    Para cada documento: entre os candidatos com a mesma NF ganha o de maior score
+    (empate: o primeiro do mapa; score 0 não conta). Status:
+    - ✅ Confirmado: score > SCORE_CONFIRMADO (60)
+    - ⚠️ Aproximado: candidato único e score > SCORE_APROXIMADO (30)
+    - ⚠️ Só NF: candidato único e mapa sem fornecedor (na prática o score fixo de 50
+      desse caso já cai em Aproximado)
+    """
+    if df_docs_raw.empty or not mapas:
+        return pd.DataFrame(), 0
+
+    mapa_cols = detectar_colunas_mapa(list(dict.fromkeys(c for m in mapas for c in m.colunas)))
+    if not mapa_cols["NF"]:
+        return pd.DataFrame(), 0
+    col_nf, col_forn = mapa_cols["NF"], mapa_cols["FORNECEDOR"]
+
+    nf_xml, forn_xml = textos_docs(df_docs_raw)
+    n_docs = len(nf_xml)
+    if calcular_pares is None:
+        def calcular_pares(i, col_nf, col_forn, calcular):
+            return calcular()
+
+    # ---- pares de cada mapa, com pos_mapa na numeração dos mapas concatenados
+    inicio = np.cumsum([0] + [m.n for m in mapas])
+    pares = pd.concat([
+        calcular_pares(i, col_nf, col_forn, lambda m=m: pares_mapa(nf_xml, forn_xml, m, col_nf, col_forn))
+        .assign(pos_mapa=lambda p, off=inicio[i]: p["pos_mapa"] + off)
+        for i, m in enumerate(mapas)
+    ], ignore_index=True)
+
+    # candidatos por NF, somando todos os mapas
+    cod_nf, _ = pd.factorize(np.concatenate([m.nf_keys(col_nf) for m in mapas]))
+    pares["n_cand"] = np.bincount(cod_nf)[cod_nf][pares["pos_mapa"].to_numpy()]
+
+    # melhor candidato por documento: maior score, empate fica com o primeiro do mapa
+    melhor = (
+        pares[pares["score"] > 0]
+        .sort_values(["pos_doc", "score", "pos_mapa"], ascending=[True, False, True], kind="stable")
+        .drop_duplicates("pos_doc")
+        .set_index("pos_doc")
+    )
+    melhor = melhor.reindex(np.arange(n_docs))
+    tem = melhor["pos_mapa"].notna().to_numpy()
+    score = melhor["score"].fillna(0).to_numpy(dtype=float)
+    unico = (melhor["n_cand"] == 1).to_numpy()
+
+    status = np.select(
+        [tem & (score > SCORE_CONFIRMADO), tem & unico & (score > SCORE_APROXIMADO), tem & unico & (not col_forn)],
+        ["✅ Confirmado", "⚠️ Aproximado", "⚠️ Só NF"],
+        default="Não Encontrado",
+    ).astype(object)
+    aceitar = status != "Não Encontrado"
+    pos_aceito = melhor["pos_mapa"].to_numpy()[aceitar].astype(np.int64)
+
+    def valores_mapa(chave):
+        vals = np.full(n_docs, NAO_MAPEADO, dtype=object)
+        if mapa_cols[chave]:
+            col = np.concatenate([m.texto(mapa_cols[chave]) for m in mapas])
+            vals[aceitar] = col[pos_aceito]
+        return vals
+
+    df_out = pd.DataFrame({
+        "NF": nf_xml,
+        "Fornecedor_XML": forn_xml,
+        "Valor_Doc": df_docs_raw["valor_total"].to_numpy() if "valor_total" in df_docs_raw.columns else 0.0,
+        "Status": status,
+        "AF_MAPA": valores_mapa("AF"),
+        "CC_MAPA": valores_mapa("CC"),
+        "PLANO_MAPA": valores_mapa("PLANO"),
+        "Score": score,
+    })
+    return df_out, int(aceitar.sum())
+
+
+def enriquecer_detetive(df_docs_raw: pd.DataFrame, df_mapa: pd.DataFrame):
+    """
+    Gera uma tabela de match por NF (e, se houver, fornecedor).
+    Não altera o banco. É um “painel de inteligência”, como antes.
+    """
+    if df_docs_raw.empty or df_mapa.empty:
+        return pd.DataFrame(), 0
+    return enriquecer_mapas(df_docs_raw, [MapaTexto.de_dataframe(df_mapa)])
+
+
+# ==============================================================================
+# CACHE PERSISTENTE DO DETETIVE
+# ==============================================================================
+SQL_CACHE_MAPAS = """
+CREATE TABLE IF NOT EXISTS detetive_mapas (
+    mapa_hash TEXT PRIMARY KEY,
+    arquivo TEXT,
+    dados BLOB,
+    usado_em TEXT
+)
+"""
+
+# Pares de um mapa contra os documentos de um ano numa versão do RAW; pos_doc é a posição
+# no raw_get_docs_nf_for_detetive daquela versão (n_docs confere)
+SQL_CACHE_PARES = """
+CREATE TABLE IF NOT EXISTS detetive_pares (
+    mapa_hash TEXT, ano INTEGER, versao_raw TEXT, col_nf TEXT, col_forn TEXT, versao INTEGER,
+    n_docs INTEGER, pos_doc BLOB, pos_mapa BLOB, score BLOB,
+    PRIMARY KEY (mapa_hash, ano, versao_raw, col_nf, col_forn, versao)
+) WITHOUT ROWID
+"""
+
+
+def hash_conteudo(conteudo: bytes) -> str:
+    h = hashlib.sha256(b"mapa-v%d:" % VERSAO_MAPA)
+    h.update(conteudo)
+    return h.hexdigest()
+
+
+class CacheDetetive:
+    """
+    Mapas lidos e pares casados do Detetive, num SQLite próprio (o app só lê os DBs curated/raw),
+    com uma cópia em memória dos últimos usados. Pares de versões antigas do RAW saem quando o
+    mesmo mapa é casado na versão nova; mapas além de `max_mapas` (os usados há mais tempo)
+    saem com os pares deles.
+    """
+
+    def __init__(self, db_path=CACHE_DB, max_mapas=200, max_memoria=32):
+        self.db_path = str(db_path)
+        self.max_mapas = max_mapas
+        self.max_memoria = max_memoria
+        self._mapas = OrderedDict()  # mapa_hash -> MapaTexto
+        self._pares = OrderedDict()  # chave -> DataFrame pos_doc, pos_mapa, score
+        self._trava = threading.Lock()
+
+    def _conectar(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        con = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute(SQL_CACHE_MAPAS)
+        con.execute(SQL_CACHE_PARES)
+        return con
+
+    def _lembrar(self, memoria, chave, valor):
+        with self._trava:
+            memoria[chave] = valor
+            memoria.move_to_end(chave)
+            while len(memoria) > self.max_memoria:
+                memoria.popitem(last=False)
+
+    def mapa(self, conteudo: bytes, ler, arquivo=""):
+        """
+        (mapa_hash, MapaTexto) do arquivo; ler() -> DataFrame só roda se esse conteúdo nunca
+        foi visto. MapaTexto é None se o arquivo não abrir ou estiver vazio.
+        """
+        h = hash_conteudo(conteudo)
+        m = self._mapas.get(h)
+        if m is not None:
+            return h, m
+        try:
+            con = self._conectar()
+            try:
+                r = con.execute("SELECT dados FROM detetive_mapas WHERE mapa_hash = ?", [h]).fetchone()
+                if r:
+                    with con:
+                        con.execute("UPDATE detetive_mapas SET usado_em = ? WHERE mapa_hash = ?",
+                                    [datetime.now().isoformat(timespec="seconds"), h])
+                    m = MapaTexto.de_blob(r[0])
+            finally:
+                con.close()
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Cache do Detetive indisponível ({e}); lendo o mapa de novo.")
+        if m is None:
+            df = ler()
+            if df is None or df.empty:
+                return h, None
+            m = MapaTexto.de_dataframe(df)
+            self._gravar_mapa(h, arquivo, m)
+        self._lembrar(self._mapas, h, m)
+        return h, m
+
+    def _gravar_mapa(self, h, arquivo, m):
+        try:
+            con = self._conectar()
+            try:
+                with con:
+                    con.execute(
+                        "INSERT OR REPLACE INTO detetive_mapas VALUES (?, ?, ?, ?)",
+                        [h, arquivo, m.para_blob(), datetime.now().isoformat(timespec="seconds")]
+                    )
+                    velhos = [[r[0]] for r in con.execute(
+                        "SELECT mapa_hash FROM detetive_mapas ORDER BY usado_em DESC LIMIT -1 OFFSET ?",
+                        [self.max_mapas]
+                    )]
+                    con.executemany("DELETE FROM detetive_mapas WHERE mapa_hash = ?", velhos)
+                    con.executemany("DELETE FROM detetive_pares WHERE mapa_hash = ?", velhos)
+            finally:
+                con.close()
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Não gravei o mapa no cache do Detetive ({e}).")
+
+    def pares(self, mapa_hash, ano, versao_raw, col_nf, col_forn, n_docs, calcular):
+        """Pares do mapa p/ (ano, versão do RAW, colunas NF/fornecedor); calcular() se não houver."""
+        chave = (mapa_hash, int(ano), versao_raw, col_nf, col_forn or "", VERSAO_PARES)
+        p = self._pares.get(chave)
+        if p is not None and p.attrs.get("n_docs") == n_docs:
+            return p
+        r = None
+        try:
+            con = self._conectar()
+            try:
+                r = con.execute(
+                    "SELECT n_docs, pos_doc, pos_mapa, score FROM detetive_pares WHERE mapa_hash = ? AND ano = ? "
+                    "AND versao_raw = ? AND col_nf = ? AND col_forn = ? AND versao = ?", chave
+                ).fetchone()
+            finally:
+                con.close()
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Cache do Detetive indisponível ({e}); casando de novo.")
+        if r and r[0] == n_docs:
+            p = pd.DataFrame({
+                "pos_doc": np.frombuffer(r[1], dtype=np.int64),
+                "pos_mapa": np.frombuffer(r[2], dtype=np.int64),
+                "score": np.frombuffer(r[3], dtype=float),
+            })
+        else:
+            p = calcular()
+            self._gravar_pares(chave, n_docs, p)
+        p.attrs["n_docs"] = n_docs
+        self._lembrar(self._pares, chave, p)
+        return p
+
+    def _gravar_pares(self, chave, n_docs, p):
+        try:
+            con = self._conectar()
+            try:
+                with con:
+                    # versões antigas do RAW p/ o mesmo mapa e ano não servem mais
+                    con.execute("DELETE FROM detetive_pares WHERE mapa_hash = ? AND ano = ? AND versao_raw <> ?", chave[:3])
+                    con.execute(
+                        "INSERT OR REPLACE INTO detetive_pares VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [*chave, n_docs, p["pos_doc"].to_numpy(np.int64).tobytes(),
+                         p["pos_mapa"].to_numpy(np.int64).tobytes(), p["score"].to_numpy(float).tobytes()]
+                    )
+            finally:
+                con.close()
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Não gravei os pares no cache do Detetive ({e}).")
+
+    def enriquecer(self, df_docs_raw, mapas, ano, versao_raw):
+        """enriquecer_mapas() com os pares de cada mapa (mapas = [(mapa_hash, MapaTexto)]) vindos do cache."""
+        hashes = [h for h, _ in mapas]
+
+        def calcular_pares(i, col_nf, col_forn, calcular):
+            return self.pares(hashes[i], ano, versao_raw, col_nf, col_forn, len(df_docs_raw), calcular)
+
+        return enriquecer_mapas(df_docs_raw, [m for _, m in mapas], calcular_pares)
@@ -1,11 +1,23 @@
+import numpy as np
 import pandas as pd
 
+# 1,234.56 -> 1.234,56 numa passada (era replace(',', 'X').replace('.', ',').replace('X', '.'))
+_SEPARADORES_BR = str.maketrans(",.", ".,")
+
+
+def _brl(x):
+    return f"R$ {x:,.2f}".translate(_SEPARADORES_BR)
+
+
+def _perc(x):
+    return f"{x * 100:.1f}".replace(".", ",") + "%"
+
+
 def format_brl(v):
     """Converte float para string R$ 1.000,00"""
     if pd.isna(v): return "R$ 0,00"
     try:
-        val = f"{float(v):,.2f}"
-        return f"R$ {val.replace(',', 'X').replace('.', ',').replace('X', '.')}"
+        return _brl(float(v))
     except:
         return str(v)
 
@@ -13,7 +25,32 @@ def format_perc(v):
     """Converte 0.35 para 35,0%"""
     if pd.isna(v): return "0,0%"
     try:
-        val = f"{float(v)*100:.1f}"
-        return f"{val.replace('.', ',')}%"
+        return _perc(float(v))
     except:
         return str(v)
+
+
+def _formatar_series(valores, fmt, vazio):
+    """fmt uma vez por valor numérico distinto; vazio p/ NaN/None; texto não numérico fica str(v)."""
+    s = pd.Series(valores)
+    num = pd.to_numeric(s, errors="coerce")
+    x = num.to_numpy(dtype=float, na_value=np.nan)
+    nulos = np.isnan(x)
+    # distintos pelos bits do float: para o factorize -0.0 == 0.0, mas o format_brl escreve "-0,00"
+    codigos, unicos = pd.factorize(np.where(nulos, 0.0, x).view(np.int64))
+    codigos[nulos] = -1
+    texto = np.array([fmt(x) for x in unicos.view(np.float64).tolist()] + [vazio], dtype=object)[codigos]
+    invalidos = (num.isna() & s.notna()).to_numpy()
+    if invalidos.any():
+        texto[invalidos] = s[invalidos].astype(str).to_numpy()
+    return pd.Series(texto, index=s.index)
+
+
+def format_brl_series(valores):
+    """format_brl de uma coluna inteira (mesmo texto), sem apply por linha."""
+    return _formatar_series(valores, _brl, "R$ 0,00")
+
+
+def format_perc_series(valores):
+    """format_perc de uma coluna inteira (mesmo texto), sem apply por linha."""
+    return _formatar_series(valores, _perc, "0,0%")
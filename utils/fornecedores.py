@@ -0,0 +1,228 @@
+"""
+Casamento de nomes de fornecedor (XML x mapas do Detetive, nome_emit x cadastro do ERP).
+
+- normalizar_nome: o limpar_texto_match de sempre (sem acento, caixa alta, sem sufixos
+  societários, só A-Z0-9), memorizado por string crua — o mesmo nome_emit se repete em
+  milhares de notas.
+- similaridade: escala do Detetive (100 iguais, 95 um contido no outro, senão
+  SequenceMatcher.ratio * 100). Com piso, o par é descartado por limites do ratio antes
+  dele: tamanhos e letras em comum (real_quick_ratio/quick_ratio) e a maior subsequência
+  comum (os blocos do ratio são uma subsequência comum, então 2*LCS/T >= ratio), calculada
+  bit a bit em len(a) operações de inteiro.
+  O ratio fica exato (é a escala dos status do Detetive) e custa O(len(a) * len(b)) por
+  bloco casado. Um dos lados é sempre um nome_emit, que o leiaute da NF-e limita a 60
+  caracteres (xNome), e com piso o limite dos tamanhos já descarta o outro lado quando ele
+  passa de 60 * (200 / piso - 1): o custo por par fica limitado, e sem piso cresce só
+  linearmente com o nome do mapa/cadastro.
+- maior_similaridade: o maior score de um nome contra vários, indo dos candidatos de maior
+  limite aos de menor (o Detetive: o melhor candidato de mesma NF de cada documento).
+- IndiceFornecedores: nomes (ex.: os nome_emit distintos do base_compras) indexados por
+  trigrama; melhor(nome) só compara com os que dividem trigramas com o procurado.
+  processing.conciliar_fornecedores usa para casar um cadastro do ERP com os nome_emit.
+"""
+import re
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+from math import ceil
+
+import numpy as np
+import pandas as pd
+
+SUFIXOS = [" LTDA", " S.A", " SA", " EIRELI", " ME", " EPP", " COMERCIO", " SERVICOS"]
+_NAO_ALFANUM = re.compile(r"[^A-Z0-9]")
+
+
+def remover_acentos(texto):
+    if not isinstance(texto, str):
+        return str(texto)
+    nfkd = unicodedata.normalize("NFKD", texto)
+    return "".join([c for c in nfkd if not unicodedata.combining(c)])
+
+
+@lru_cache(maxsize=100_000)
+def _normalizar(texto: str) -> str:
+    texto = remover_acentos(texto).upper().strip()
+    for s in SUFIXOS:  # replace em sequência, como sempre foi (a ordem importa)
+        texto = texto.replace(s, "")
+    return _NAO_ALFANUM.sub("", texto)
+
+
+def normalizar_nome(texto):
+    if not isinstance(texto, str):
+        return str(texto)
+    return _normalizar(texto)
+
+
+@lru_cache(maxsize=100_000)
+def _contagem(nome: str) -> Counter:
+    return Counter(nome)
+
+
+def _limite_superior(a, b):
+    """quick_ratio do SequenceMatcher (letras em comum, sem ordem) * 100, sem montar o matcher."""
+    ca, cb = _contagem(a), _contagem(b)
+    if len(ca) > len(cb):
+        ca, cb = cb, ca
+    comuns = sum(min(n, cb[c]) for c, n in ca.items() if c in cb)
+    return 2.0 * comuns / (len(a) + len(b)) * 100
+
+
+@lru_cache(maxsize=100_000)
+def _mascaras(nome: str) -> dict:
+    """Letra -> bits das posições dela no nome (para o LCS bit a bit)."""
+    pm = {}
+    for i, c in enumerate(nome):
+        pm[c] = pm.get(c, 0) | (1 << i)
+    return pm
+
+
+def _lcs(a, b):
+    """Tamanho da maior subsequência comum (Hyyrö): uma passada por a, com inteiros de len(b) bits."""
+    pm, cheio = _mascaras(b), (1 << len(b)) - 1
+    v = cheio
+    for c in a:
+        u = v & pm.get(c, 0)
+        v = ((v + u) | (v - u)) & cheio
+    return len(b) - bin(v).count("1")
+
+
+def similaridade(a, b, piso=0.0):
+    """
+    Score 0-100 entre nomes já normalizados. Scores <= piso voltam como 0.0; com piso > 0 a
+    maioria dos pares ruins sai nos limites baratos, sem chegar ao ratio.
+    """
+    if a == b:
+        return 100
+    if b in a or a in b:
+        return 95 if 95 > piso else 0.0
+    # real_quick_ratio (só tamanhos), quick_ratio e LCS limitam o ratio por cima, na mesma conta
+    # dele; do mais barato para o mais justo
+    if piso > 0 and (2.0 * min(len(a), len(b)) / (len(a) + len(b)) * 100 <= piso
+                     or _limite_superior(a, b) <= piso
+                     or 2.0 * _lcs(a, b) / (len(a) + len(b)) * 100 <= piso):
+        return 0.0
+    score = SequenceMatcher(None, a, b).ratio() * 100
+    return score if score > piso else 0.0
+
+
+def maior_similaridade(a, nomes, piso=0.0):
+    """
+    (score, nomes empatados nele) do nome mais parecido com `a` entre os nomes (já
+    normalizados), ou (piso, []) se nenhum passar do piso. Os nomes vão do maior limite (2*LCS/T,
+    ou o 100/95 exato) ao menor e param quando o limite não alcança o melhor até aqui: na
+    maioria das vezes um só chega ao ratio.
+    """
+    limites = []
+    for b in set(nomes):
+        if a == b or b in a or a in b:
+            limites.append((similaridade(a, b), b))
+        else:
+            limites.append((2.0 * _lcs(a, b) / (len(a) + len(b)) * 100, b))
+    melhor, empatados = piso, []
+    for limite, b in sorted(limites, reverse=True):
+        if limite < melhor or limite <= piso:
+            break
+        score = similaridade(a, b, melhor - 1e-9 if empatados else piso)
+        if score > melhor:
+            melhor, empatados = score, [b]
+        elif score and score == melhor:
+            empatados.append(b)
+    return melhor, empatados
+
+
+def calcular_similaridade(nome_xml, nome_excel, piso=0.0):
+    return similaridade(normalizar_nome(nome_xml), normalizar_nome(nome_excel), piso)
+
+
+def trigramas(nome):
+    """Trigramas distintos do nome normalizado (nome curto vale como um trigrama só)."""
+    if len(nome) < 3:
+        return {nome} if nome else set()
+    return {nome[i:i + 3] for i in range(len(nome) - 2)}
+
+
+class IndiceFornecedores:
+    """
+    Nomes de fornecedor indexados por trigrama do nome normalizado.
+
+    melhor(nome) devolve (posição em `nomes`, score) do nome mais parecido acima do piso, ou
+    (None, 0.0). Empate de score fica com a menor posição. As faixas 100 (igual) e 95 (contido)
+    são exatas; na faixa do ratio o blocking descarta candidatos que dividem menos de
+    `min_comuns` (fração) dos trigramas do nome procurado: nomes sem trigramas em comum ainda
+    podem ter ratio alto (letras soltas casam), então o índice troca um pouco de recall por
+    não comparar com a lista inteira.
+    scripts/bench_fornecedores.py mede esse recall contra a comparação exaustiva.
+    """
+
+    def __init__(self, nomes, min_comuns=0.3):
+        self.nomes = list(nomes)
+        self.min_comuns = min_comuns
+        # nome normalizado distinto -> 1ª posição em nomes
+        self._posicao = {}
+        for pos, n in enumerate(map(normalizar_nome, self.nomes)):
+            self._posicao.setdefault(n, pos)
+        self._distintos = list(self._posicao)
+        self._pos_distinto = np.fromiter(self._posicao.values(), dtype=np.int64, count=len(self._posicao))
+        listas = {}
+        for i, n in enumerate(self._distintos):
+            for g in trigramas(n):
+                listas.setdefault(g, []).append(i)
+        self._listas = {g: np.asarray(ids, dtype=np.int64) for g, ids in listas.items()}
+
+    def candidatos(self, nome_norm):
+        """Índices (em _distintos) que dividem trigramas com o nome, dos que dividem mais aos que dividem menos."""
+        grams = [g for g in trigramas(nome_norm) if g in self._listas]
+        if not grams:
+            return np.array([], dtype=np.int64)
+        ids, comuns = np.unique(np.concatenate([self._listas[g] for g in grams]), return_counts=True)
+        minimo = max(1, ceil(self.min_comuns * len(trigramas(nome_norm))))
+        ids, comuns = ids[comuns >= minimo], comuns[comuns >= minimo]
+        ordem = np.lexsort((self._pos_distinto[ids], -comuns))
+        return ids[ordem]
+
+    def _contidos(self, a):
+        """Menor posição de um nome contido em `a` (ou que contém `a`, se `a` é curto)."""
+        if len(a) < 3:  # sem trigrama p/ bloquear: varre a lista
+            achados = [self._posicao[b] for b in self._distintos if a in b or b in a]
+        else:
+            achados = [self._posicao[a[i:j]] for i in range(len(a)) for j in range(i + 1, len(a) + 1)
+                       if a[i:j] in self._posicao]
+        return min(achados) if achados else None
+
+    def melhor(self, nome, piso=60.0):
+        a = normalizar_nome(nome)
+        if not a:  # nome vazio "está contido" em todos; aqui isso não é match
+            return None, 0.0
+        if a in self._posicao:
+            return self._posicao[a], 100
+        # faixa do 95 exata: nomes contidos no procurado não dividem trigramas suficientes com
+        # ele (os que o contêm dividem todos e saem nos candidatos)
+        melhor_pos = self._contidos(a) if 95 > piso else None
+        melhor_score = 95 if melhor_pos is not None else 0.0
+        for i in self.candidatos(a):
+            pos = int(self._pos_distinto[i])
+            if melhor_pos is None:
+                limite = piso
+            else:  # o melhor até aqui vira o piso; empate só troca se a posição for menor
+                limite = melhor_score - 1e-9 if pos < melhor_pos else melhor_score
+            score = similaridade(a, self._distintos[i], limite)
+            if score:
+                melhor_pos, melhor_score = pos, score
+        return melhor_pos, melhor_score
+
+    def casar(self, nomes, piso=60.0):
+        """melhor() uma vez por nome distinto: DataFrame nome, posicao, nome_indice, score."""
+        nomes = pd.Series(nomes, dtype=object)
+        codigos, unicos = pd.factorize(nomes, use_na_sentinel=False)
+        achados = [self.melhor(n, piso) for n in unicos]
+        pos = np.array([p if p is not None else -1 for p, _ in achados], dtype=np.int64)[codigos]
+        score = np.array([s for _, s in achados], dtype=float)[codigos]
+        indexados = np.array(self.nomes + [None], dtype=object)[pos]
+        return pd.DataFrame({
+            "nome": nomes.to_numpy(),
+            "posicao": pd.Series(pos, dtype="Int64").mask(pos < 0),
+            "nome_indice": indexados,
+            "score": score,
+        })
@@ -0,0 +1,389 @@
+"""
+Motor de regras de categoria. As regras ficam em data/regras_categorias.json.
+
+- motor_regras(nome): motor compilado do classificador `nome` ("simples", "turbo"). O arquivo
+  é relido sozinho quando muda (hot reload, sem reiniciar o app).
+- MotorRegras.classificar(desc, ncm): rótulo por linha, avaliando cada par distinto uma vez.
+- CacheClassificacao: resultados persistidos por (classificador, versão, descrição, NCM).
+  Quando as regras mudam, só os pares que alguma regra alterada casa são reclassificados.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from itertools import repeat
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+ARQUIVO_REGRAS = RAIZ / "data" / "regras_categorias.json"
+CACHE_DB = RAIZ / "data" / "cache" / "classificacao.sqlite"
+
+# Mudança em qualquer um destes campos pode alterar qualquer linha
+CAMPOS_GERAIS = ("padrao", "strip_descricao", "ncm_sem_ponto")
+
+
+def _validar(nome, regras):
+    ids = [r["id"] for r in regras]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"[{nome}] ids de regra repetidos")
+    prioridades = [r["prioridade"] for r in regras]
+    if len(set(prioridades)) != len(prioridades):
+        raise ValueError(f"[{nome}] prioridades repetidas (a ordem entre regras precisa ser explícita)")
+    for r in regras:
+        if not r.get("palavras") and not r.get("ncm_prefixos"):
+            raise ValueError(f"[{nome}] regra {r['id']} sem palavras nem ncm_prefixos")
+        desconhecidos = set(r.get("vetos", [])) - set(ids)
+        if desconhecidos:
+            raise ValueError(f"[{nome}] regra {r['id']} veta regras inexistentes: {sorted(desconhecidos)}")
+
+
+def _ordenar_por_vetos(nome, regras):
+    """Ordem de avaliação em que cada regra vem depois das que a vetam."""
+    ordem, feitos, pendentes = [], set(), list(regras)
+    while pendentes:
+        prontas = [r for r in pendentes if set(r.get("vetos", [])) <= feitos]
+        if not prontas:
+            raise ValueError(f"[{nome}] ciclo de vetos entre: {[r['id'] for r in pendentes]}")
+        for r in prontas:
+            ordem.append(r["id"])
+            feitos.add(r["id"])
+        pendentes = [r for r in pendentes if r["id"] not in feitos]
+    return ordem
+
+
+def _alternacao(palavras):
+    return "|".join(map(re.escape, palavras))
+
+
+def pares_distintos(d, n):
+    """(código do par por linha, descrições distintas, NCMs distintos) dos pares (d, n). NaN é um valor."""
+    cod_d, d_u = pd.factorize(pd.Series(d), use_na_sentinel=False)
+    cod_n, n_u = pd.factorize(pd.Series(n), use_na_sentinel=False)
+    base = len(n_u) + 1
+    cod_par, pares = pd.factorize(cod_d.astype(np.int64) * base + cod_n)
+    return cod_par, np.asarray(d_u, dtype=object)[pares // base], np.asarray(n_u, dtype=object)[pares % base]
+
+
+class MotorRegras:
+    """
+    Regras de um classificador. Uma regra casa se alguma palavra aparece na descrição ou se
+    o NCM começa por algum prefixo; vetos anulam só a parte das palavras. Ganha a regra
+    de menor prioridade que casar; nenhuma casando, fica o `padrao`.
+    """
+
+    def __init__(self, nome, cfg, versao):
+        self.nome = nome
+        self.cfg = cfg
+        self.versao = versao
+        self.padrao = cfg["padrao"]
+        self.strip_descricao = bool(cfg.get("strip_descricao", False))
+        self.ncm_sem_ponto = bool(cfg.get("ncm_sem_ponto", False))
+        _validar(nome, cfg["regras"])
+        self.regras = sorted(cfg["regras"], key=lambda r: r["prioridade"])
+        self.por_id = {r["id"]: r for r in self.regras}
+        self.ordem_vetos = _ordenar_por_vetos(nome, self.regras)
+        self.rotulos = np.array([r["categoria"] for r in self.regras] + [self.padrao])
+        self.padroes = {r["id"]: _alternacao(r["palavras"]) for r in self.regras if r.get("palavras")}
+
+    # ---------- preparação ----------
+    def preparar(self, desc, ncm):
+        """
+        Valores no formato comparado pelas regras (None/NaN = ""). Em Python puro (str.upper),
+        como o classificar_um; chamado só com valores distintos.
+        """
+        pares = [self._preparar_um(d, n) for d, n in zip(desc, ncm)]
+        return np.array([p[0] for p in pares], dtype=object), np.array([p[1] for p in pares], dtype=object)
+
+    def _preparar_um(self, desc, ncm):
+        d = "" if pd.isna(desc) else str(desc).upper()
+        n = "" if pd.isna(ncm) else str(ncm)
+        if self.ncm_sem_ponto:
+            n = n.replace(".", "")
+        return (d.strip() if self.strip_descricao else d), n.strip()
+
+    # ---------- classificação ----------
+    def _casamentos(self, descricoes, ncms):
+        """{id: bool por descrição} e {id: bool por NCM}, uma busca vetorizada por regra."""
+        descricoes = pd.Series(descricoes, dtype="str")
+        por_desc = {rid: descricoes.str.contains(p, regex=True).to_numpy(dtype=bool) for rid, p in self.padroes.items()}
+        ncms = pd.Series(ncms, dtype="str")
+        por_ncm = {
+            r["id"]: ncms.str.startswith(tuple(r["ncm_prefixos"])).to_numpy(dtype=bool)
+            for r in self.regras if r.get("ncm_prefixos")
+        }
+        return por_desc, por_ncm
+
+    def classificar_pares(self, d_u, n_u):
+        """Rótulo de cada par (descrição, NCM) já preparado."""
+        if not len(d_u):
+            return self.rotulos[:0]
+        cod_d, desc_u = pd.factorize(np.asarray(d_u, dtype=object))
+        cod_n, ncm_u = pd.factorize(np.asarray(n_u, dtype=object))
+        por_desc, por_ncm = self._casamentos(desc_u, ncm_u)
+
+        cond = {}
+        for rid in self.ordem_vetos:
+            pela_desc = por_desc[rid][cod_d] if rid in por_desc else np.zeros(len(cod_d), dtype=bool)
+            for v in self.por_id[rid].get("vetos", []):
+                pela_desc = pela_desc & ~cond[v]
+            cond[rid] = (pela_desc | por_ncm[rid][cod_n]) if rid in por_ncm else pela_desc
+
+        idx = np.select([cond[r["id"]] for r in self.regras], range(len(self.regras)), default=len(self.regras))
+        return self.rotulos[idx]
+
+    def pares(self, desc, ncm):
+        """(código do par por linha, descrições, NCMs) dos pares distintos, já preparados."""
+        cod_par, d_u, n_u = pares_distintos(desc, ncm)
+        return (cod_par, *self.preparar(d_u, n_u))
+
+    def classificar(self, desc, ncm):
+        """Rótulo por linha: cada par (descrição, NCM) distinto é preparado e avaliado uma vez só."""
+        cod_par, d_u, n_u = self.pares(desc, ncm)
+        return self.classificar_pares(d_u, n_u)[cod_par]
+
+    def classificar_um(self, desc, ncm):
+        """Mesmo resultado do classificar() para um par só, em Python puro."""
+        d, n = self._preparar_um(desc, ncm)
+        cond = {}
+        for rid in self.ordem_vetos:
+            r = self.por_id[rid]
+            pela_desc = any(p in d for p in r.get("palavras", [])) and not any(cond[v] for v in r.get("vetos", []))
+            cond[rid] = pela_desc or n.startswith(tuple(r.get("ncm_prefixos", [])))
+        for r in self.regras:
+            if cond[r["id"]]:
+                return r["categoria"]
+        return self.padrao
+
+    def casa_alguma(self, d_u, n_u, ids):
+        """Pares (já preparados) que alguma das regras `ids` casa, sem considerar vetos."""
+        regras = [self.por_id[i] for i in ids if i in self.por_id]
+        palavras = [p for r in regras for p in r.get("palavras", [])]
+        prefixos = tuple(p for r in regras for p in r.get("ncm_prefixos", []))
+        casa = np.zeros(len(d_u), dtype=bool)
+        if palavras:
+            casa |= pd.Series(d_u, dtype="str").str.contains(_alternacao(palavras), regex=True).to_numpy(dtype=bool)
+        if prefixos:
+            casa |= pd.Series(n_u, dtype="str").str.startswith(prefixos).to_numpy(dtype=bool)
+        return casa
+
+
+def regras_alteradas(antes, depois):
+    """
+    ids das regras que mudaram entre duas definições de um classificador (incluindo as vetadas
+    por uma regra alterada), ou None se a mudança pode afetar qualquer par.
+    """
+    if any(antes.get(k) != depois.get(k) for k in CAMPOS_GERAIS):
+        return None
+    a = {r["id"]: r for r in antes["regras"]}
+    d = {r["id"]: r for r in depois["regras"]}
+    mudou = {i for i in a.keys() | d.keys() if a.get(i) != d.get(i)}
+    while True:
+        novos = {
+            i for i, r in {**a, **d}.items()
+            if i not in mudou and mudou & set(r.get("vetos", []))
+        }
+        if not novos:
+            return mudou
+        mudou |= novos
+
+
+# ==============================================================================
+# CARGA COM HOT RELOAD
+# ==============================================================================
+_carregados = {}  # caminho -> ((mtime_ns, tamanho), {nome: MotorRegras})
+_trava = threading.Lock()
+
+
+def carregar_regras(caminho=ARQUIVO_REGRAS):
+    """
+    {classificador: MotorRegras} do arquivo de regras. Só relê quando o arquivo muda; se a
+    nova versão estiver inválida (ex.: JSON salvo pela metade), segue com a anterior.
+    """
+    caminho = str(caminho)
+    st = os.stat(caminho)
+    assinatura = (st.st_mtime_ns, st.st_size)
+    atual = _carregados.get(caminho)
+    if atual and atual[0] == assinatura:
+        return atual[1]
+    with _trava:
+        atual = _carregados.get(caminho)
+        if atual and atual[0] == assinatura:
+            return atual[1]
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                doc = json.load(f)
+            motores = {}
+            for nome, cfg in doc["classificadores"].items():
+                # versão = a declarada + hash do conteúdo: editar sem subir a versão não serve cache velho
+                conteudo = json.dumps(cfg, sort_keys=True, ensure_ascii=False).encode("utf-8")
+                versao = f"{doc.get('versao', 0)}-{hashlib.sha1(conteudo).hexdigest()[:10]}"
+                motores[nome] = MotorRegras(nome, cfg, versao)
+        except (ValueError, KeyError, TypeError) as e:
+            if not atual:
+                raise
+            print(f"⚠️ Regras inválidas em {caminho} ({e}); mantendo a versão anterior.")
+            motores = atual[1]
+        _carregados[caminho] = (assinatura, motores)
+        return motores
+
+
+def motor_regras(nome, caminho=ARQUIVO_REGRAS):
+    return carregar_regras(caminho)[nome]
+
+
+# ==============================================================================
+# CACHE PERSISTENTE DE CLASSIFICAÇÃO
+# ==============================================================================
+# Linhas válidas para a versão registrada em classificacao_regras; `versao` = versão que
+# classificou o par (pares que a troca de regras não afeta não são reescritos)
+SQL_CACHE = """
+CREATE TABLE IF NOT EXISTS classificacao_cache (
+    classificador TEXT, descricao TEXT, ncm TEXT, categoria TEXT, versao TEXT,
+    PRIMARY KEY (classificador, descricao, ncm)
+) WITHOUT ROWID
+"""
+
+
+SQL_CACHE_REGRAS = """
+CREATE TABLE IF NOT EXISTS classificacao_regras (
+    classificador TEXT PRIMARY KEY,
+    versao TEXT,
+    definicao TEXT,
+    atualizado_em TEXT
+)
+"""
+
+
+class CacheClassificacao:
+    """
+    Classificações já feitas, num SQLite próprio (o app só lê os DBs curated/raw), com uma
+    cópia em memória por (classificador, versão): o SQLite só é lido na primeira vez de cada
+    versão (ex.: depois de um redeploy) e só recebe os pares novos.
+    """
+
+    def __init__(self, db_path=CACHE_DB):
+        self.db_path = str(db_path)
+        self._memoria = {}  # (classificador, versao) -> {(descricao, ncm): categoria}
+        self._trava = threading.Lock()
+
+    def _conectar(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        con = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute(SQL_CACHE)
+        con.execute(SQL_CACHE_REGRAS)
+        return con
+
+    def migrar(self, con, motor):
+        """
+        Leva o cache do classificador para a versão do motor. Pares que nenhuma regra alterada
+        casa (nem na definição antiga nem na nova) ficam como estão; os demais são
+        reclassificados. Devolve (mantidos, reclassificados).
+        """
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            r = con.execute(
+                "SELECT versao, definicao FROM classificacao_regras WHERE classificador = ?", [motor.nome]
+            ).fetchone()
+            if r and r[0] == motor.versao:
+                con.rollback()
+                return 0, 0
+
+            mantidos = reclassificados = 0
+            if r:
+                antigo = MotorRegras(motor.nome, json.loads(r[1]), r[0])
+                alteradas = regras_alteradas(antigo.cfg, motor.cfg)
+                if alteradas is None:
+                    con.execute("DELETE FROM classificacao_cache WHERE classificador = ?", [motor.nome])
+                else:
+                    linhas = con.execute(
+                        "SELECT descricao, ncm FROM classificacao_cache WHERE classificador = ?", [motor.nome]
+                    ).fetchall()
+                    d = np.array([x[0] for x in linhas], dtype=object)
+                    n = np.array([x[1] for x in linhas], dtype=object)
+                    afetados = antigo.casa_alguma(d, n, alteradas) | motor.casa_alguma(d, n, alteradas)
+                    if afetados.any():
+                        novas = motor.classificar_pares(d[afetados], n[afetados])
+                        con.executemany(
+                            "UPDATE classificacao_cache SET categoria = ?, versao = ? "
+                            "WHERE classificador = ? AND descricao = ? AND ncm = ?",
+                            zip(novas.tolist(), repeat(motor.versao), repeat(motor.nome), d[afetados], n[afetados])
+                        )
+                    reclassificados = int(afetados.sum())
+                    mantidos = len(linhas) - reclassificados
+
+            con.execute(
+                "INSERT OR REPLACE INTO classificacao_regras (classificador, versao, definicao, atualizado_em) VALUES (?, ?, ?, ?)",
+                [motor.nome, motor.versao, json.dumps(motor.cfg, ensure_ascii=False), datetime.now().isoformat(timespec="seconds")]
+            )
+            con.commit()
+            return mantidos, reclassificados
+        except BaseException:
+            con.rollback()
+            raise
+
+    def _memoria_de(self, motor):
+        chave = (motor.nome, motor.versao)
+        mem = self._memoria.get(chave)
+        if mem is not None:
+            return mem
+        with self._trava:
+            mem = self._memoria.get(chave)
+            if mem is not None:
+                return mem
+            try:
+                con = self._conectar()
+                try:
+                    self.migrar(con, motor)
+                    mem = {
+                        (d, n): c for d, n, c in con.execute(
+                            "SELECT descricao, ncm, categoria FROM classificacao_cache WHERE classificador = ?",
+                            [motor.nome]
+                        )
+                    }
+                finally:
+                    con.close()
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Cache de classificação indisponível ({e}); guardando só em memória.")
+                mem = {}
+            # versões antigas do mesmo classificador não servem mais
+            self._memoria = {k: v for k, v in self._memoria.items() if k[0] != motor.nome}
+            self._memoria[chave] = mem
+            return mem
+
+    def classificar(self, motor, desc, ncm):
+        """motor.classificar() passando pelo cache: só os pares nunca vistos são avaliados."""
+        cod_par, d_u, n_u = motor.pares(desc, ncm)
+        mem = self._memoria_de(motor)
+        categorias = np.array([mem.get(k) for k in zip(d_u, n_u)], dtype=object)
+
+        faltam = np.flatnonzero(pd.isna(categorias))
+        if len(faltam):
+            novas = motor.classificar_pares(d_u[faltam], n_u[faltam]).tolist()
+            categorias[faltam] = novas
+            mem.update(zip(zip(d_u[faltam], n_u[faltam]), novas))
+            try:
+                con = self._conectar()
+                try:
+                    con.execute("BEGIN IMMEDIATE")
+                    # só grava se a versão ainda for a registrada (outro processo pode ter migrado)
+                    r = con.execute(
+                        "SELECT versao FROM classificacao_regras WHERE classificador = ?", [motor.nome]
+                    ).fetchone()
+                    if r and r[0] == motor.versao:
+                        con.executemany(
+                            "INSERT OR IGNORE INTO classificacao_cache VALUES (?, ?, ?, ?, ?)",
+                            zip(repeat(motor.nome), d_u[faltam], n_u[faltam], novas, repeat(motor.versao))
+                        )
+                    con.commit()
+                finally:
+                    con.close()
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Não gravei o cache de classificação ({e}).")
+        return categorias[cod_par]